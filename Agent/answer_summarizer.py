@@ -0,0 +1,195 @@
+import numpy as np
+from chart_spec import infer_roles
+
+class AnswerSummarizer:
+    """Builds deterministic answer text from a result DataFrame without calling the LLM"""
+
+    MAX_LIST_ITEMS = 10
+
+    @staticmethod
+    def summarize(df, user_query="", partial=False):
+        """Summarize query results as Markdown; never fails for a query that executed.
+
+        partial=True means df is only the first page of the result, so totals
+        and shares are labelled as covering the first rows only.
+        """
+        if df is None or df.empty:
+            return "The query executed successfully, but no matching rows were found."
+        try:
+            return AnswerSummarizer._summarize(AnswerSummarizer._unique_labels(df), partial)
+        except Exception as e:
+            print(f"⚠️ Could not summarize results, listing columns instead: {str(e)}")
+            return AnswerSummarizer.summarize_stream([str(col) for col in df.columns], len(df))
+
+    @staticmethod
+    def _unique_labels(df):
+        """Give repeated column names (e.g. both 'id's of SELECT * over a JOIN) a numbered suffix"""
+        if df.columns.is_unique:
+            return df
+        seen = {}
+        labels = []
+        for col in df.columns:
+            seen[col] = seen.get(col, 0) + 1
+            labels.append(col if seen[col] == 1 else f"{col}_{seen[col]}")
+        return df.set_axis(labels, axis=1)
+
+    @staticmethod
+    def _summarize(df, partial=False):
+        # Roles as for charts: IDs and keys are never treated as measures
+        roles = infer_roles(df)
+        measure_cols = [col for col in df.columns if roles[col] == 'measure']
+
+        # Scalar answer, e.g. SELECT COUNT(*) ...
+        if df.shape == (1, 1):
+            return AnswerSummarizer._summarize_scalar(df)
+
+        # Single record: list its fields
+        if len(df) == 1:
+            return AnswerSummarizer._summarize_record(df)
+
+        # One row per label with a measure (no raw-table IDs): top-N list or grouped aggregate
+        label_col = AnswerSummarizer._group_label(df, roles)
+        if label_col is not None and measure_cols:
+            return AnswerSummarizer._summarize_grouped(df, label_col, measure_cols, partial)
+
+        # Only measures: describe each column
+        if measure_cols and len(measure_cols) == len(df.columns):
+            return AnswerSummarizer._summarize_measures(df, measure_cols, partial)
+
+        return AnswerSummarizer._summarize_listing(df)
+
+    @staticmethod
+    def _group_label(df, roles):
+        """Label column of a grouped result (unique per row), or None for raw rows"""
+        if 'id' in roles.values():
+            return None
+        for col in df.columns:
+            if roles[col] in ('categorical', 'text', 'temporal') and df[col].is_unique:
+                return col
+        return None
+
+    @staticmethod
+    def summarize_stream(columns, row_count):
+        """Summary for results streamed in batches, where the full DataFrame is never held"""
+        if not row_count:
+            return "The query executed successfully, but no matching rows were found."
+        return (
+            f"Found **{row_count:,}** records with the following columns: "
+            + ", ".join(f"**{col}**" for col in columns)
+        )
+
+    @staticmethod
+    def _format_value(value):
+        """Format a single cell for display"""
+        if value is None or (isinstance(value, float) and np.isnan(value)):
+            return "—"
+        if isinstance(value, (bool, np.bool_)):
+            return str(bool(value))
+        if isinstance(value, (int, np.integer)):
+            return f"{int(value):,}"
+        if isinstance(value, (float, np.floating)):
+            if float(value).is_integer():
+                return f"{int(value):,}"
+            return f"{float(value):,.2f}"
+        return str(value)
+
+    @staticmethod
+    def _summarize_scalar(df):
+        column = df.columns[0]
+        return f"**{column}**: **{AnswerSummarizer._format_value(df.iat[0, 0])}**"
+
+    @staticmethod
+    def _summarize_record(df):
+        row = df.iloc[0]
+        lines = ["Found **1** record:", ""]
+        lines.extend(f"- **{col}**: {AnswerSummarizer._format_value(row[col])}" for col in df.columns)
+        return "\n".join(lines)
+
+    @staticmethod
+    def _summarize_grouped(df, label_col, measure_cols, partial=False):
+        measure = measure_cols[0]
+        values = df[measure].to_numpy(dtype=float)
+        valid = values[~np.isnan(values)]
+        n_rows = len(df)
+        shown = df.head(AnswerSummarizer.MAX_LIST_ITEMS)
+
+        # Results already sorted descending by the measure read as a ranking
+        is_ranking = n_rows > 1 and bool(np.all(np.diff(valid) <= 0))
+        if is_ranking:
+            header = f"Top **{n_rows}** {label_col} by **{measure}**:"
+        else:
+            header = f"**{measure}** across **{n_rows}** {label_col} groups:"
+
+        lines = [header, ""]
+        labels = shown[label_col].astype(str).to_numpy()
+        for i, (label, value) in enumerate(zip(labels, shown[measure].to_numpy())):
+            prefix = f"{i + 1}." if is_ranking else "-"
+            lines.append(f"{prefix} **{label}**: {AnswerSummarizer._format_value(value)}")
+        if n_rows > len(shown):
+            lines.append(f"- ...and {n_rows - len(shown)} more")
+
+        if valid.size:
+            lines.append("")
+            lines.append(AnswerSummarizer._stats_line(measure, valid, n_rows if partial else None))
+            total = valid.sum()
+            # A share of the first page is not a share of the whole result
+            if not partial and total > 0 and np.all(valid >= 0):
+                top_idx = int(np.nanargmax(values))
+                share = values[top_idx] / total * 100
+                top_label = df[label_col].iloc[top_idx]
+                lines.append(f"**{top_label}** accounts for **{share:.1f}%** of the overall {measure}.")
+
+        return "\n".join(lines)
+
+    @staticmethod
+    def _summarize_measures(df, measure_cols, partial=False):
+        stats = df[measure_cols].agg(['min', 'max', 'mean', 'sum'])
+        if partial:
+            lines = [f"In the first **{len(df)}** records:", ""]
+        else:
+            lines = [f"Found **{len(df)}** records.", ""]
+        for col in measure_cols:
+            lines.append(
+                f"- **{col}**: min {AnswerSummarizer._format_value(stats.at['min', col])}, "
+                f"max {AnswerSummarizer._format_value(stats.at['max', col])}, "
+                f"mean {AnswerSummarizer._format_value(stats.at['mean', col])}, "
+                f"total {AnswerSummarizer._format_value(stats.at['sum', col])}"
+            )
+        return "\n".join(lines)
+
+    @staticmethod
+    def _summarize_listing(df):
+        lines = [
+            f"Found **{len(df)}** records with the following columns: "
+            + ", ".join(f"**{col}**" for col in df.columns)
+        ]
+        first_col = df.columns[0]
+        preview = df[first_col].head(AnswerSummarizer.MAX_LIST_ITEMS).astype(str)
+        lines.append("")
+        lines.extend(f"- {value}" for value in preview)
+        if len(df) > len(preview):
+            lines.append(f"- ...and {len(df) - len(preview)} more")
+        return "\n".join(lines)
+
+    @staticmethod
+    def _stats_line(measure, values, first_rows=None):
+        """One-line min/max/mean/total summary of a numeric array (of the first rows only, if given)"""
+        scope = f"In the first **{first_rows}** rows, " if first_rows else ""
+        return (
+            f"{scope}**{measure}** ranges from {AnswerSummarizer._format_value(values.min())} "
+            f"to {AnswerSummarizer._format_value(values.max())} "
+            f"(mean {AnswerSummarizer._format_value(values.mean())}, "
+            f"total {AnswerSummarizer._format_value(values.sum())})."
+        )
+
+    @staticmethod
+    def to_markdown_table(df, max_rows=20):
+        """Render the first rows of a DataFrame as a Markdown table (for LLM prompts)"""
+        shown = df.head(max_rows)
+        header = "| " + " | ".join(str(col) for col in shown.columns) + " |"
+        separator = "|" + "|".join(["---"] * len(shown.columns)) + "|"
+        rows = [
+            "| " + " | ".join(AnswerSummarizer._format_value(v) for v in row) + " |"
+            for row in shown.itertuples(index=False, name=None)
+        ]
+        return "\n".join([header, separator] + rows)
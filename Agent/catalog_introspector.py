@@ -0,0 +1,299 @@
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import inspect, select, table, text
+
+SAMPLE_VALUE_LENGTH = 100
+
+POSTGRESQL_TABLES = """
+SELECT c.relname, obj_description(c.oid, 'pg_class'), c.reltuples::bigint
+FROM pg_catalog.pg_class c
+JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+WHERE n.nspname = :schema AND c.relkind IN ('r', 'p')
+"""
+POSTGRESQL_COLUMNS = """
+SELECT c.relname, a.attname, format_type(a.atttypid, a.atttypmod), col_description(c.oid, a.attnum)
+FROM pg_catalog.pg_class c
+JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+JOIN pg_catalog.pg_attribute a ON a.attrelid = c.oid
+WHERE n.nspname = :schema AND c.relkind IN ('r', 'p') AND a.attnum > 0 AND NOT a.attisdropped
+ORDER BY c.relname, a.attnum
+"""
+POSTGRESQL_KEYS = """
+SELECT src.relname, con.contype, con.conname,
+       ARRAY(SELECT a.attname FROM unnest(con.conkey) WITH ORDINALITY k(attnum, ord)
+             JOIN pg_catalog.pg_attribute a ON a.attrelid = con.conrelid AND a.attnum = k.attnum
+             ORDER BY k.ord),
+       ref.relname,
+       ARRAY(SELECT a.attname FROM unnest(con.confkey) WITH ORDINALITY k(attnum, ord)
+             JOIN pg_catalog.pg_attribute a ON a.attrelid = con.confrelid AND a.attnum = k.attnum
+             ORDER BY k.ord)
+FROM pg_catalog.pg_constraint con
+JOIN pg_catalog.pg_class src ON src.oid = con.conrelid
+JOIN pg_catalog.pg_namespace n ON n.oid = src.relnamespace
+LEFT JOIN pg_catalog.pg_class ref ON ref.oid = con.confrelid
+WHERE n.nspname = :schema AND con.contype IN ('p', 'f')
+ORDER BY src.relname, con.conname
+"""
+
+MYSQL_TABLES = """
+SELECT TABLE_NAME, TABLE_COMMENT, TABLE_ROWS FROM information_schema.TABLES
+WHERE TABLE_SCHEMA = DATABASE() AND TABLE_TYPE = 'BASE TABLE'
+"""
+MYSQL_COLUMNS = """
+SELECT TABLE_NAME, COLUMN_NAME, COLUMN_TYPE, COLUMN_COMMENT FROM information_schema.COLUMNS
+WHERE TABLE_SCHEMA = DATABASE() ORDER BY TABLE_NAME, ORDINAL_POSITION
+"""
+MYSQL_KEYS = """
+SELECT TABLE_NAME, CONSTRAINT_NAME, COLUMN_NAME, REFERENCED_TABLE_NAME, REFERENCED_COLUMN_NAME
+FROM information_schema.KEY_COLUMN_USAGE
+WHERE TABLE_SCHEMA = DATABASE() AND (CONSTRAINT_NAME = 'PRIMARY' OR REFERENCED_TABLE_NAME IS NOT NULL)
+ORDER BY TABLE_NAME, CONSTRAINT_NAME, ORDINAL_POSITION
+"""
+
+MSSQL_TABLES = """
+SELECT t.name, CAST(ep.value AS NVARCHAR(4000)), SUM(p.rows)
+FROM sys.tables t
+JOIN sys.partitions p ON p.object_id = t.object_id AND p.index_id IN (0, 1)
+LEFT JOIN sys.extended_properties ep
+    ON ep.major_id = t.object_id AND ep.minor_id = 0 AND ep.name = 'MS_Description'
+WHERE t.schema_id = SCHEMA_ID()
+GROUP BY t.name, CAST(ep.value AS NVARCHAR(4000))
+"""
+MSSQL_COLUMNS = """
+SELECT TABLE_NAME, COLUMN_NAME, DATA_TYPE, CHARACTER_MAXIMUM_LENGTH FROM INFORMATION_SCHEMA.COLUMNS
+WHERE TABLE_SCHEMA = SCHEMA_NAME() ORDER BY TABLE_NAME, ORDINAL_POSITION
+"""
+MSSQL_PRIMARY_KEYS = """
+SELECT kcu.TABLE_NAME, kcu.COLUMN_NAME
+FROM INFORMATION_SCHEMA.TABLE_CONSTRAINTS tc
+JOIN INFORMATION_SCHEMA.KEY_COLUMN_USAGE kcu
+    ON kcu.CONSTRAINT_NAME = tc.CONSTRAINT_NAME AND kcu.TABLE_SCHEMA = tc.TABLE_SCHEMA
+WHERE tc.CONSTRAINT_TYPE = 'PRIMARY KEY' AND tc.TABLE_SCHEMA = SCHEMA_NAME()
+ORDER BY kcu.TABLE_NAME, kcu.ORDINAL_POSITION
+"""
+MSSQL_FOREIGN_KEYS = """
+SELECT tp.name, fk.name, cp.name, tr.name, cr.name
+FROM sys.foreign_key_columns fkc
+JOIN sys.foreign_keys fk ON fk.object_id = fkc.constraint_object_id
+JOIN sys.tables tp ON tp.object_id = fkc.parent_object_id
+JOIN sys.columns cp ON cp.object_id = fkc.parent_object_id AND cp.column_id = fkc.parent_column_id
+JOIN sys.tables tr ON tr.object_id = fkc.referenced_object_id
+JOIN sys.columns cr ON cr.object_id = fkc.referenced_object_id AND cr.column_id = fkc.referenced_column_id
+WHERE tp.schema_id = SCHEMA_ID()
+ORDER BY tp.name, fk.name, fkc.constraint_column_id
+"""
+
+SQLITE_COLUMNS = """
+SELECT m.name, p.name, p.type, p.pk
+FROM sqlite_master m JOIN pragma_table_info(m.name) p
+WHERE m.type = 'table' AND m.name NOT LIKE 'sqlite_%'
+ORDER BY m.name, p.cid
+"""
+SQLITE_FOREIGN_KEYS = """
+SELECT m.name, f.id, f."from", f."table", f."to"
+FROM sqlite_master m JOIN pragma_foreign_key_list(m.name) f
+WHERE m.type = 'table' AND m.name NOT LIKE 'sqlite_%'
+ORDER BY m.name, f.id, f.seq
+"""
+SQLITE_ROW_ESTIMATES = "SELECT tbl, MAX(CAST(stat AS INTEGER)) FROM sqlite_stat1 GROUP BY tbl"
+
+class CatalogIntrospector:
+    """Reads a database's tables, columns, keys and row estimates in bulk.
+
+    PostgreSQL, MySQL, MSSQL and SQLite are described with a few catalog
+    queries in total instead of several inspector calls per table. Other
+    dialects, and any dialect whose catalog query fails, fall back to the
+    SQLAlchemy inspector run per table on a small thread pool. Sample rows
+    are always one query per table and are fetched in parallel.
+    """
+
+    def __init__(self, engine, max_workers=4):
+        self.engine = engine
+        self.max_workers = max_workers
+        self.catalog_queries = 0
+
+    def introspect(self, sample_rows=3):
+        """Schema description: {'schema': name or None, 'tables': {table: entry}}"""
+        dialect = self.engine.dialect.name
+        bulk = {
+            'postgresql': self._postgresql_tables,
+            'mysql': self._mysql_tables,
+            'mssql': self._mssql_tables,
+            'sqlite': self._sqlite_tables
+        }.get(dialect)
+
+        schema, tables = None, None
+        if bulk is not None:
+            try:
+                schema, tables = bulk()
+            except Exception as e:
+                print(f"⚠️ Bulk catalog query failed on {dialect}, falling back to per-table inspection: {str(e)}")
+        if tables is None:
+            schema, tables = self._inspector_tables()
+
+        if sample_rows and tables:
+            self.add_sample_rows(tables, schema, sample_rows)
+        return {'schema': schema, 'tables': tables}
+
+    def _query(self, conn, sql, **params):
+        self.catalog_queries += 1
+        return conn.execute(text(sql), params).fetchall()
+
+    @staticmethod
+    def _entry(comment=None, row_estimate=None):
+        return {
+            'columns': [],
+            'primary_key': [],
+            'foreign_keys': [],
+            'comment': comment or None,
+            'row_estimate': int(row_estimate) if row_estimate is not None and row_estimate >= 0 else None,
+            'sample_rows': None
+        }
+
+    @staticmethod
+    def _group_foreign_keys(tables, rows):
+        """Add rows of (table, constraint, column, referred_table, referred_column) as foreign keys"""
+        grouped = {}
+        for table_name, constraint, column, referred_table, referred_column in rows:
+            if table_name not in tables:
+                continue
+            fk = grouped.setdefault((table_name, constraint), [[], referred_table, []])
+            fk[0].append(column)
+            fk[2].append(referred_column)
+        for (table_name, _), fk in grouped.items():
+            tables[table_name]['foreign_keys'].append(fk)
+
+    def _postgresql_tables(self):
+        schema = 'public'
+        with self.engine.connect() as conn:
+            tables = {
+                name: self._entry(comment, estimate)
+                for name, comment, estimate in self._query(conn, POSTGRESQL_TABLES, schema=schema)
+            }
+            for table_name, column, col_type, comment in self._query(conn, POSTGRESQL_COLUMNS, schema=schema):
+                if table_name in tables:
+                    tables[table_name]['columns'].append([column, col_type.upper(), comment])
+            for table_name, kind, _, columns, referred_table, referred_columns in self._query(conn, POSTGRESQL_KEYS, schema=schema):
+                if table_name not in tables:
+                    continue
+                if kind == 'p':
+                    tables[table_name]['primary_key'] = list(columns)
+                else:
+                    tables[table_name]['foreign_keys'].append([list(columns), referred_table, list(referred_columns)])
+        return schema, tables
+
+    def _mysql_tables(self):
+        with self.engine.connect() as conn:
+            tables = {
+                name: self._entry(comment, estimate)
+                for name, comment, estimate in self._query(conn, MYSQL_TABLES)
+            }
+            for table_name, column, col_type, comment in self._query(conn, MYSQL_COLUMNS):
+                if table_name in tables:
+                    tables[table_name]['columns'].append([column, col_type.upper(), comment or None])
+            foreign_keys = []
+            for table_name, constraint, column, referred_table, referred_column in self._query(conn, MYSQL_KEYS):
+                if table_name not in tables:
+                    continue
+                if constraint == 'PRIMARY':
+                    tables[table_name]['primary_key'].append(column)
+                else:
+                    foreign_keys.append((table_name, constraint, column, referred_table, referred_column))
+            self._group_foreign_keys(tables, foreign_keys)
+        return None, tables
+
+    def _mssql_tables(self):
+        with self.engine.connect() as conn:
+            tables = {
+                name: self._entry(comment, estimate)
+                for name, comment, estimate in self._query(conn, MSSQL_TABLES)
+            }
+            for table_name, column, col_type, length in self._query(conn, MSSQL_COLUMNS):
+                if table_name in tables:
+                    col_type = col_type.upper()
+                    if length:
+                        col_type += f"({'MAX' if length == -1 else length})"
+                    tables[table_name]['columns'].append([column, col_type, None])
+            for table_name, column in self._query(conn, MSSQL_PRIMARY_KEYS):
+                if table_name in tables:
+                    tables[table_name]['primary_key'].append(column)
+            self._group_foreign_keys(tables, self._query(conn, MSSQL_FOREIGN_KEYS))
+        return None, tables
+
+    def _sqlite_tables(self):
+        with self.engine.connect() as conn:
+            tables = {}
+            primary_keys = {}
+            for table_name, column, col_type, pk_position in self._query(conn, SQLITE_COLUMNS):
+                entry = tables.setdefault(table_name, self._entry())
+                entry['columns'].append([column, col_type, None])
+                if pk_position:
+                    primary_keys.setdefault(table_name, []).append((pk_position, column))
+            for table_name, columns in primary_keys.items():
+                tables[table_name]['primary_key'] = [column for _, column in sorted(columns)]
+            self._group_foreign_keys(tables, self._query(conn, SQLITE_FOREIGN_KEYS))
+            try:
+                # Only present after ANALYZE
+                for table_name, estimate in self._query(conn, SQLITE_ROW_ESTIMATES):
+                    if table_name in tables and estimate is not None:
+                        tables[table_name]['row_estimate'] = int(estimate)
+            except Exception:
+                conn.rollback()
+        return None, tables
+
+    def _inspector_tables(self):
+        """Per-table inspector calls, run in parallel"""
+        inspector = inspect(self.engine)
+        schema = None
+        try:
+            # For PostgreSQL, specify the public schema explicitly
+            table_names = inspector.get_table_names(schema='public')
+            schema = 'public'
+        except Exception:
+            # Fallback for other databases without schemas
+            table_names = inspector.get_table_names()
+
+        def describe(table_name):
+            # Inspectors cache per instance and aren't shared across threads
+            table_inspector = inspect(self.engine)
+            try:
+                comment = table_inspector.get_table_comment(table_name, schema=schema).get('text')
+            except NotImplementedError:
+                comment = None
+            entry = self._entry(comment)
+            entry['columns'] = [
+                [col['name'], str(col['type']), col.get('comment')]
+                for col in table_inspector.get_columns(table_name, schema=schema)
+            ]
+            entry['primary_key'] = table_inspector.get_pk_constraint(table_name, schema=schema).get('constrained_columns') or []
+            entry['foreign_keys'] = [
+                [fk['constrained_columns'], fk['referred_table'], fk['referred_columns']]
+                for fk in table_inspector.get_foreign_keys(table_name, schema=schema)
+            ]
+            return entry
+
+        tables = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {table_name: pool.submit(describe, table_name) for table_name in table_names}
+            for table_name, future in futures.items():
+                try:
+                    tables[table_name] = future.result()
+                except Exception as e:
+                    print(f"Could not read schema for '{table_name}': {e}")
+        return schema, tables
+
+    def add_sample_rows(self, tables, schema, limit):
+        """Fetch up to `limit` rows of every table in parallel"""
+        def sample(table_name):
+            with self.engine.connect() as conn:
+                result = conn.execute(select(text('*')).select_from(table(table_name, schema=schema)).limit(limit))
+                columns = list(result.keys())
+                rows = [[str(value)[:SAMPLE_VALUE_LENGTH] for value in row] for row in result.fetchall()]
+            return {'columns': columns, 'rows': rows}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {table_name: pool.submit(sample, table_name) for table_name in tables}
+            for table_name, future in futures.items():
+                try:
+                    tables[table_name]['sample_rows'] = future.result()
+                except Exception as e:
+                    print(f"Could not sample rows for '{table_name}': {e}")
@@ -0,0 +1,120 @@
+import numpy as np
+import pandas as pd
+
+OTHER_LABEL = "Other"
+
+class ChartDownsampler:
+    """Reduces a result to a chart-sized set of points that still shows all of it.
+
+    Line charts use Largest-Triangle-Three-Buckets (LTTB), which keeps the
+    visual shape of a series; very dense series use a min/max envelope
+    instead so every spike survives. Bar and pie charts keep the top
+    categories by value and fold the rest into one "Other" entry. Every
+    method returns row positions or a new frame no larger than the point
+    budget, so the payload size is bounded whatever the result size.
+    """
+
+    @staticmethod
+    def _numeric(series):
+        """float64 view of a column for geometry (datetimes as ns, text as positions)"""
+        if series.dtype.kind == 'M':
+            values = series.array.asi8 if hasattr(series.array, 'asi8') else series.astype('int64').to_numpy()
+            return values.astype(np.float64)
+        if series.dtype.kind in 'iufb':
+            return series.to_numpy(dtype=np.float64, na_value=np.nan)
+        numeric = pd.to_numeric(series, errors='coerce')
+        if numeric.notna().all():
+            return numeric.to_numpy(dtype=np.float64)
+        return np.arange(len(series), dtype=np.float64)
+
+    @staticmethod
+    def lttb(x, y, threshold):
+        """Positions of the `threshold` points LTTB keeps from (x, y)"""
+        n = len(x)
+        if threshold >= n or threshold < 3:
+            return np.arange(n)
+        every = (n - 2) / (threshold - 2)
+        # Bucket i (of threshold - 2) covers positions bounds[i]..bounds[i + 1] - 1
+        bounds = (np.arange(threshold - 1) * every).astype(np.int64) + 1
+        bounds[-1] = n - 1
+        selected = np.empty(threshold, dtype=np.int64)
+        selected[0], selected[-1] = 0, n - 1
+        a = 0
+        for i in range(threshold - 2):
+            start, end = bounds[i], bounds[i + 1]
+            if i + 2 < len(bounds):
+                next_x = x[end:bounds[i + 2]].mean()
+                next_y = y[end:bounds[i + 2]].mean()
+            else:
+                next_x, next_y = x[n - 1], y[n - 1]
+            # Twice the triangle area for every candidate in the bucket at once
+            areas = np.abs((x[a] - next_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (next_y - y[a]))
+            a = start + int(np.argmax(areas))
+            selected[i + 1] = a
+        return selected
+
+    @staticmethod
+    def min_max_envelope(y, buckets):
+        """Positions of the minimum and maximum of y in each of `buckets` equal slices"""
+        n = len(y)
+        if n <= buckets * 2:
+            return np.arange(n)
+        bucket_ids = np.arange(n) * buckets // n
+        series = pd.Series(y)
+        grouped = series.groupby(bucket_ids)
+        positions = np.concatenate([grouped.idxmin().to_numpy(), grouped.idxmax().to_numpy(), [0, n - 1]])
+        return np.unique(positions)
+
+    @staticmethod
+    def top_n_with_other(df, category, value, top_n):
+        """Sum `value` per `category`, keep the top_n largest (in original order) and fold the rest into "Other" """
+        totals = df.groupby(category, sort=False, dropna=False)[value].sum()
+        if len(totals) <= top_n:
+            return totals.reset_index(), False
+        keep = totals.nlargest(top_n - 1).index
+        kept = totals[totals.index.isin(keep)]
+        other_row = pd.DataFrame({category: [OTHER_LABEL], value: [totals[~totals.index.isin(keep)].sum()]})
+        result = pd.concat([kept.reset_index().astype({category: object}), other_row], ignore_index=True)
+        return result, True
+
+    @staticmethod
+    def downsample(df, chart_type, x, y, max_points=500, max_categories=20, pie_slices=8, envelope_factor=50):
+        """(frame, sampling info) with at most max_points rows for the chart.
+
+        The info dict is None when the chart uses the result's leading rows
+        unchanged, otherwise it names the method and the source row count.
+        """
+        n = len(df)
+        if n == 0 or not max_points:
+            return df, None
+        numeric_y = df[y].dtype.kind in 'iufb'
+
+        if chart_type in ('bar', 'pie'):
+            limit = pie_slices if chart_type == 'pie' else max_categories
+            if n <= limit:
+                return df, None
+            if not numeric_y:
+                return df.head(limit), None
+            frame, folded = ChartDownsampler.top_n_with_other(df[[x, y]], x, y, limit)
+            method = 'top_n_other' if folded else 'aggregate'
+            return frame, {'method': method, 'source_rows': n, 'points': len(frame)}
+
+        if n <= max_points:
+            return df, None
+        if not numeric_y:
+            positions = np.linspace(0, n - 1, max_points).astype(np.int64)
+            return df.iloc[positions], {'method': 'stride', 'source_rows': n, 'points': max_points}
+
+        frame = df
+        if df[x].dtype.kind in 'iufM' and not df[x].is_monotonic_increasing:
+            frame = df.sort_values(x, kind='stable')
+        frame = frame[frame[y].notna()]
+        y_values = frame[y].to_numpy(dtype=np.float64)
+        if len(frame) > max_points * envelope_factor:
+            positions = ChartDownsampler.min_max_envelope(y_values, max(max_points // 2 - 1, 1))
+            method = 'min_max_envelope'
+        else:
+            positions = ChartDownsampler.lttb(ChartDownsampler._numeric(frame[x]), y_values, max_points)
+            method = 'lttb'
+        sampled = frame.iloc[positions]
+        return sampled, {'method': method, 'source_rows': n, 'points': len(sampled)}
@@ -0,0 +1,235 @@
+import time
+import pandas as pd
+from chart_spec import infer_roles, query_intent, unique_columns
+from metrics import metrics
+from result_pager import ResultPager
+
+AVERAGE_KEYWORDS = ('average', 'avg', 'mean')
+COUNT_KEYWORDS = ('count', 'how many', 'number of')
+GRANULARITY_KEYWORDS = (('hourly', 'hour'), ('daily', 'day'), ('weekly', 'week'), ('monthly', 'month'),
+                        ('yearly', 'year'), ('annual', 'year'))
+GRANULARITIES = (('hour', 1 / 24), ('day', 1), ('week', 7), ('month', 30.44), ('year', 365.25))
+# Largest number of categories read back from a pushed-down GROUP BY
+MAX_GROUPS = 10000
+
+class ChartQueryPlanner:
+    """Computes chart data for trend and distribution questions where the data lives.
+
+    When a question reads like a trend or a distribution and the result was
+    paged (so pandas only holds the first page), a companion query wraps the
+    generated SQL and groups it in the database by a time bucket or by
+    category with COUNT/SUM/AVG. The bucket size is picked from the
+    column's MIN/MAX so the series fits the chart point budget. Results
+    that already hold one row per category or period (e.g. month,
+    order_count) are summed per key instead of counted or re-bucketed. If the
+    columns don't suit a rewrite or the aggregate query fails, the rows at
+    hand are aggregated with pandas instead and the chart is marked partial.
+    """
+
+    def __init__(self, max_points=500):
+        self.max_points = max_points
+
+    @staticmethod
+    def intent(user_query):
+        """'trend', 'distribution' or None, from the same keywords the chart picker uses"""
+        return query_intent(user_query)
+
+    @staticmethod
+    def _aggregate_for(user_query, measure, pre_aggregated=False):
+        """'count', 'avg' or 'sum'.
+
+        Rows that already hold one value per dimension (e.g. month, order_count)
+        are summed: that keeps counts and totals right when buckets merge,
+        whereas counting them would chart a line of 1s.
+        """
+        query_lower = (user_query or "").lower()
+        if measure is None:
+            return 'count'
+        if any(keyword in query_lower for keyword in AVERAGE_KEYWORDS):
+            return 'avg'
+        if not pre_aggregated and any(keyword in query_lower for keyword in COUNT_KEYWORDS):
+            return 'count'
+        return 'sum'
+
+    def pick_columns(self, df, intent, user_query):
+        """(dimension, measure or None, aggregate) for the chart, or None if the result doesn't fit"""
+        roles = infer_roles(df)
+        if intent == 'trend':
+            # Timestamps or date strings; year/month numbers can't be truncated to buckets
+            dimension = next((c for c, role in roles.items() if role == 'temporal' and df[c].dtype.kind in 'MO'), None)
+        else:
+            dimension = next((c for c, role in roles.items() if role == 'categorical'), None)
+        if dimension is None:
+            return None
+        measure = next((c for c, role in roles.items() if role == 'measure'), None)
+        pre_aggregated = measure is not None and not df[dimension].duplicated().any()
+        aggregate = self._aggregate_for(user_query, measure, pre_aggregated)
+        return dimension, measure if aggregate != 'count' else None, aggregate
+
+    @staticmethod
+    def granularity(start, end, max_points, user_query=None):
+        """Time bucket for the chart: the one the question asks for ("monthly"), else the
+        finest one that spans (end - start) in at most max_points buckets"""
+        span_days = max((end - start).total_seconds() / 86400, 0)
+        query_lower = (user_query or "").lower()
+        sizes = dict(GRANULARITIES)
+        for keyword, name in GRANULARITY_KEYWORDS:
+            if keyword in query_lower and span_days / sizes[name] <= max_points:
+                return name
+        for name, days in GRANULARITIES:
+            if span_days / days <= max_points:
+                return name
+        return 'year'
+
+    @staticmethod
+    def bucket_expression(dialect, column, granularity):
+        """SQL expression truncating a (quoted) timestamp column to the bucket, or None"""
+        if dialect == 'sqlite':
+            return {
+                'hour': f"strftime('%Y-%m-%d %H:00:00', {column})",
+                'day': f"date({column})",
+                'week': f"date({column}, 'weekday 0', '-6 days')",
+                'month': f"strftime('%Y-%m-01', {column})",
+                'year': f"strftime('%Y-01-01', {column})"
+            }[granularity]
+        if dialect == 'postgresql':
+            return f"date_trunc('{granularity}', {column})"
+        if dialect in ('mysql', 'mariadb'):
+            # No DATE_FORMAT: its '%' codes would clash with the driver's paramstyle
+            return {
+                'hour': f"TIMESTAMP(DATE({column}), MAKETIME(HOUR({column}), 0, 0))",
+                'day': f"DATE({column})",
+                'week': f"DATE_SUB(DATE({column}), INTERVAL WEEKDAY({column}) DAY)",
+                'month': f"DATE_SUB(DATE({column}), INTERVAL DAYOFMONTH({column}) - 1 DAY)",
+                'year': f"MAKEDATE(YEAR({column}), 1)"
+            }[granularity]
+        if dialect == 'mssql':
+            return f"DATEADD({granularity}, DATEDIFF({granularity}, 0, {column}), 0)"
+        return None
+
+    @staticmethod
+    def _aggregate_sql(aggregate, measure):
+        if aggregate == 'count':
+            return "COUNT(*)"
+        return f"{aggregate.upper()}({measure})"
+
+    def _measure_name(self, measure, aggregate):
+        return 'count' if aggregate == 'count' else measure
+
+    def plan_sql(self, sql_query, dialect, quote, dimension, measure, aggregate, granularity=None, max_rows=None,
+                 ordered=False):
+        """Companion aggregate query over the generated SQL, or None for unsupported dialects.
+
+        Groups come back in dimension order with a granularity or ordered=True,
+        otherwise largest first.
+        """
+        inner = ResultPager.enforce_limit(sql_query, max_rows, dialect)
+        column = quote(dimension)
+        if granularity:
+            group_expr = self.bucket_expression(dialect, column, granularity)
+            if group_expr is None:
+                return None
+        else:
+            group_expr = column
+        value_expr = self._aggregate_sql(aggregate, quote(measure) if measure else None)
+        order = "1" if granularity or ordered else "2 DESC"
+        sql = (
+            f"SELECT {group_expr} AS {quote(dimension)}, {value_expr} AS {quote(self._measure_name(measure, aggregate))} "
+            f"FROM ({inner}) AS _chart WHERE {column} IS NOT NULL GROUP BY {group_expr} ORDER BY {order}"
+        )
+        if dialect == 'mssql':
+            return f"SELECT TOP ({MAX_GROUPS}) * FROM ({sql.rsplit(' ORDER BY ', 1)[0]}) AS _grouped ORDER BY {order}"
+        return f"{sql} LIMIT {MAX_GROUPS}"
+
+    def aggregate_locally(self, df, dimension, measure, aggregate, granularity=None, ordered=False):
+        """The same grouping done in pandas on the rows at hand"""
+        keys = df[dimension]
+        if granularity:
+            keys = pd.to_datetime(keys, errors='coerce')
+            keys = {
+                'hour': lambda k: k.dt.floor('h'),
+                'day': lambda k: k.dt.floor('D'),
+                'week': lambda k: k.dt.to_period('W').dt.start_time,
+                'month': lambda k: k.dt.to_period('M').dt.start_time,
+                'year': lambda k: k.dt.to_period('Y').dt.start_time
+            }[granularity](keys)
+        grouped = df.groupby(keys.rename(dimension), sort=bool(granularity or ordered))
+        if aggregate == 'count':
+            values = grouped.size()
+        else:
+            values = grouped[measure].mean() if aggregate == 'avg' else grouped[measure].sum()
+        frame = values.rename(self._measure_name(measure, aggregate)).reset_index()
+        if not (granularity or ordered):
+            frame = frame.sort_values(frame.columns[1], ascending=False, kind='stable')
+        return frame.reset_index(drop=True)
+
+    def build(self, user_query, sql_query, df, db_manager, complete, max_rows=None):
+        """Chart frame and how it was computed, or None when the default chart applies.
+
+        complete says whether df holds the whole result; only then is
+        aggregating it locally as good as pushing the query down.
+        """
+        intent = self.intent(user_query)
+        if intent is None or df is None or df.empty or len(df.columns) < 2:
+            return None
+        df = unique_columns(df)
+        picked = self.pick_columns(df, intent, user_query)
+        if picked is None:
+            return None
+        dimension, measure, aggregate = picked
+        pre_aggregated = aggregate != 'count' and not df[dimension].duplicated().any()
+        if complete and pre_aggregated:
+            return None  # Already one row per category or period; chart the rows as they are
+        # Periods the query already grouped by (e.g. '2024-01') are kept, not re-bucketed
+        by_time = intent == 'trend' and not pre_aggregated
+        ordered = intent == 'trend'
+
+        started_at = time.monotonic()
+        granularity = None
+        info = {'dimension': dimension, 'measure': measure, 'aggregate': aggregate}
+        if not complete and sql_query:
+            try:
+                frame, granularity, pushed_sql = self._push_down(
+                    user_query, sql_query, db_manager, dimension, measure, aggregate, by_time, ordered, max_rows
+                )
+                if frame is not None:
+                    metrics.observe("chart.pushdown", (time.monotonic() - started_at) * 1000)
+                    info.update(source='database', granularity=granularity, sql=pushed_sql)
+                    return frame, info
+            except Exception as e:
+                print(f"⚠️ Chart aggregation pushdown failed, aggregating locally: {str(e)}")
+            metrics.increment("chart.pushdown_fallback")
+
+        if by_time:
+            keys = pd.to_datetime(df[dimension], errors='coerce').dropna()
+            if keys.empty:
+                return None
+            granularity = self.granularity(keys.min(), keys.max(), self.max_points, user_query)
+        frame = self.aggregate_locally(df, dimension, measure, aggregate, granularity, ordered)
+        metrics.observe("chart.local_aggregate", (time.monotonic() - started_at) * 1000)
+        info.update(source='local', granularity=granularity, partial=not complete)
+        return frame, info
+
+    def _push_down(self, user_query, sql_query, db_manager, dimension, measure, aggregate, by_time, ordered, max_rows):
+        dialect = db_manager.engine.dialect
+        quote = dialect.identifier_preparer.quote
+        granularity = None
+        if by_time:
+            inner = ResultPager.enforce_limit(sql_query, max_rows, dialect.name)
+            bounds = db_manager.execute_raw_sql(
+                f"SELECT MIN({quote(dimension)}) AS lo, MAX({quote(dimension)}) AS hi FROM ({inner}) AS _bounds"
+            )
+            if bounds.empty or bounds.iloc[0].isna().any():
+                return None, None, None
+            start, end = pd.to_datetime(bounds.iloc[0]['lo']), pd.to_datetime(bounds.iloc[0]['hi'])
+            granularity = self.granularity(start, end, self.max_points, user_query)
+
+        sql = self.plan_sql(sql_query, dialect.name, quote, dimension, measure, aggregate, granularity, max_rows, ordered)
+        if sql is None:
+            return None, None, None
+        frame = db_manager.execute_raw_sql(sql)
+        if frame.empty:
+            return None, None, None
+        if ordered:
+            frame[dimension] = pd.to_datetime(frame[dimension], errors='coerce')
+        return frame, granularity, sql
@@ -0,0 +1,205 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+import pandas as pd
+from chart_downsampler import ChartDownsampler
+from metrics import metrics
+from result_encoder import ResultEncoder
+
+TREND_KEYWORDS = ('trend', 'time', 'month', 'year', 'day', 'date')
+DISTRIBUTION_KEYWORDS = ('distribution', 'count', 'percentage', 'proportion')
+SHARE_KEYWORDS = ('percentage', 'proportion', 'share', 'breakdown')
+TEMPORAL_NAME_PATTERN = re.compile(r'date|time|day|month|year|week|quarter|hour|_at$|_on$|period', re.IGNORECASE)
+ID_NAME_PATTERN = re.compile(r'(^id$|_id$|^id_|uuid|_key$)', re.IGNORECASE)
+ISO_DATE_PATTERN = re.compile(r'^\d{4}-\d{2}(-\d{2})?([ T]\d{2}:\d{2}(:\d{2}(\.\d+)?)?)?')
+CATEGORY_MAX_UNIQUE = 50
+MAX_SERIES = 3
+CHART_TYPES = ('line', 'bar', 'pie', 'scatter')
+
+def query_intent(user_query):
+    """'trend', 'distribution' or None from the question's wording"""
+    query_lower = (user_query or "").lower()
+    if any(keyword in query_lower for keyword in TREND_KEYWORDS):
+        return 'trend'
+    if any(keyword in query_lower for keyword in DISTRIBUTION_KEYWORDS):
+        return 'distribution'
+    return None
+
+def unique_columns(df):
+    """df without repeated column names (e.g. both 'id's of SELECT * over a JOIN); the first one is kept"""
+    if df.columns.is_unique:
+        return df
+    return df.iloc[:, ~df.columns.duplicated()]
+
+def infer_roles(df):
+    """Role of every column: 'temporal', 'measure', 'categorical', 'id' or 'text'.
+
+    One pass over the columns using dtypes and a single vectorized nunique();
+    only the first non-null value of a text column is inspected to spot ISO
+    dates stored as strings (e.g. SQLite).
+    """
+    df = unique_columns(df)
+    # Only text columns need distinct counts; skip the (costly) numeric ones
+    unique_counts = df.select_dtypes(include=['object', 'string']).nunique(dropna=True)
+    roles = {}
+    for name in df.columns:
+        series = df[name]
+        kind = series.dtype.kind
+        label = str(name)
+        if kind == 'M':
+            roles[name] = 'temporal'
+        elif ID_NAME_PATTERN.search(label):
+            roles[name] = 'id'
+        elif kind in 'iu' and TEMPORAL_NAME_PATTERN.search(label):
+            roles[name] = 'temporal'  # e.g. year or month numbers
+        elif kind in 'iuf':
+            roles[name] = 'measure'
+        elif kind == 'b' or isinstance(series.dtype, pd.CategoricalDtype):
+            roles[name] = 'categorical'
+        else:
+            index = series.first_valid_index()
+            first = series[index] if index is not None else None
+            if isinstance(first, str) and ISO_DATE_PATTERN.match(first):
+                roles[name] = 'temporal'
+            elif hasattr(first, 'isoformat'):
+                roles[name] = 'temporal'  # date/datetime objects
+            elif unique_counts[name] <= CATEGORY_MAX_UNIQUE or unique_counts[name] < series.notna().sum():
+                roles[name] = 'categorical'
+            else:
+                roles[name] = 'text'  # Many distinct labels, e.g. names
+    return roles
+
+class ChartSpecEngine:
+    """Builds the compact chart spec sent with query results.
+
+    Column roles come from dtypes (infer_roles) and choose the chart: a
+    temporal column with measures is a line chart, a category or label with
+    a measure a bar (or pie for share/distribution questions), two measures
+    a scatter, and a lone category a bar of counts. The question's wording
+    only breaks ties. Data is downsampled to the point budget and specs are
+    memoized per result, so building one on every query is cheap; plotly
+    is never imported here.
+    """
+
+    def __init__(self, max_points=500, max_categories=20, pie_slices=8, cache_size=256):
+        self.downsample_options = {'max_points': max_points, 'max_categories': max_categories, 'pie_slices': pie_slices}
+        self.pie_slices = pie_slices
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _result_key(df, user_query, include_data, aggregation):
+        """Fingerprint of a result: shape, dtypes and a (vectorized) hash of every row, in order"""
+        try:
+            content = hash(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+        except TypeError:
+            content = hash(df.to_csv(index=False))
+        return (
+            tuple(map(str, df.columns)), tuple(map(str, df.dtypes)), len(df), content,
+            query_intent(user_query), user_query, include_data, repr(aggregation)
+        )
+
+    def choose(self, df, roles, user_query):
+        """(chart type, x column, series columns) or None when nothing is worth plotting"""
+        intent = query_intent(user_query)
+        query_lower = (user_query or "").lower()
+        temporal = [c for c in df.columns if roles[c] == 'temporal']
+        measures = [c for c in df.columns if roles[c] == 'measure']
+        categories = [c for c in df.columns if roles[c] == 'categorical']
+        # Ids only label the axis when nothing more descriptive exists
+        labels = categories + [c for c in df.columns if roles[c] in ('text', 'id')]
+
+        if temporal and measures and (intent == 'trend' or not labels):
+            return 'line', temporal[0], measures[:MAX_SERIES]
+        if labels and measures:
+            wants_share = intent == 'distribution' or any(keyword in query_lower for keyword in SHARE_KEYWORDS)
+            non_negative = bool((df[measures[0]].dropna() >= 0).all())
+            chart_type = 'pie' if wants_share and non_negative else 'bar'
+            return chart_type, labels[0], measures[:1]
+        if temporal and measures:
+            return 'line', temporal[0], measures[:MAX_SERIES]
+        if len(measures) >= 2:
+            return 'scatter', measures[0], measures[1:2]
+        if categories:
+            return 'bar', categories[0], []  # Counts per category
+        return None
+
+    def build(self, df, user_query, include_data=True, aggregated=None):
+        """Chart spec for a result, or None.
+
+        aggregated is a (frame, aggregation info) pair from ChartQueryPlanner
+        and replaces the raw rows. With include_data=False the spec refers to
+        the result's leading rows ('data_rows') when it plots them unchanged.
+        """
+        aggregation = None
+        if aggregated is not None:
+            df, aggregation = aggregated
+        if df is None or df.empty:
+            return None
+        df = unique_columns(df)
+
+        key = self._result_key(df, user_query, include_data, aggregation)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return self._cache[key]
+            self.misses += 1
+
+        started_at = time.monotonic()
+        spec = self._build(df, user_query, include_data, aggregation)
+        metrics.observe("chart.spec", (time.monotonic() - started_at) * 1000)
+        with self._lock:
+            self._cache[key] = spec
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return spec
+
+    def _build(self, df, user_query, include_data, aggregation):
+        roles = infer_roles(df)
+        choice = self.choose(df, roles, user_query)
+        if choice is None:
+            return None
+        chart_type, x_axis, series = choice
+
+        derived = None
+        if not series:
+            counts = df[x_axis].value_counts(dropna=False, sort=True)
+            frame = counts.rename('count').rename_axis(x_axis).reset_index()
+            series = ['count']
+            derived = {'aggregate': 'count', 'dimension': x_axis}
+        else:
+            frame = df[[x_axis] + series]
+            if chart_type == 'line' and df[x_axis].dtype.kind == 'O':
+                frame = frame.assign(**{x_axis: pd.to_datetime(frame[x_axis], errors='coerce')})
+
+        chart_frame, sampling = ChartDownsampler.downsample(frame, chart_type, x_axis, series[0], **self.downsample_options)
+        if chart_type == 'pie' and len(chart_frame) > self.pie_slices:
+            chart_type = 'bar'
+
+        spec = {
+            'type': chart_type,
+            'columns': [str(c) for c in chart_frame.columns],
+            'x_axis': str(x_axis),
+            'y_axis': str(series[0]),
+            'series': [str(c) for c in series],
+            'roles': {str(c): roles.get(c, 'measure') for c in chart_frame.columns},
+            'title': f"Analysis: {user_query[:50]}{'...' if len(user_query) > 50 else ''}"
+        }
+        if sampling:
+            spec['sampling'] = sampling
+        if aggregation or derived:
+            spec['aggregation'] = aggregation or derived
+        if include_data or sampling or aggregation or derived:
+            spec['data'] = ResultEncoder.to_records(chart_frame)
+        else:
+            spec['data_rows'] = len(chart_frame)
+        return spec
+
+    def get_stats(self):
+        with self._lock:
+            return {'cached_specs': len(self._cache), 'hits': self.hits, 'misses': self.misses}
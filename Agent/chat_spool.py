@@ -0,0 +1,311 @@
+import asyncio
+import os
+import random
+import sqlite3
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from metrics import metrics
+
+SPOOL_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chat_spool (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    pending_id TEXT UNIQUE NOT NULL,
+    endpoint TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    delivered_at REAL,
+    message_id TEXT,
+    chat_id TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS chat_spool_due ON chat_spool (status, next_attempt);
+"""
+
+class ChatSpool:
+    """Durable SQLite spool of chat saves waiting for delivery.
+
+    All access goes through one worker thread that owns the connection, so
+    callers on the event loop never block on disk I/O.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._executor = None
+        self._conn = None
+
+    def _open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(self.path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SPOOL_SCHEMA)
+        self._conn.commit()
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def open(self):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chat-spool")
+        await self._run(self._open)
+
+    async def close(self):
+        def close_conn():
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+        await self._run(close_conn)
+        self._executor.shutdown(wait=False)
+
+    def _add(self, pending_id, endpoint, payload):
+        self._conn.execute(
+            "INSERT INTO chat_spool (pending_id, endpoint, payload, created_at) VALUES (?, ?, ?, ?)",
+            (pending_id, endpoint, payload, time.time())
+        )
+        self._conn.commit()
+
+    async def add(self, pending_id, endpoint, payload):
+        await self._run(self._add, pending_id, endpoint, payload)
+
+    def _due(self, limit, now):
+        # A save to an existing chat waits while an earlier save to that chat is backing off
+        rows = self._conn.execute(
+            "SELECT seq, pending_id, endpoint, payload, attempts, created_at FROM chat_spool s "
+            "WHERE status = 'pending' AND next_attempt <= ? AND NOT EXISTS ("
+            "  SELECT 1 FROM chat_spool p WHERE p.status = 'pending' AND p.endpoint = s.endpoint"
+            "  AND p.endpoint != 'chat' AND p.seq < s.seq AND p.next_attempt > ?"
+            ") ORDER BY seq LIMIT ?",
+            (now, now, limit)
+        ).fetchall()
+        keys = ('seq', 'pending_id', 'endpoint', 'payload', 'attempts', 'created_at')
+        return [dict(zip(keys, row)) for row in rows]
+
+    async def due(self, limit):
+        """Oldest saves that are ready to send, in spool order"""
+        return await self._run(self._due, limit, time.time())
+
+    def _mark_delivered(self, seq, message_id, chat_id):
+        self._conn.execute(
+            "UPDATE chat_spool SET status = 'delivered', delivered_at = ?, payload = '', message_id = ?, chat_id = ?, error = NULL WHERE seq = ?",
+            (time.time(), message_id, chat_id, seq)
+        )
+        self._conn.commit()
+
+    async def mark_delivered(self, seq, message_id, chat_id):
+        await self._run(self._mark_delivered, seq, message_id, chat_id)
+
+    def _mark_retry(self, seq, attempts, next_attempt, error, failed):
+        self._conn.execute(
+            "UPDATE chat_spool SET status = ?, attempts = ?, next_attempt = ?, error = ? WHERE seq = ?",
+            ('failed' if failed else 'pending', attempts, next_attempt, error, seq)
+        )
+        self._conn.commit()
+
+    async def mark_retry(self, seq, attempts, next_attempt, error, failed=False):
+        await self._run(self._mark_retry, seq, attempts, next_attempt, error, failed)
+
+    def _status(self, pending_id):
+        row = self._conn.execute(
+            "SELECT status, attempts, message_id, chat_id, error FROM chat_spool WHERE pending_id = ?",
+            (pending_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(('status', 'attempts', 'message_id', 'chat_id', 'error'), row))
+
+    async def status(self, pending_id):
+        return await self._run(self._status, pending_id)
+
+    def _prune(self, older_than):
+        deleted = self._conn.execute(
+            "DELETE FROM chat_spool WHERE status = 'delivered' AND delivered_at < ?", (older_than,)
+        ).rowcount
+        self._conn.commit()
+        return deleted
+
+    async def prune(self, older_than):
+        return await self._run(self._prune, older_than)
+
+    def _counts(self):
+        return dict(self._conn.execute("SELECT status, COUNT(*) FROM chat_spool GROUP BY status").fetchall())
+
+    async def counts(self):
+        return await self._run(self._counts)
+
+class ChatSaveQueue:
+    """Write-behind delivery of chat saves to the NextJS API.
+
+    /chat spools each save to disk and answers straight away with a pending
+    id; a background task delivers spooled saves through the shared
+    NextJSClient. Each pass takes up to batch_size of the oldest ready saves
+    and sends them concurrently across chats but in order within a chat (a
+    save waiting to be retried holds back later saves to the same chat). 4xx
+    answers other than 408/429 are not retried; other failures back off
+    exponentially with jitter until max_attempts, after which the save is
+    kept as 'failed'. Saves left in the spool are delivered after a restart.
+    A caller that needs NextJS's answer (e.g. the id of a new chat) can wait
+    a bounded time for its save to be delivered.
+    """
+
+    def __init__(self, client, spool_path, batch_size=50, concurrency=4, flush_interval=1.0,
+                 max_attempts=8, backoff_base=1.0, backoff_max=300.0, retention=3600):
+        self.client = client
+        self.spool = ChatSpool(spool_path)
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retention = retention
+        self._wakeup = None
+        self._task = None
+        self._waiters = {}
+        self.delivered = 0
+        self.failed = 0
+        self.retried = 0
+
+    async def start(self):
+        if self._task is not None:
+            return
+        await self.spool.open()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        counts = await self.spool.counts()
+        if counts.get('pending'):
+            print(f"📮 Resuming delivery of {counts['pending']} spooled chat saves")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await self.spool.close()
+
+    async def enqueue(self, endpoint, payload, wait=0):
+        """Spool a save (already JSON-encoded); returns (pending id, outcome).
+
+        With wait > 0 the call waits up to that many seconds for delivery.
+        The outcome is the save's status (as from status()) once it was
+        delivered or given up on, and None while it is still pending.
+        """
+        await self.start()
+        pending_id = uuid.uuid4().hex
+        waiter = None
+        if wait > 0:
+            waiter = self._waiters[pending_id] = asyncio.get_running_loop().create_future()
+        await self.spool.add(pending_id, endpoint, payload)
+        metrics.increment("chat_spool.enqueued")
+        self._wakeup.set()
+        if waiter is None:
+            return pending_id, None
+        try:
+            return pending_id, await asyncio.wait_for(waiter, timeout=wait)
+        except asyncio.TimeoutError:
+            return pending_id, None
+        finally:
+            self._waiters.pop(pending_id, None)
+
+    def _settle(self, pending_id, status, attempts, message_id=None, chat_id=None, error=None):
+        waiter = self._waiters.pop(pending_id, None)
+        if waiter is not None and not waiter.done():
+            waiter.set_result({
+                'status': status, 'attempts': attempts, 'message_id': message_id, 'chat_id': chat_id, 'error': error
+            })
+
+    async def status(self, pending_id):
+        return await self.spool.status(pending_id)
+
+    async def _run(self):
+        last_prune = 0.0
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                while await self.flush() == self.batch_size:
+                    pass  # Backlog: keep draining without waiting
+                if time.time() - last_prune > 60:
+                    await self.spool.prune(time.time() - self.retention)
+                    last_prune = time.time()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Chat save delivery pass failed: {str(e)}")
+
+    async def flush(self):
+        """Deliver one batch of due saves; returns how many were delivered"""
+        entries = await self.spool.due(self.batch_size)
+        by_chat = {}
+        for entry in entries:
+            by_chat.setdefault(entry['endpoint'], []).append(entry)
+        # New-chat saves are independent of each other; messages to one chat stay ordered
+        groups = [[entry] for entry in by_chat.pop('chat', [])] + list(by_chat.values())
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def deliver_group(group):
+            delivered = 0
+            async with semaphore:
+                for entry in group:
+                    if not await self._deliver(entry):
+                        break
+                    delivered += 1
+            return delivered
+
+        return sum(await asyncio.gather(*(deliver_group(group) for group in groups)))
+
+    async def _deliver(self, entry):
+        error, retryable = None, True
+        try:
+            response = await self.client.request(entry['endpoint'], "POST", content=entry['payload'])
+            if response.status_code == 200:
+                body = response.json()
+                await self.spool.mark_delivered(entry['seq'], body.get('messageId'), body.get('chatId'))
+                self._settle(entry['pending_id'], 'delivered', entry['attempts'], body.get('messageId'), body.get('chatId'))
+                self.delivered += 1
+                metrics.increment("chat_spool.delivered")
+                metrics.observe("chat_spool.delivery_lag", (time.time() - entry['created_at']) * 1000)
+                return True
+            error = f"HTTP {response.status_code}: {response.text[:200]}"
+            retryable = response.status_code >= 500 or response.status_code in (408, 429)
+        except Exception as e:
+            # Includes unexpected answers (e.g. a body that isn't an object), so one bad save
+            # can't stall the others; it is dead-lettered as 'failed' after max_attempts
+            error = f"{type(e).__name__}: {str(e)}"
+
+        attempts = entry['attempts'] + 1
+        failed = not retryable or attempts >= self.max_attempts
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempts))
+        await self.spool.mark_retry(entry['seq'], attempts, time.time() + delay, error, failed)
+        if failed:
+            self._settle(entry['pending_id'], 'failed', attempts, error=error)
+            self.failed += 1
+            metrics.increment("chat_spool.failed")
+            print(f"❌ Giving up on chat save {entry['pending_id']} after {attempts} attempts: {error}")
+        else:
+            self.retried += 1
+            metrics.increment("chat_spool.retried")
+            print(f"🔁 Chat save {entry['pending_id']} failed ({error}), retrying in {delay:.1f}s")
+        return False
+
+    async def get_stats(self):
+        counts = await self.spool.counts() if self._task is not None else {}
+        return {
+            'running': self._task is not None,
+            'pending': counts.get('pending', 0),
+            'failed_total': counts.get('failed', 0),
+            'delivered': self.delivered,
+            'retried': self.retried,
+            'failed': self.failed
+        }
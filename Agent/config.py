@@ -21,9 +21,172 @@ class Config:
             'port': os.getenv('DB_PORT', '5432'),
             'database': os.getenv('DB_NAME'),
             'username': os.getenv('DB_USER'),
-            'password': os.getenv('DB_PASSWORD')
+            'password': os.getenv('DB_PASSWORD'),
+            # Connection pool (ignored where the driver has no pool sizing, e.g. SQLite)
+            'pool_size': int(os.getenv('DB_POOL_SIZE', '5')),
+            'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', '10')),
+            'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', '1800')),
+            'pool_pre_ping': os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true',
+            'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', '30')),
+            'pool_prewarm': int(os.getenv('DB_POOL_PREWARM', '2')),
+            'connect_timeout': int(os.getenv('DB_CONNECT_TIMEOUT', '10')),
+            'statement_timeout': int(os.getenv('DB_STATEMENT_TIMEOUT', '60'))
         }
     
+    @staticmethod
+    def get_query_cache_config():
+        """Load NL-to-SQL translation cache settings from environment variables"""
+        return {
+            'max_entries': int(os.getenv('QUERY_CACHE_SIZE', '256')),
+            'ttl_seconds': int(os.getenv('QUERY_CACHE_TTL', '3600'))
+        }
+
+    @staticmethod
+    def get_semantic_cache_config():
+        """Load semantic (paraphrase) cache settings from environment variables"""
+        return {
+            'similarity_threshold': float(os.getenv('SEMANTIC_CACHE_THRESHOLD', '0.92')),
+            'max_entries': int(os.getenv('SEMANTIC_CACHE_SIZE', '1000'))
+        }
+
+    @staticmethod
+    def get_answer_mode():
+        """How answer text is written: 'local' (summarized from the rows) or 'llm' (synthesized)"""
+        return os.getenv('ANSWER_MODE', 'local').lower()
+
+    @staticmethod
+    def get_executor_config():
+        """Load sizes of the LLM and database worker pools from environment variables"""
+        return {
+            'llm': {
+                'max_workers': int(os.getenv('LLM_POOL_WORKERS', '8')),
+                'max_queue': int(os.getenv('LLM_POOL_QUEUE', '32'))
+            },
+            'db': {
+                'max_workers': int(os.getenv('DB_POOL_WORKERS', '8')),
+                'max_queue': int(os.getenv('DB_POOL_QUEUE', '32'))
+            }
+        }
+
+    @staticmethod
+    def get_stream_batch_size():
+        """Rows per data_chunk event when results are streamed"""
+        return int(os.getenv('RESULT_BATCH_SIZE', '1000'))
+
+    @staticmethod
+    def get_batch_config():
+        """Limits for /query/batch: questions per request and how many run at once"""
+        return {
+            'max_questions': int(os.getenv('BATCH_MAX_QUESTIONS', '20')),
+            'concurrency': int(os.getenv('BATCH_CONCURRENCY', '6'))
+        }
+
+    @staticmethod
+    def get_llm_scheduler_config():
+        """Provider rate limits and concurrency for LLM calls (0 disables a rate limit)"""
+        return {
+            'requests_per_minute': int(os.getenv('LLM_REQUESTS_PER_MINUTE', '0')),
+            'tokens_per_minute': int(os.getenv('LLM_TOKENS_PER_MINUTE', '0')),
+            'max_in_flight': int(os.getenv('LLM_MAX_IN_FLIGHT', '8')),
+            'max_queue': int(os.getenv('LLM_MAX_QUEUE', '64')),
+            'max_wait': float(os.getenv('LLM_MAX_QUEUE_WAIT', '30'))
+        }
+
+    @staticmethod
+    def get_llm_resilience_config():
+        """Deadlines, retries, hedging and circuit breaker settings for LLM calls (seconds)"""
+        return {
+            'attempt_timeout': float(os.getenv('LLM_ATTEMPT_TIMEOUT', '30')),
+            'deadline': float(os.getenv('LLM_DEADLINE', '60')),
+            'max_retries': int(os.getenv('LLM_MAX_RETRIES', '2')),
+            'backoff_base': float(os.getenv('LLM_BACKOFF_BASE', '0.5')),
+            'backoff_max': float(os.getenv('LLM_BACKOFF_MAX', '8')),
+            'hedge': os.getenv('LLM_HEDGE', 'false').lower() == 'true',
+            'hedge_delay': float(os.getenv('LLM_HEDGE_DELAY', '2')),
+            'breaker_failures': int(os.getenv('LLM_BREAKER_FAILURES', '5')),
+            'breaker_reset': float(os.getenv('LLM_BREAKER_RESET', '30'))
+        }
+
+    @staticmethod
+    def get_nextjs_client_config():
+        """Connection pool settings for calls to the NextJS API"""
+        return {
+            'timeout': float(os.getenv('NEXTJS_TIMEOUT', '10')),
+            'max_connections': int(os.getenv('NEXTJS_MAX_CONNECTIONS', '20')),
+            'max_keepalive': int(os.getenv('NEXTJS_MAX_KEEPALIVE', '10')),
+            'keepalive_expiry': float(os.getenv('NEXTJS_KEEPALIVE_EXPIRY', '30')),
+            'http2': os.getenv('NEXTJS_HTTP2', 'false').lower() == 'true'
+        }
+
+    @staticmethod
+    def get_chat_spool_config():
+        """Write-behind chat save settings (CHAT_WRITE_BEHIND=false saves before answering)"""
+        return {
+            'enabled': os.getenv('CHAT_WRITE_BEHIND', 'true').lower() == 'true',
+            'spool_path': os.getenv('CHAT_SPOOL_PATH', '.chat_spool/spool.sqlite3'),
+            'batch_size': int(os.getenv('CHAT_SPOOL_BATCH_SIZE', '50')),
+            'concurrency': int(os.getenv('CHAT_SPOOL_CONCURRENCY', '4')),
+            'max_attempts': int(os.getenv('CHAT_SPOOL_MAX_ATTEMPTS', '8')),
+            'backoff_max': float(os.getenv('CHAT_SPOOL_BACKOFF_MAX', '300')),
+            'new_chat_wait': float(os.getenv('CHAT_NEW_CHAT_WAIT', '3'))
+        }
+
+    @staticmethod
+    def get_chart_config():
+        """Point budget for chart data: line points, bars, and pie slices (the rest is grouped as 'Other')"""
+        return {
+            'max_points': int(os.getenv('CHART_MAX_POINTS', '500')),
+            'max_categories': int(os.getenv('CHART_MAX_CATEGORIES', '20')),
+            'pie_slices': int(os.getenv('CHART_PIE_SLICES', '8'))
+        }
+
+    @staticmethod
+    def get_startup_config():
+        """Background warm-up after startup: models, the DB_* connection, query engine and seeded SQL caches"""
+        return {
+            'enabled': os.getenv('STARTUP_WARMUP', 'true').lower() == 'true',
+            'connect_db': os.getenv('STARTUP_CONNECT_DB', 'true').lower() == 'true',
+            'seed_queries': int(os.getenv('STARTUP_SEED_QUERIES', '0'))
+        }
+
+    @staticmethod
+    def get_paging_config():
+        """Load result paging limits from environment variables (0 disables a limit)"""
+        return {
+            'page_size': int(os.getenv('QUERY_PAGE_SIZE', '500')),
+            'max_rows': int(os.getenv('QUERY_MAX_ROWS', '100000')),
+            'ttl_seconds': int(os.getenv('QUERY_PAGE_TTL', '1800'))
+        }
+
+    @staticmethod
+    def get_registry_config():
+        """Load multi-session engine sharing limits from environment variables"""
+        return {
+            'max_total_connections': int(os.getenv('DB_MAX_TOTAL_CONNECTIONS', '100')),
+            'engine_idle_timeout': int(os.getenv('ENGINE_IDLE_TIMEOUT', '600')),
+            'max_sessions': int(os.getenv('MAX_SESSIONS', '500')),
+            'session_idle_timeout': int(os.getenv('SESSION_IDLE_TIMEOUT', '1800'))
+        }
+
+    @staticmethod
+    def get_schema_poll_interval():
+        """Seconds between background schema change checks (0 disables polling)"""
+        return int(os.getenv('SCHEMA_POLL_INTERVAL', '0'))
+
+    @staticmethod
+    def get_table_retrieval_config():
+        """Load relevant-table retrieval settings from environment variables (0 disables a limit)"""
+        return {
+            'top_k': int(os.getenv('TABLE_RETRIEVAL_TOP_K', '8')),
+            'token_budget': int(os.getenv('SCHEMA_TOKEN_BUDGET', '6000')),
+            'use_embeddings': os.getenv('TABLE_RETRIEVAL_EMBEDDINGS', 'true').lower() == 'true'
+        }
+
+    @staticmethod
+    def get_schema_cache_dir():
+        """Directory for persisted schema snapshots (empty disables them)"""
+        return os.getenv('SCHEMA_CACHE_DIR', '.schema_cache')
+
     @staticmethod
     def get_sample_queries():
         """Get sample queries for the UI"""
@@ -50,12 +213,117 @@ DB_NAME=your_database_name
 DB_USER=your_username
 DB_PASSWORD=your_password
 
+# Connection pool: recycle/timeouts in seconds, pre-warmed connections opened at connect
+# DB_POOL_SIZE=5
+# DB_MAX_OVERFLOW=10
+# DB_POOL_RECYCLE=1800
+# DB_POOL_PRE_PING=true
+# DB_POOL_TIMEOUT=30
+# DB_POOL_PREWARM=2
+# DB_CONNECT_TIMEOUT=10
+# DB_STATEMENT_TIMEOUT=60
+
 # For SQLite (simpler setup)
 # DB_TYPE=sqlite
 # DB_NAME=path/to/your/database.db
 
 # Note: If your password contains special characters like @, #, %, etc.
 # they will be automatically URL-encoded by the application
+
+# Query cache (set QUERY_CACHE_SIZE=0 to disable)
+# QUERY_CACHE_SIZE=256
+# QUERY_CACHE_TTL=3600
+
+# Semantic cache for paraphrased questions (set SEMANTIC_CACHE_SIZE=0 to disable)
+# SEMANTIC_CACHE_THRESHOLD=0.92
+# SEMANTIC_CACHE_SIZE=1000
+
+# Answer text: 'local' summarizes the rows, 'llm' adds a synthesis call
+# ANSWER_MODE=local
+
+# Worker pools for blocking LLM and database calls (503 when running + queued is full)
+# LLM_POOL_WORKERS=8
+# LLM_POOL_QUEUE=32
+# DB_POOL_WORKERS=8
+# DB_POOL_QUEUE=32
+
+# Rows per data_chunk event when /query streams results (stream_rows=true)
+# RESULT_BATCH_SIZE=1000
+
+# /query/batch: questions accepted per request and answered concurrently
+# BATCH_MAX_QUESTIONS=20
+# BATCH_CONCURRENCY=6
+
+# LLM scheduler: match the provider quota (0 = no limit); interactive questions go before batch work
+# LLM_REQUESTS_PER_MINUTE=0
+# LLM_TOKENS_PER_MINUTE=0
+# LLM_MAX_IN_FLIGHT=8
+# LLM_MAX_QUEUE=64
+# LLM_MAX_QUEUE_WAIT=30
+
+# NextJS persistence API: one keep-alive connection pool for the app's lifetime
+# NEXTJS_TIMEOUT=10
+# NEXTJS_MAX_CONNECTIONS=20
+# NEXTJS_MAX_KEEPALIVE=10
+# NEXTJS_KEEPALIVE_EXPIRY=30
+# HTTP/2 needs the h2 package (pip install httpx[http2])
+# NEXTJS_HTTP2=false
+
+# Chat saves are spooled to disk and delivered in the background so /chat doesn't wait on NextJS
+# CHAT_WRITE_BEHIND=true
+# CHAT_SPOOL_PATH=.chat_spool/spool.sqlite3
+# CHAT_SPOOL_BATCH_SIZE=50
+# CHAT_SPOOL_CONCURRENCY=4
+# CHAT_SPOOL_MAX_ATTEMPTS=8
+# CHAT_SPOOL_BACKOFF_MAX=300
+# A new chat's save is awaited this many seconds so /chat can return NextJS's chat id
+# CHAT_NEW_CHAT_WAIT=3
+
+# LLM call deadlines: per attempt and overall (including retries with jittered backoff)
+# LLM_ATTEMPT_TIMEOUT=30
+# LLM_DEADLINE=60
+# LLM_MAX_RETRIES=2
+# LLM_BACKOFF_BASE=0.5
+# LLM_BACKOFF_MAX=8
+# Send a second request when the first runs past the recent p95 latency (LLM_HEDGE_DELAY until measured)
+# LLM_HEDGE=false
+# LLM_HEDGE_DELAY=2
+# Fail fast for LLM_BREAKER_RESET seconds after this many consecutive provider errors (0 = off)
+# LLM_BREAKER_FAILURES=5
+# LLM_BREAKER_RESET=30
+
+# Chart data is downsampled to these budgets (LTTB / min-max envelope for lines, top-N + 'Other' for bars and pies)
+# CHART_MAX_POINTS=500
+# CHART_MAX_CATEGORIES=20
+# CHART_PIE_SLICES=8
+
+# Warm up models, the DB_* connection and the query engine in the background after startup
+# (/health?ready=true answers 503 until done); seeding runs sample questions through the LLM
+# STARTUP_WARMUP=true
+# STARTUP_CONNECT_DB=true
+# STARTUP_SEED_QUERIES=0
+
+# Result paging: rows in the first page, hard cap on rows per query, page token lifetime
+# QUERY_PAGE_SIZE=500
+# QUERY_MAX_ROWS=100000
+# QUERY_PAGE_TTL=1800
+
+# Schema snapshots let reconnects skip introspection until tables or columns change
+# SCHEMA_CACHE_DIR=.schema_cache
+# Check for added/dropped/altered tables in the background every N seconds (0 = only via /refresh-schema)
+# SCHEMA_POLL_INTERVAL=0
+
+# Relevant-table retrieval: at most TOP_K tables (plus their foreign-key targets) within
+# SCHEMA_TOKEN_BUDGET prompt tokens; without embeddings tables are ranked by keywords (BM25)
+# TABLE_RETRIEVAL_TOP_K=8
+# SCHEMA_TOKEN_BUDGET=6000
+# TABLE_RETRIEVAL_EMBEDDINGS=true
+
+# Sessions and shared engines: sessions on the same connection string share one pool
+# DB_MAX_TOTAL_CONNECTIONS=100
+# ENGINE_IDLE_TIMEOUT=600
+# MAX_SESSIONS=500
+# SESSION_IDLE_TIMEOUT=1800
         """
     
     @staticmethod
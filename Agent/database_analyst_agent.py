@@ -1,21 +1,29 @@
 from database_manager import DatabaseManager
 from llm_manager import LLMManager
 from query_processor import QueryProcessor
-# from visualization_manager import VisualizationManager
+from query_cache import QueryCache
+from semantic_cache import SemanticQueryCache
+from result_pager import ResultPager
+from chart_query_planner import ChartQueryPlanner
+from chart_spec import CHART_TYPES
 from config import Config
 
 class DatabaseAnalystAgent:
     """Main agent class that orchestrates all components"""
     
-    def __init__(self):
-        self.database_manager = DatabaseManager()
+    def __init__(self, embedder=None, engine_registry=None, query_cache=None, semantic_cache=None, result_pager=None):
+        self.database_manager = DatabaseManager(engine_registry, embedder=embedder)
         self.query_processor = QueryProcessor(self.database_manager)
-        # self.visualization_manager = VisualizationManager()
+        # Caches may be shared between agents; entries are keyed by schema fingerprint
+        self.query_cache = query_cache or QueryCache(**Config.get_query_cache_config())
+        self.semantic_cache = semantic_cache or SemanticQueryCache(embedder=embedder, **Config.get_semantic_cache_config())
+        self.result_pager = result_pager or ResultPager(**Config.get_paging_config())
+        self.chart_planner = ChartQueryPlanner(Config.get_chart_config()['max_points'])
         
         self._models_initialized = False
     
     def _ensure_models_initialized(self):
-        """Lazily initialize LLM and embedding models when first needed"""
+        """Lazily initialize the process-wide LLM and embedding models when first needed"""
         if self._models_initialized:
             return
         try:
@@ -29,6 +37,16 @@ class DatabaseAnalystAgent:
         self._ensure_models_initialized()
         self.database_manager.ensure_query_engine()
     
+    def warm_up_models(self):
+        """Initialize the LLM and embedding models ahead of the first question"""
+        self._ensure_models_initialized()
+    
+    def warm_up_query_engine(self):
+        """Build the query engine and embed the table summaries ahead of the first question"""
+        self._ensure_query_engine()
+        if self.database_manager.table_retriever is not None:
+            self.database_manager.table_retriever.warm_up()
+    
     def connect_from_env(self):
         """Connect to database using environment variables"""
         config = Config.get_db_config()
@@ -48,36 +66,167 @@ class DatabaseAnalystAgent:
         """Get information about database tables"""
         return self.database_manager.get_table_info()
     
-    def execute_natural_language_query(self, user_query):
-        """Execute natural language query and return results with visualization"""
-        # Ensure LLM models and query engine are ready
-        self._ensure_query_engine()
+    def execute_natural_language_query(self, user_query, synthesize=None):
+        """Execute natural language query and return results with visualization
+
+        synthesize: have the LLM write the answer text instead of the local
+        summarizer. Defaults to the ANSWER_MODE setting.
+        """
+        plan = self.prepare_query(user_query, synthesize)
+        result = self.execute_query_plan(plan)
+        return self.synthesize_answer(plan, result)
+    
+    @staticmethod
+    def resolve_answer_mode(synthesize=None):
+        """Whether the LLM writes the answer text; None means the ANSWER_MODE setting"""
+        if synthesize is None:
+            return Config.get_answer_mode() == 'llm'
+        return synthesize
+    
+    def coalescing_key(self, user_query):
+        """Key under which identical concurrent questions share one execution, or None"""
+        fingerprint = self.database_manager.schema_fingerprint
+        if not fingerprint:
+            return None
+        # The fingerprint covers the database URL and schema, so sessions on the same database share
+        return (fingerprint, self.query_cache.normalize_question(user_query))
+    
+    def prepare_query(self, user_query, synthesize=None):
+        """LLM-bound phase: validate the question and resolve its SQL (cache or LLM).
+
+        Returns a plan dict for execute_query_plan. If the pipeline already
+        finished (invalid question, explanation instead of SQL, LLM error),
+        plan['result'] holds the final result.
+        """
+        plan = {
+            'user_query': user_query,
+            'synthesize': self.resolve_answer_mode(synthesize),
+            'schema_fingerprint': self.database_manager.schema_fingerprint,
+            'sql_query': None,
+            'cached': False,
+            'question_vector': None,
+            'result': None
+        }
         
         # Validate query
         is_valid, message = self.query_processor.validate_query(user_query)
         if not is_valid:
-            return {
+            plan['result'] = {
                 'response': f"Invalid query: {message}",
                 'sql_query': None,
                 'data': None,
-                'success': False,
-                'visualization': None
+                'success': False
             }
+            return plan
         
-        # Execute query
-        result = self.query_processor.execute_natural_language_query(user_query)
+        # Reuse SQL generated earlier for the same question against the same schema
+        schema_fingerprint = plan['schema_fingerprint']
+        cached_sql = self.query_cache.get(user_query, schema_fingerprint)
+        if not cached_sql and self.semantic_cache.max_entries > 0:
+            # Paraphrases of earlier questions reuse their SQL (needs the embedding model)
+            self._ensure_models_initialized()
+            cached_sql, _, plan['question_vector'] = self.semantic_cache.lookup(user_query, schema_fingerprint)
+            if cached_sql:
+                self.query_cache.put(user_query, schema_fingerprint, cached_sql)
         
-        # Add visualization if data is available
-        if result['success'] and result['data'] is not None:
-            # visualization = self.visualization_manager.create_visualization(
-            #     result['data'], user_query
-            # )
-            result['visualization'] = None  # Placeholder until visualization_manager is available
+        if cached_sql:
+            print(f"⚡ Query cache hit: {cached_sql}")
+            plan['sql_query'] = cached_sql
+            plan['cached'] = True
+            return plan
+        
+        # Ensure LLM models and query engine are ready
+        self._ensure_query_engine()
+        
+        generated = self.query_processor.generate_sql(user_query)
+        if generated['sql_query'] is None:
+            plan['result'] = generated
+        else:
+            plan['sql_query'] = generated['sql_query']
+        return plan
+    
+    def execute_query_plan(self, plan):
+        """Database-bound phase: run the plan's SQL once and summarize the rows locally"""
+        if plan['result'] is not None:
+            result = dict(plan['result'])
         else:
-            result['visualization'] = None
+            result = self.query_processor.execute_sql_query(
+                plan['sql_query'], plan['user_query'], pager=self.result_pager
+            )
+            
+            if result['success']:
+                self._remember_sql(plan)
         
+        result['cached'] = plan['cached']
+        
+        # Trend/distribution charts are aggregated in the database when only a page of rows was fetched
+        result['chart_data'] = None
+        if result['success'] and result['data'] is not None:
+            try:
+                result['chart_data'] = self.chart_planner.build(
+                    plan['user_query'], plan['sql_query'], result['data'], self.database_manager,
+                    complete=not result.get('continuation_token'), max_rows=self.result_pager.max_rows
+                )
+            except Exception as e:
+                print(f"⚠️ Could not prepare chart aggregation: {str(e)}")
+        
+        # The chart spec is built from data and chart_data when the result is sent (ChartSpecEngine)
+        result['visualization'] = None
+        
+        return result
+    
+    def stream_query_plan(self, plan, batch_size=None):
+        """Database-bound phase for large results: yield the plan's rows as DataFrame batches
+
+        Uses a server-side cursor so memory stays bounded by batch_size. Only
+        valid for plans whose SQL is resolved (plan['result'] is None).
+        """
+        batch_size = batch_size or Config.get_stream_batch_size()
+        dialect = self.database_manager.engine.dialect.name
+        sql_query = ResultPager.enforce_limit(plan['sql_query'], self.result_pager.max_rows, dialect)
+        yield from self.database_manager.stream_raw_sql(sql_query, batch_size)
+        # Only reached once every batch was read: an SQL error, or a consumer
+        # that stops early, leaves the generator at the yield above
+        self._remember_sql(plan)
+    
+    def _remember_sql(self, plan):
+        """Cache a plan's generated SQL; call only after it executed without errors"""
+        if plan['cached'] or not plan['sql_query']:
+            return
+        fingerprint = plan['schema_fingerprint']
+        self.query_cache.put(plan['user_query'], fingerprint, plan['sql_query'])
+        self.semantic_cache.add(plan['user_query'], fingerprint, plan['sql_query'], plan['question_vector'])
+    
+    def synthesize_answer(self, plan, result):
+        """Optional LLM-bound phase: replace the local summary with an LLM-written answer"""
+        if plan['synthesize'] and result['success'] and result['data'] is not None:
+            self._ensure_models_initialized()
+            result['response'] = self.query_processor.synthesize_response(
+                plan['user_query'], result['sql_query'], result['data']
+            )
         return result
     
+    def get_result_page(self, query_id, continuation_token):
+        """Fetch a later page of an earlier query result"""
+        df, next_token = self.result_pager.fetch_page(query_id, continuation_token, self.database_manager)
+        return {
+            'query_id': query_id,
+            'data': df,
+            'row_count': len(df),
+            'continuation_token': next_token,
+            'has_more': next_token is not None
+        }
+    
+    def stream_answer(self, plan, result):
+        """Yield the answer text; streams tokens from the LLM when synthesis is requested"""
+        if plan['synthesize'] and result['success'] and result['data'] is not None:
+            self._ensure_models_initialized()
+            yield from self.query_processor.stream_synthesized_response(
+                plan['user_query'], result['sql_query'], result['data']
+            )
+        elif result['response']:
+            yield result['response']
+    
     def get_query_suggestions(self, partial_query=""):
         """Get query suggestions"""
         if partial_query:
@@ -93,9 +242,22 @@ class DatabaseAnalystAgent:
             'tables': self.database_manager.tables
         }
     
-    def refresh_schema(self):
-        """Refresh database schema after data import"""
-        return self.database_manager.refresh_schema()
+    def refresh_schema(self, full=False):
+        """Refresh database schema after data import (incrementally unless full is set)"""
+        old_fingerprint = self.database_manager.schema_fingerprint
+        result = self.database_manager.refresh_schema(full=full)
+        if self.database_manager.schema_fingerprint != old_fingerprint:
+            # Cached SQL may reference tables or columns that no longer exist
+            self.query_cache.invalidate(old_fingerprint)
+            self.semantic_cache.invalidate(old_fingerprint)
+        return result
+    
+    def get_cache_stats(self):
+        """Get query cache hit/miss statistics"""
+        return {
+            'translation': self.query_cache.get_stats(),
+            'semantic': self.semantic_cache.get_stats()
+        }
     
     def disconnect(self):
         """Disconnect from database"""
@@ -115,6 +277,5 @@ class DatabaseAnalystAgent:
             ],
             'supported_databases': ["PostgreSQL", "MySQL", "SQLite", "SQL Server"],
             'models': LLMManager.get_model_info(),
-            # 'chart_types': VisualizationManager.get_supported_chart_types()
-            'chart_types': []  # Placeholder until visualization_manager is available
+            'chart_types': list(CHART_TYPES)
         }
\ No newline at end of file
@@ -1,20 +1,47 @@
 import pandas as pd
-from sqlalchemy import create_engine, text, inspect
-from llama_index.core import SQLDatabase, Settings
-from llama_index.core.query_engine import NLSQLTableQueryEngine
+from sqlalchemy import create_engine, text, inspect, event
+from sqlalchemy.engine import make_url
 from urllib.parse import quote_plus
+from engine_registry import ConnectionLimitError
+from table_retriever import SchemaTableRetriever
+from catalog_introspector import CatalogIntrospector
+from schema_snapshot import (SNAPSHOT_FORMAT, SchemaSnapshotStore, catalog_version, connection_key,
+                             diff_snapshots, introspect_schema)
+from config import Config
+from metrics import metrics
+from contextlib import contextmanager
+import hashlib
+import json
+import time
 import warnings
 warnings.filterwarnings('ignore')
 
+POOL_CONFIG_KEYS = ('pool_size', 'max_overflow', 'pool_recycle', 'pool_pre_ping', 'pool_timeout',
+                    'pool_prewarm', 'connect_timeout', 'statement_timeout')
+
 class DatabaseManager:
     """Handles database connections and operations"""
     
-    def __init__(self):
+    def __init__(self, engine_registry=None, pool_config=None, snapshot_store=None, embedder=None):
+        self.engine_registry = engine_registry
+        self.embedder = embedder  # Used to rank tables; defaults to the configured embedding model
+        self.snapshot_store = snapshot_store or SchemaSnapshotStore(Config.get_schema_cache_dir())
+        db_config = pool_config or Config.get_db_config()
+        self.pool_config = {key: db_config[key] for key in POOL_CONFIG_KEYS if key in db_config}
+        self.engine_key = None  # Fingerprint of the registry engine in use
         self.engine = None
         self.sql_database = None
         self.query_engine = None
+        self.table_retriever = None
         self.tables = []
+        self.table_columns = {}
+        self.primary_keys = {}
+        self.row_estimates = {}
+        self.schema_snapshot = None
+        self.loaded_catalog_version = None
+        self.schema_fingerprint = None
         self.connection_status = False
+        self.sql_execution_count = 0  # Database round-trips made for user queries
     
     def create_connection_string(self, db_type, host, port, database, username, password):
         """Create connection string based on database type with proper URL encoding"""
@@ -32,70 +59,117 @@ class DatabaseManager:
         }
         return connection_strings.get(db_type)
     
+    def build_engine_options(self, connection_string):
+        """create_engine() keyword arguments for the configured pool and timeouts"""
+        backend = make_url(connection_string).get_backend_name()
+        config = self.pool_config
+        connect_timeout = config.get('connect_timeout')
+        statement_timeout = config.get('statement_timeout')
+        
+        if backend == 'sqlite':
+            # SQLite has no server: only the lock wait timeout applies
+            return {'connect_args': {'timeout': connect_timeout}} if connect_timeout else {}
+        
+        options = {
+            'pool_size': config.get('pool_size', 5),
+            'max_overflow': config.get('max_overflow', 10),
+            'pool_recycle': config.get('pool_recycle', -1),
+            'pool_pre_ping': config.get('pool_pre_ping', True),
+            'pool_timeout': config.get('pool_timeout', 30)
+        }
+        connect_args = {}
+        if backend == 'postgresql':
+            if connect_timeout:
+                connect_args['connect_timeout'] = connect_timeout
+            if statement_timeout:
+                connect_args['options'] = f"-c statement_timeout={statement_timeout * 1000}"
+        elif backend == 'mysql':
+            if connect_timeout:
+                connect_args['connect_timeout'] = connect_timeout
+            if statement_timeout:
+                connect_args['init_command'] = f"SET SESSION MAX_EXECUTION_TIME={statement_timeout * 1000}"
+        elif backend == 'mssql':
+            if connect_timeout:
+                connect_args['timeout'] = connect_timeout
+        if connect_args:
+            options['connect_args'] = connect_args
+        return options
+    
+    @staticmethod
+    def _instrument_engine(engine):
+        """Count pool connects and invalidations (e.g. failed pre-pings) in the metrics registry"""
+        if event.contains(engine, 'connect', _on_pool_connect):
+            return
+        event.listen(engine, 'connect', _on_pool_connect)
+        event.listen(engine, 'invalidate', _on_pool_invalidate)
+    
+    @contextmanager
+    def _connect(self):
+        """Check out a pooled connection, recording how long the checkout waited"""
+        started_at = time.monotonic()
+        conn = self.engine.connect()
+        metrics.observe('db.pool_checkout_wait', (time.monotonic() - started_at) * 1000)
+        try:
+            yield conn
+        finally:
+            conn.close()
+    
+    def prewarm_pool(self, count=None):
+        """Open up to `count` pooled connections now so the first queries don't pay connection setup"""
+        count = self.pool_config.get('pool_prewarm', 0) if count is None else count
+        pool = self.engine.pool
+        if hasattr(pool, 'size'):
+            count = min(count, pool.size())
+        if hasattr(pool, 'checkedin'):
+            count -= pool.checkedin()  # Shared engines may already be warm
+        
+        connections = []
+        try:
+            for _ in range(max(count, 1)):
+                connections.append(self.engine.connect())
+            # The first connection doubles as the connectivity test
+            connections[0].execute(text("SELECT 1"))
+        finally:
+            for conn in connections:
+                conn.close()
+        return len(connections)
+    
     def connect_database(self, connection_string):
         """Connect to database and initialize LlamaIndex components"""
         try:
-            # Create SQLAlchemy engine
-            self.engine = create_engine(connection_string)
+            # Release the previous engine so reconnects don't leak pools
+            self._release_engine()
             
-            # Test connection
-            with self.engine.connect() as conn:
-                conn.execute(text("SELECT 1"))
+            # Create SQLAlchemy engine, shared through the registry when available
+            engine_options = self.build_engine_options(connection_string)
+            if self.engine_registry is not None:
+                self.engine_key, self.engine = self.engine_registry.acquire(connection_string, engine_options)
+            else:
+                self.engine = create_engine(connection_string, **engine_options)
+            self._instrument_engine(self.engine)
             
-            # Get table names first
-            inspector = inspect(self.engine)
-            # For PostgreSQL, specify the public schema explicitly
-            try:
-                self.tables = inspector.get_table_names(schema='public')
-                print(f"📋 Found {len(self.tables)} tables in 'public' schema: {self.tables}")
-            except:
-                # Fallback for other databases without schemas
-                self.tables = inspector.get_table_names()
-                print(f"📋 Found {len(self.tables)} tables: {self.tables}")
+            # Test connection and pre-warm the pool
+            started_at = time.monotonic()
+            warmed = self.prewarm_pool()
+            metrics.observe('db.pool_prewarm', (time.monotonic() - started_at) * 1000)
+            print(f"🔥 Pre-warmed {warmed} database connection(s)")
+            
+            # Load the schema from the on-disk snapshot unless the catalog changed
+            self._load_schema()
             
             if not self.tables:
                 return False, "❌ No tables found in the database"
             
-            # Create LlamaIndex SQL Database with all tables and include sample rows
-            # This ensures the schema is properly detected with all columns
-            self.sql_database = SQLDatabase(
-                self.engine,
-                include_tables=self.tables,
-                sample_rows_in_table_info=3,  # Include 3 sample rows to help LLM understand the data
-                view_support=False  # Disable views to focus on tables only
-            )
-            
-            # Force refresh table info to ensure latest schema is loaded
-            self.sql_database._all_table_names = None
-            self.sql_database._usable_tables = set(self.tables)
-            
-            # Print the actual table info that will be used for debugging
-            print("\n=== Table Info for LLM ===")
-            for table in self.tables:
-                try:
-                    table_info = self.sql_database.get_single_table_info(table)
-                    print(f"\nTable '{table}' schema info:")
-                    print(table_info[:500])  # Print first 500 chars
-                except Exception as e:
-                    print(f"Could not get table info for '{table}': {e}")
-            print("\n==========================\n")
-            
-            # Print schema info for debugging
-            print("\n=== Database Schema Loaded ===")
-            for table in self.tables:
-                try:
-                    columns = inspector.get_columns(table)
-                    col_names = [col['name'] for col in columns]
-                    print(f"Table '{table}': {', '.join(col_names)}")
-                except Exception as e:
-                    print(f"Could not read columns for '{table}': {e}")
-            print("==============================\n")
-            
             self.connection_status = True
             return True, f"✅ Connected successfully! Found {len(self.tables)} tables."
             
+        except ConnectionLimitError:
+            self.connection_status = False
+            self._release_engine()
+            raise
         except Exception as e:
             self.connection_status = False
+            self._release_engine()
             return False, f"❌ Connection failed: {str(e)}"
     
     def connect_from_config(self, config):
@@ -114,94 +188,251 @@ class DatabaseManager:
             config['db_type'], config['host'], config['port'], 
             config['database'], config['username'], config['password']
         )
+        self.pool_config.update({key: config[key] for key in POOL_CONFIG_KEYS if config.get(key) is not None})
         
         return self.connect_database(connection_string)
     
     def get_table_info(self):
-        """Get information about all tables"""
+        """Get information about all tables (served from the loaded schema, no database round-trips)"""
         if not self.connection_status:
             return []
         
-        table_info = []
-        inspector = inspect(self.engine)
-        
-        for table_name in self.tables:
-            try:
-                columns = inspector.get_columns(table_name)
-                column_info = [f"{col['name']} ({col['type']})" for col in columns]
-                table_info.append({
-                    'table': table_name,
-                    'columns': column_info,
-                    'column_count': len(column_info)
-                })
-            except Exception as e:
-                # Note: In a real app, you might want to use proper logging
-                print(f"Could not get info for table {table_name}: {str(e)}")
-        
-        return table_info
+        return [
+            {
+                'table': table_name,
+                'columns': [f"{name} ({col_type})" for name, col_type in self.table_columns.get(table_name, [])],
+                'column_count': len(self.table_columns.get(table_name, [])),
+                'row_estimate': self.row_estimates.get(table_name)
+            }
+            for table_name in self.tables
+        ]
     
     def ensure_query_engine(self):
         """Create query engine lazily (requires LLM Settings to be initialized first)"""
         if self.query_engine is None and self.sql_database is not None:
-            self.query_engine = NLSQLTableQueryEngine(
+            from llama_index.core.query_engine import SQLTableRetrieverQueryEngine
+            # Only the tables relevant to each question go into the prompt
+            self.table_retriever = SchemaTableRetriever(
+                self.sql_database,
+                self.tables,
+                embedder=self.embedder,
+                **Config.get_table_retrieval_config()
+            )
+            # sql_only: the engine only generates SQL; QueryProcessor executes it
+            # exactly once via execute_raw_sql
+            self.query_engine = SQLTableRetrieverQueryEngine(
                 sql_database=self.sql_database,
-                tables=self.tables,
+                table_retriever=self.table_retriever,
                 verbose=True,
-                synthesize_response=True
+                sql_only=True,
+                synthesize_response=False
             )
         return self.query_engine
     
-    def execute_raw_sql(self, sql_query):
-        """Execute raw SQL query and return DataFrame"""
+    def execute_raw_sql(self, sql_query, params=None):
+        """Execute raw SQL query and return DataFrame.
+
+        Errors are raised rather than returned as an empty frame, so a failed
+        statement is never mistaken for a query that matched no rows.
+        """
         try:
-            with self.engine.connect() as conn:
-                df = pd.read_sql(sql_query, conn)
+            self.sql_execution_count += 1
+            metrics.increment("db.sql_executions")
+            with self._connect() as conn:
+                if params:
+                    df = pd.read_sql(text(sql_query), conn, params=params)
+                else:
+                    df = pd.read_sql(sql_query, conn)
             return df
         except Exception as e:
             print(f"Error executing SQL: {str(e)}")
-            return pd.DataFrame()
+            raise
+    
+    def get_primary_key(self, table_name):
+        """Single-column primary key of a table, or None (cached per connection)"""
+        if table_name not in self.tables:
+            return None
+        if table_name not in self.primary_keys:
+            try:
+                columns = inspect(self.engine).get_pk_constraint(table_name).get('constrained_columns') or []
+            except Exception as e:
+                print(f"Could not read primary key for '{table_name}': {e}")
+                columns = []
+            self.primary_keys[table_name] = columns[0] if len(columns) == 1 else None
+        return self.primary_keys[table_name]
+    
+    def stream_raw_sql(self, sql_query, batch_size=1000):
+        """Execute SQL with a server-side cursor, yielding DataFrames of at most batch_size rows.
+
+        Only one batch is held in memory at a time regardless of result size.
+        At least one (possibly empty) DataFrame is yielded so callers always
+        see the column names. Errors are raised to the caller.
+        """
+        self.sql_execution_count += 1
+        metrics.increment("db.sql_executions")
+        with self._connect() as conn:
+            result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(text(sql_query))
+            columns = list(result.keys())
+            yielded = False
+            for rows in result.partitions(batch_size):
+                yielded = True
+                yield pd.DataFrame.from_records(rows, columns=columns)
+            if not yielded:
+                yield pd.DataFrame(columns=columns)
     
-    def refresh_schema(self):
-        """Refresh the database schema and query engine (useful after data imports)"""
+    def refresh_schema(self, full=False):
+        """Refresh the database schema (useful after data imports).
+
+        By default only tables that were added, dropped or altered are
+        re-read and the query engine stays warm; full=True re-introspects
+        everything.
+        """
         if not self.connection_status or not self.engine:
             return False, "❌ Not connected to database"
         
         try:
-            # Re-inspect tables
-            inspector = inspect(self.engine)
-            self.tables = inspector.get_table_names()
+            if full:
+                # Re-introspect and replace the stored snapshot
+                self._load_schema(force=True)
+                return True, "✅ Schema refreshed successfully"
             
-            # Recreate SQL Database with refreshed schema
-            self.sql_database = SQLDatabase(
-                self.engine,
-                include_tables=self.tables,
-                sample_rows_in_table_info=2
+            changes = self.refresh_schema_incremental()
+            if not any(changes.values()):
+                return True, "✅ Schema is already up to date"
+            return True, (
+                f"✅ Schema refreshed: {len(changes['added'])} added, "
+                f"{len(changes['dropped'])} dropped, {len(changes['altered'])} altered"
             )
             
-            # Reset query engine so it gets recreated lazily on next query
-            self.query_engine = None
-            
-            print("\n=== Schema Refreshed ===")
-            for table in self.tables:
-                try:
-                    columns = inspector.get_columns(table)
-                    col_names = [col['name'] for col in columns]
-                    print(f"Table '{table}': {', '.join(col_names)}")
-                except Exception as e:
-                    print(f"Could not read columns for '{table}': {e}")
-            print("========================\n")
-            
-            return True, "✅ Schema refreshed successfully"
-            
         except Exception as e:
             return False, f"❌ Failed to refresh schema: {str(e)}"
     
-    def disconnect(self):
-        """Disconnect from database"""
-        if self.engine:
+    def refresh_schema_incremental(self):
+        """Apply catalog changes since the schema was loaded.
+
+        Returns {'added', 'dropped', 'altered'} table lists. Nothing is read
+        beyond the catalog version check unless the catalog changed, and
+        sample rows are fetched only for added or altered tables.
+        """
+        version = catalog_version(self.engine)
+        if version is not None and version == self.loaded_catalog_version:
+            return {'added': [], 'dropped': [], 'altered': []}
+        
+        started_at = time.monotonic()
+        introspector = CatalogIntrospector(self.engine)
+        snapshot = introspector.introspect(sample_rows=0)
+        snapshot['format'] = SNAPSHOT_FORMAT
+        changes = diff_snapshots(self.schema_snapshot, snapshot)
+        
+        changed = changes['added'] + changes['altered']
+        for table, entry in snapshot['tables'].items():
+            if table not in changed:
+                entry['sample_rows'] = self.schema_snapshot['tables'][table].get('sample_rows')
+        if changed:
+            introspector.add_sample_rows({table: snapshot['tables'][table] for table in changed}, snapshot['schema'], 3)
+        
+        self.snapshot_store.save(connection_key(self.engine), version, snapshot)
+        self._apply_snapshot(snapshot, version, changed_tables=changed + changes['dropped'])
+        metrics.observe('db.schema_load.incremental', (time.monotonic() - started_at) * 1000)
+        if any(changes.values()):
+            print(f"🔄 Schema changes: {changes}")
+        return changes
+    
+    def _load_schema(self, force=False):
+        """Populate tables, columns, keys and the SQLDatabase from a schema snapshot.
+
+        The snapshot is read from disk when the catalog version still matches,
+        otherwise (or when force is set) the database is introspected and the
+        snapshot rewritten.
+        """
+        started_at = time.monotonic()
+        key = connection_key(self.engine)
+        version = catalog_version(self.engine)
+        snapshot = None if force else self.snapshot_store.load(key, version)
+        source = "snapshot"
+        if snapshot is None:
+            snapshot = introspect_schema(self.engine, sample_rows=3)  # 3 sample rows help the LLM understand the data
+            self.snapshot_store.save(key, version, snapshot)
+            source = "introspection"
+        
+        # Reset query engine so it gets recreated lazily on next query
+        self.sql_database = None
+        self.query_engine = None
+        self.table_retriever = None
+        self._apply_snapshot(snapshot, version)
+        
+        elapsed_ms = (time.monotonic() - started_at) * 1000
+        metrics.observe(f"db.schema_load.{source}", elapsed_ms)
+        print(f"📋 Loaded {len(self.tables)} tables from {source} in {elapsed_ms:.0f} ms")
+        print("\n=== Database Schema Loaded ===")
+        for table, columns in self.table_columns.items():
+            print(f"Table '{table}': {', '.join(name for name, _ in columns)}")
+        print("==============================\n")
+    
+    def _apply_snapshot(self, snapshot, version, changed_tables=()):
+        """Make a snapshot the current schema.
+
+        An existing SQLDatabase and table retriever are updated in place, so
+        the query engine built on them keeps working.
+        """
+        tables = list(snapshot['tables'])
+        self.table_columns = {
+            table: [(name, col_type) for name, col_type, _ in entry['columns']]
+            for table, entry in snapshot['tables'].items()
+        }
+        self.primary_keys = {
+            table: entry['primary_key'][0] if len(entry['primary_key']) == 1 else None
+            for table, entry in snapshot['tables'].items()
+        }
+        self.row_estimates = {table: entry.get('row_estimate') for table, entry in snapshot['tables'].items()}
+        if self.sql_database is None:
+            from snapshot_sql_database import SnapshotSQLDatabase
+            self.sql_database = SnapshotSQLDatabase(self.engine, snapshot, include_tables=tables)
+        else:
+            self.sql_database.update_snapshot(snapshot)
+            if self.table_retriever is not None:
+                self.table_retriever.refresh(tables, changed_tables)
+        self.tables = tables
+        self.schema_snapshot = snapshot
+        self.loaded_catalog_version = version
+        self.schema_fingerprint = self._compute_schema_fingerprint()
+    
+    def _compute_schema_fingerprint(self):
+        """Hash the loaded tables and columns so caches can detect schema changes"""
+        schema = {
+            'url': self.engine.url.render_as_string(hide_password=True) if self.engine else None,
+            'tables': {table: self.table_columns.get(table, []) for table in sorted(self.tables)}
+        }
+        payload = json.dumps(schema, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def _release_engine(self):
+        """Give the engine back to the registry, or dispose it if it is private"""
+        if self.engine_registry is not None and self.engine_key is not None:
+            self.engine_registry.release(self.engine_key)
+        elif self.engine:
             self.engine.dispose()
+        self.engine_key = None
         self.engine = None
+    
+    def disconnect(self):
+        """Disconnect from database"""
+        self._release_engine()
         self.sql_database = None
         self.query_engine = None
+        self.table_retriever = None
         self.tables = []
-        self.connection_status = False
\ No newline at end of file
+        self.table_columns = {}
+        self.primary_keys = {}
+        self.row_estimates = {}
+        self.schema_snapshot = None
+        self.loaded_catalog_version = None
+        self.schema_fingerprint = None
+        self.connection_status = False
+
+
+def _on_pool_connect(dbapi_connection, connection_record):
+    metrics.increment('db.pool.connections_opened')
+
+def _on_pool_invalidate(dbapi_connection, connection_record, exception):
+    metrics.increment('db.pool.connections_invalidated')
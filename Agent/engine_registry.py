@@ -0,0 +1,206 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import create_engine
+
+class ConnectionLimitError(Exception):
+    """Raised when a new engine would exceed the global connection budget"""
+
+class EngineRegistry:
+    """Shares SQLAlchemy engines between sessions that use the same connection string.
+
+    Each engine is reference-counted by the DatabaseManagers using it. Engines
+    nobody uses are disposed after idle_timeout seconds, or earlier (least
+    recently used first) when a new engine needs room under
+    max_total_connections, the cap on pool_size + max_overflow summed over all
+    open engines.
+    """
+
+    def __init__(self, max_total_connections=100, idle_timeout=600, engine_options=None):
+        self.max_total_connections = max_total_connections
+        self.idle_timeout = idle_timeout
+        self.engine_options = engine_options or {'pool_size': 5, 'max_overflow': 10}
+        self._engines = OrderedDict()  # fingerprint -> entry dict
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+        self.disposed = 0
+
+    @staticmethod
+    def fingerprint(connection_string):
+        """Stable identifier for a connection string (credentials are hashed, never stored)"""
+        return hashlib.sha256(connection_string.encode('utf-8')).hexdigest()[:16]
+
+    def _connection_budget(self, options):
+        return options.get('pool_size', 5) + options.get('max_overflow', 10)
+
+    def _open_connections(self):
+        return sum(entry['budget'] for entry in self._engines.values())
+
+    def acquire(self, connection_string, engine_options=None):
+        """Get (fingerprint, engine) for a connection string, creating the engine if needed"""
+        options = dict(self.engine_options if engine_options is None else engine_options)
+        if connection_string.startswith('sqlite'):
+            # SQLite uses file-local pools that don't take pool sizing options
+            options = {key: value for key, value in options.items() if not key.startswith(('pool_', 'max_overflow'))}
+        key = self.fingerprint(connection_string)
+        with self._lock:
+            entry = self._engines.get(key)
+            if entry is not None:
+                entry['refs'] += 1
+                entry['last_used'] = time.monotonic()
+                self._engines.move_to_end(key)
+                self.reused += 1
+                return key, entry['engine']
+
+            budget = self._connection_budget(options)
+            to_dispose = self._make_room_locked(budget)
+            if self._open_connections() + budget > self.max_total_connections:
+                self._dispose_all(to_dispose)
+                raise ConnectionLimitError(
+                    f"Connection limit reached ({self.max_total_connections} connections in use by other databases)"
+                )
+
+            engine = create_engine(connection_string, **options)
+            self._engines[key] = {
+                'engine': engine,
+                'refs': 1,
+                'budget': budget,
+                'last_used': time.monotonic()
+            }
+            self.created += 1
+
+        self._dispose_all(to_dispose)
+        return key, engine
+
+    def release(self, key):
+        """Drop one reference to an engine; it stays pooled until evicted"""
+        with self._lock:
+            entry = self._engines.get(key)
+            if entry is not None:
+                entry['refs'] = max(0, entry['refs'] - 1)
+                entry['last_used'] = time.monotonic()
+
+    def _make_room_locked(self, needed):
+        """Remove unused engines (LRU first) until `needed` connections fit; returns them"""
+        removed = []
+        for key in list(self._engines):
+            if self._open_connections() + needed <= self.max_total_connections:
+                break
+            if self._engines[key]['refs'] == 0:
+                removed.append(self._engines.pop(key)['engine'])
+        return removed
+
+    def _dispose_all(self, engines):
+        for engine in engines:
+            engine.dispose()
+            self.disposed += 1
+
+    def evict_idle(self):
+        """Dispose engines that have been unused for longer than idle_timeout"""
+        now = time.monotonic()
+        with self._lock:
+            idle = [
+                key for key, entry in self._engines.items()
+                if entry['refs'] == 0 and now - entry['last_used'] > self.idle_timeout
+            ]
+            engines = [self._engines.pop(key)['engine'] for key in idle]
+        self._dispose_all(engines)
+        return len(engines)
+
+    def dispose_all(self):
+        with self._lock:
+            engines = [entry['engine'] for entry in self._engines.values()]
+            self._engines.clear()
+        self._dispose_all(engines)
+
+    def get_stats(self):
+        with self._lock:
+            engines = {
+                key: {
+                    'refs': entry['refs'],
+                    'budget': entry['budget'],
+                    'pool': entry['engine'].pool.status(),
+                    'idle_seconds': round(time.monotonic() - entry['last_used'], 1)
+                }
+                for key, entry in self._engines.items()
+            }
+            open_connections = self._open_connections()
+        return {
+            'engines': engines,
+            'open_connection_budget': open_connections,
+            'max_total_connections': self.max_total_connections,
+            'created': self.created,
+            'reused': self.reused,
+            'disposed': self.disposed
+        }
+
+class SessionRegistry:
+    """One DatabaseAnalystAgent per user/session, evicted when idle or over the cap.
+
+    Agents share one EngineRegistry, so sessions on the same database share
+    a connection pool, and they share the SQL caches, which are already keyed
+    by schema fingerprint.
+    """
+
+    def __init__(self, agent_factory, max_sessions=500, idle_timeout=1800):
+        self.agent_factory = agent_factory
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self._sessions = OrderedDict()  # session_id -> (agent, last_used)
+        self._lock = threading.Lock()
+
+    def get(self, session_id):
+        """Get or create the agent for a session"""
+        evicted = []
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is not None:
+                agent = entry[0]
+            else:
+                agent = self.agent_factory()
+                while len(self._sessions) >= self.max_sessions:
+                    evicted.append(self._sessions.popitem(last=False)[1][0])
+            self._sessions[session_id] = (agent, time.monotonic())
+            self._sessions.move_to_end(session_id)
+
+        for old_agent in evicted:
+            old_agent.disconnect()
+        return agent
+
+    def peek(self, session_id):
+        """Get the agent for a session without creating one"""
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            return entry[0] if entry else None
+
+    def agents(self):
+        """Agents of all current sessions"""
+        with self._lock:
+            return [agent for agent, _ in self._sessions.values()]
+
+    def evict_idle(self):
+        """Disconnect agents idle for longer than idle_timeout"""
+        now = time.monotonic()
+        with self._lock:
+            idle = [sid for sid, (_, last_used) in self._sessions.items() if now - last_used > self.idle_timeout]
+            agents = [self._sessions.pop(sid)[0] for sid in idle]
+        for agent in agents:
+            agent.disconnect()
+        return len(agents)
+
+    def disconnect_all(self):
+        with self._lock:
+            agents = [agent for agent, _ in self._sessions.values()]
+            self._sessions.clear()
+        for agent in agents:
+            agent.disconnect()
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                'sessions': len(self._sessions),
+                'max_sessions': self.max_sessions,
+                'idle_timeout': self.idle_timeout
+            }
@@ -0,0 +1,145 @@
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from metrics import metrics
+
+class ExecutorSaturatedError(Exception):
+    """Raised when a pool's queue is full; callers should answer 503"""
+
+class BoundedExecutor:
+    """Thread pool with a bounded queue for blocking LLM or database work.
+
+    Async handlers await run() so the event loop stays free. When running
+    plus queued tasks reach max_workers + max_queue, new work is rejected
+    immediately instead of piling up behind slow calls.
+    """
+
+    def __init__(self, name, max_workers=8, max_queue=32):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}-pool")
+        self._lock = threading.Lock()
+        self._pending = 0  # running + queued
+        self.submitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+
+    @property
+    def capacity(self):
+        return self.max_workers + self.max_queue
+
+    def is_saturated(self):
+        """True when no more work can be accepted right now"""
+        with self._lock:
+            return self._pending >= self.capacity
+
+    def _reserve(self):
+        with self._lock:
+            if self._pending >= self.capacity:
+                self.rejected += 1
+                raise ExecutorSaturatedError(f"{self.name} pool is saturated ({self._pending} tasks pending)")
+            self._pending += 1
+            self.submitted += 1
+
+    def _release(self):
+        with self._lock:
+            self._pending -= 1
+
+    async def run(self, fn, *args, **kwargs):
+        """Run a blocking callable on the pool and await its result"""
+        self._reserve()
+        enqueued_at = time.monotonic()
+
+        def task():
+            metrics.observe(f"{self.name}_pool.queue_wait", (time.monotonic() - enqueued_at) * 1000)
+            started_at = time.monotonic()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                metrics.observe(f"{self.name}_pool.run_time", (time.monotonic() - started_at) * 1000)
+
+        try:
+            # Carry context variables (e.g. the LLM call priority) into the worker thread
+            context = contextvars.copy_context()
+            result = await asyncio.get_running_loop().run_in_executor(self._executor, context.run, task)
+            self.completed += 1
+            return result
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self._release()
+
+    async def stream(self, gen_fn, *args, max_buffered=16, **kwargs):
+        """Iterate a blocking generator on the pool, yielding each item as soon as it is produced.
+
+        At most max_buffered items are held between producer and consumer, so a
+        slow client applies backpressure instead of letting results pile up in
+        memory. The worker is held for the whole iteration; if the consumer
+        stops early (e.g. the client disconnects) the generator is abandoned
+        before its next item. The pool slot is freed by the worker itself, so
+        pending counts the abandoned generator until it has actually stopped.
+        """
+        self._reserve()
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=max_buffered)
+        stopped = threading.Event()
+        done = object()
+
+        def put(item):
+            asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+
+        def task():
+            try:
+                for item in gen_fn(*args, **kwargs):
+                    if stopped.is_set():
+                        return
+                    put((item, None))
+            except Exception as e:
+                if not stopped.is_set():
+                    put((done, e))
+            else:
+                if not stopped.is_set():
+                    put((done, None))
+            finally:
+                self._release()
+
+        future = loop.run_in_executor(self._executor, contextvars.copy_context().run, task)
+        try:
+            while True:
+                item, error = await queue.get()
+                if item is done:
+                    if error is not None:
+                        self.failed += 1
+                        raise error
+                    break
+                yield item
+            await future
+            self.completed += 1
+        finally:
+            # Only signal the worker; it frees its slot once the generator has stopped
+            stopped.set()
+            # Unblock a producer waiting on a full queue so its worker is freed
+            while not queue.empty():
+                queue.get_nowait()
+
+    def shutdown(self, wait=False):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def get_stats(self):
+        with self._lock:
+            pending = self._pending
+        return {
+            'max_workers': self.max_workers,
+            'max_queue': self.max_queue,
+            'pending': pending,
+            'queued': max(0, pending - self.max_workers),
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'failed': self.failed,
+            'rejected': self.rejected
+        }
@@ -1,26 +1,57 @@
-from llama_index.core import Settings
-from llama_index.llms.gemini import Gemini
-from llama_index.embeddings.gemini import GeminiEmbedding
+import threading
 from config import Config
+from llm_scheduler import llm_scheduler
 
 class LLMManager:
-    """Manages LLM and embedding model initialization"""
+    """Manages LLM and embedding model initialization.
+
+    The models live in llama_index's process-wide Settings, so they are set
+    up once per process and shared by every session instead of being
+    replaced (under other sessions' running requests) whenever one starts.
+    """
+
+    _initialized = False
+    _lock = threading.Lock()
     
+    @classmethod
+    def initialize_models(cls):
+        """Initialize Gemini LLM and Gemini embeddings once per process"""
+        if cls._initialized:
+            return True, "✅ LLM and embeddings already initialized"
+        with cls._lock:
+            if cls._initialized:
+                return True, "✅ LLM and embeddings already initialized"
+            result = cls._initialize_models()
+            cls._initialized = True
+            return result
+
     @staticmethod
-    def initialize_models():
+    def _initialize_models():
         """Initialize Gemini LLM and Gemini embeddings with API key from config"""
         gemini_api_key = Config.get_gemini_api_key()
         if not gemini_api_key:
             raise ValueError("GEMINI_API_KEY not found in .env file. Please add your Gemini API key to the .env file.")
             
         try:
-            # Initialize Gemini LLM with optimized settings
-            Settings.llm = Gemini(
-                model="models/gemini-2.5-flash",
-                api_key=gemini_api_key,
-                temperature=0.1,  # Lower temperature for more focused, consistent responses
-                max_tokens=1024   # Sufficient for SQL queries and responses
-            )
+            # The llama_index/Gemini stack is the slowest import in the app,
+            # so it loads here rather than when the API starts
+            from llama_index.core import Settings
+            from llama_index.llms.gemini import Gemini
+            from llama_index.embeddings.gemini import GeminiEmbedding
+            from llm_wrappers import ScheduledLLM, build_resilient_llm
+
+            # Initialize Gemini LLM with optimized settings; every call is
+            # deadline-bound and retried, and each attempt is rate limited
+            # and prioritized by the shared scheduler
+            Settings.llm = build_resilient_llm(ScheduledLLM(
+                llm=Gemini(
+                    model="models/gemini-2.5-flash",
+                    api_key=gemini_api_key,
+                    temperature=0.1,  # Lower temperature for more focused, consistent responses
+                    max_tokens=1024   # Sufficient for SQL queries and responses
+                ),
+                scheduler=llm_scheduler
+            ))
             
             # Initialize Gemini embeddings (free tier)
             Settings.embed_model = GeminiEmbedding(
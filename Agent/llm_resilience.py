@@ -0,0 +1,121 @@
+import threading
+import time
+from config import Config
+from executor_pool import ExecutorSaturatedError
+from metrics import metrics
+
+TRANSIENT_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+# google.api_core / httpx errors worth retrying, matched by name so neither is imported here
+TRANSIENT_ERROR_NAMES = {
+    'ResourceExhausted', 'ServiceUnavailable', 'DeadlineExceeded', 'InternalServerError',
+    'TooManyRequests', 'GatewayTimeout', 'BadGateway', 'Aborted',
+    'ConnectError', 'ReadTimeout', 'WriteTimeout', 'PoolTimeout', 'RemoteProtocolError'
+}
+
+class LLMTimeoutError(TimeoutError):
+    """Raised when an LLM call misses its deadline"""
+
+class CircuitOpenError(ExecutorSaturatedError):
+    """Raised without calling the provider while the circuit breaker is open"""
+
+class LLMQueueTimeoutError(ExecutorSaturatedError):
+    """Raised when an LLM call was still waiting for a scheduler slot at its deadline"""
+
+def is_transient(error):
+    """True for timeouts, rate limits, 5xx and connection errors"""
+    if isinstance(error, ExecutorSaturatedError):
+        return False  # Local backpressure (open circuit, full LLM queue), not a provider error
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    for attr in ('code', 'status_code'):
+        code = getattr(error, attr, None)
+        code = getattr(code, 'value', code)  # grpc StatusCode enums
+        if isinstance(code, int) and code in TRANSIENT_STATUS_CODES:
+            return True
+    return type(error).__name__ in TRANSIENT_ERROR_NAMES
+
+class CircuitBreaker:
+    """Fails fast after repeated provider failures.
+
+    Closed: calls pass through. After failure_threshold consecutive transient
+    failures it opens and rejects calls for reset_timeout seconds, then lets a
+    single trial call through (half-open); success closes it again, failure
+    re-opens it, and a trial that ends without reaching the provider frees
+    the slot for the next call.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+        self.rejected = 0
+        self.opened = 0
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go to the provider now.
+
+        Returns True when the call is the half-open trial; pass it to
+        release_trial() once the call is over.
+        """
+        if not self.failure_threshold:
+            return False
+        with self._lock:
+            if self.state == 'open' and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = 'half_open'
+                self._trial_running = False
+            if self.state == 'closed':
+                return False
+            if self.state == 'half_open' and not self._trial_running:
+                self._trial_running = True
+                return True
+            self.rejected += 1
+            metrics.increment("llm.circuit_rejected")
+            retry_in = max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+            raise CircuitOpenError(f"LLM provider circuit is open, retry in {retry_in:.0f}s")
+
+    def record_success(self):
+        with self._lock:
+            if self.state != 'closed':
+                print("✅ LLM provider recovered, closing circuit")
+            self.state = 'closed'
+            self._failures = 0
+            self._trial_running = False
+
+    def release_trial(self, is_trial):
+        """End a trial call that recorded neither success nor failure (e.g. rejected locally)"""
+        if not is_trial:
+            return
+        with self._lock:
+            if self.state == 'half_open':
+                self._trial_running = False
+
+    def record_failure(self):
+        if not self.failure_threshold:
+            return
+        with self._lock:
+            self._failures += 1
+            if self.state == 'half_open' or self._failures >= self.failure_threshold:
+                if self.state != 'open':
+                    print(f"⚡ LLM provider failing ({self._failures} consecutive errors), opening circuit for {self.reset_timeout}s")
+                    self.opened += 1
+                    metrics.increment("llm.circuit_opened")
+                self.state = 'open'
+                self._opened_at = time.monotonic()
+                self._trial_running = False
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self._failures,
+                'opened': self.opened,
+                'rejected': self.rejected
+            }
+
+RESILIENCE_CONFIG = Config.get_llm_resilience_config()
+# Process-wide breaker: every session talks to the same provider
+llm_circuit_breaker = CircuitBreaker(RESILIENCE_CONFIG['breaker_failures'], RESILIENCE_CONFIG['breaker_reset'])
@@ -0,0 +1,156 @@
+import contextvars
+import heapq
+import itertools
+import threading
+import time
+from config import Config
+from executor_pool import ExecutorSaturatedError
+from metrics import metrics
+
+# Lower numbers are served first
+INTERACTIVE = 0
+BATCH = 1
+BACKGROUND = 2
+PRIORITY_NAMES = {INTERACTIVE: 'interactive', BATCH: 'batch', BACKGROUND: 'background'}
+CHARS_PER_TOKEN = 4
+
+# Priority of LLM calls made from the current request; copied into worker threads by BoundedExecutor
+llm_priority = contextvars.ContextVar('llm_priority', default=INTERACTIVE)
+# Optional dict that acquire() stamps with the time a call left the queue ('at'),
+# so callers can time the provider call separately from local queueing
+llm_dispatch = contextvars.ContextVar('llm_dispatch', default=None)
+
+class LLMQueueFullError(ExecutorSaturatedError):
+    """Raised when an LLM call can't be scheduled (queue full or waited too long)"""
+
+class TokenBucket:
+    """Refills `rate_per_minute` units per minute up to one minute's worth (0 = unlimited)"""
+
+    def __init__(self, rate_per_minute):
+        self.rate_per_minute = rate_per_minute
+        self.capacity = float(rate_per_minute)
+        self._level = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now):
+        self._level = min(self.capacity, self._level + (now - self._updated) * self.rate_per_minute / 60.0)
+        self._updated = now
+
+    def wait_time(self, amount, now):
+        """Seconds until `amount` units are available (0 if they are now)"""
+        if not self.rate_per_minute:
+            return 0.0
+        self._refill(now)
+        amount = min(amount, self.capacity)  # Oversized requests wait for a full bucket
+        if self._level >= amount:
+            return 0.0
+        return (amount - self._level) * 60.0 / self.rate_per_minute
+
+    def take(self, amount):
+        if self.rate_per_minute:
+            self._level -= min(amount, self.capacity)
+
+    def adjust(self, amount):
+        """Credit back (negative) or debit (positive) after the real usage is known"""
+        if self.rate_per_minute:
+            self._level = min(self.capacity, self._level - amount)
+
+class LLMScheduler:
+    """Admission control for LLM calls: rate limits, priorities and bounded concurrency.
+
+    Callers block in acquire() until they are at the head of a priority queue
+    (interactive before batch before background, FIFO within a priority), a
+    concurrency slot is free, and both the requests-per-minute and
+    tokens-per-minute buckets can cover the call. When max_queue callers are
+    already waiting, or a caller would wait longer than max_wait seconds,
+    LLMQueueFullError is raised so the API can answer 503 instead of letting
+    a burst pile into the provider's rate limits.
+    """
+
+    def __init__(self, requests_per_minute=0, tokens_per_minute=0, max_in_flight=8, max_queue=64, max_wait=30):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._condition = threading.Condition()
+        self._queue = []  # heap of (priority, sequence)
+        self._sequence = itertools.count()
+        self._in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def acquire(self, estimated_tokens, priority=None):
+        """Block until the call may start; returns a ticket for release()"""
+        priority = llm_priority.get() if priority is None else priority
+        enqueued_at = time.monotonic()
+        with self._condition:
+            if len(self._queue) >= self.max_queue:
+                self.rejected += 1
+                metrics.increment("llm.rejected")
+                raise LLMQueueFullError(f"LLM queue is full ({len(self._queue)} calls waiting)")
+            entry = (priority, next(self._sequence))
+            heapq.heappush(self._queue, entry)
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = 0.0
+                    if self._queue[0] == entry and self._in_flight < self.max_in_flight:
+                        wait = max(self.requests.wait_time(1, now), self.tokens.wait_time(estimated_tokens, now))
+                        if wait == 0.0:
+                            break
+                    if self.max_wait and now - enqueued_at + wait > self.max_wait:
+                        self.rejected += 1
+                        metrics.increment("llm.rejected")
+                        raise LLMQueueFullError(f"LLM call could not be scheduled within {self.max_wait}s")
+                    # Woken early by release() or a new head; otherwise re-check when tokens refill
+                    timeout = wait or None
+                    if self.max_wait:
+                        remaining = self.max_wait - (now - enqueued_at)
+                        timeout = min(timeout, remaining) if timeout else remaining
+                    self._condition.wait(timeout=timeout)
+            except BaseException:
+                self._queue.remove(entry)
+                heapq.heapify(self._queue)
+                self._condition.notify_all()
+                raise
+            heapq.heappop(self._queue)
+            self.requests.take(1)
+            self.tokens.take(estimated_tokens)
+            self._in_flight += 1
+            self._condition.notify_all()  # The next caller may now be at the head
+
+        dispatch = llm_dispatch.get()
+        if dispatch is not None:
+            dispatch.setdefault('at', time.monotonic())
+
+        waited_ms = (time.monotonic() - enqueued_at) * 1000
+        metrics.observe("llm.queue_wait", waited_ms)
+        metrics.observe(f"llm.queue_wait.{PRIORITY_NAMES.get(priority, priority)}", waited_ms)
+        return {'estimated_tokens': estimated_tokens, 'started_at': time.monotonic()}
+
+    def release(self, ticket, actual_tokens=None):
+        """Free the call's slot and settle the token bucket with the real usage"""
+        with self._condition:
+            self._in_flight -= 1
+            self.completed += 1
+            if actual_tokens is not None:
+                self.tokens.adjust(actual_tokens - ticket['estimated_tokens'])
+            self._condition.notify_all()
+        metrics.observe("llm.call_time", (time.monotonic() - ticket['started_at']) * 1000)
+
+    def get_stats(self):
+        with self._condition:
+            return {
+                'in_flight': self._in_flight,
+                'queued': len(self._queue),
+                'max_in_flight': self.max_in_flight,
+                'max_queue': self.max_queue,
+                'requests_per_minute': self.requests.rate_per_minute,
+                'tokens_per_minute': self.tokens.rate_per_minute,
+                'completed': self.completed,
+                'rejected': self.rejected
+            }
+
+# Process-wide scheduler shared by every session's LLM calls
+llm_scheduler = LLMScheduler(**Config.get_llm_scheduler_config())
@@ -0,0 +1,265 @@
+import contextvars
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any
+import numpy as np
+from llama_index.core.llms import CustomLLM, CompletionResponse, LLMMetadata
+from llama_index.core.llms.callbacks import llm_completion_callback
+from executor_pool import ExecutorSaturatedError
+from llm_resilience import (RESILIENCE_CONFIG, CircuitBreaker, LLMQueueTimeoutError, LLMTimeoutError, is_transient,
+                            llm_circuit_breaker)
+from llm_scheduler import CHARS_PER_TOKEN, llm_dispatch
+from metrics import metrics
+
+# How often a queued attempt re-checks whether the scheduler has dispatched it (seconds)
+QUEUE_POLL_INTERVAL = 0.05
+
+class ScheduledLLM(CustomLLM):
+    """Wraps an LLM so every completion goes through an LLMScheduler.
+
+    Chat-style calls (e.g. predict() from the text-to-SQL retriever) are
+    served as completions, so they are scheduled too.
+    """
+
+    llm: Any
+    scheduler: Any
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        inner = self.llm.metadata
+        return LLMMetadata(
+            context_window=inner.context_window,
+            num_output=inner.num_output,
+            is_chat_model=False,
+            model_name=inner.model_name
+        )
+
+    def _estimate(self, prompt):
+        return len(prompt) // CHARS_PER_TOKEN + (self.llm.metadata.num_output or 0)
+
+    @llm_completion_callback()
+    def complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        ticket = self.scheduler.acquire(self._estimate(prompt))
+        response = None
+        try:
+            response = self.llm.complete(prompt, formatted=formatted, **kwargs)
+            return response
+        finally:
+            used = None
+            if response is not None:
+                used = (len(prompt) + len(response.text or "")) // CHARS_PER_TOKEN
+            self.scheduler.release(ticket, used)
+
+    @llm_completion_callback()
+    def stream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any):
+        ticket = self.scheduler.acquire(self._estimate(prompt))
+        text = ""
+        try:
+            for chunk in self.llm.stream_complete(prompt, formatted=formatted, **kwargs):
+                text = chunk.text or text
+                yield chunk
+        finally:
+            self.scheduler.release(ticket, (len(prompt) + len(text)) // CHARS_PER_TOKEN)
+
+class ResilientLLM(CustomLLM):
+    """Adds deadlines, retries, hedging and a circuit breaker around an LLM.
+
+    Each attempt runs on a small worker pool so the caller can stop waiting
+    at the deadline; a late attempt finishes in the background and its
+    result is dropped. Transient errors are retried with full-jitter
+    exponential backoff within the overall deadline. With hedging on, a
+    second attempt starts once the first has run longer than the recent
+    p95 attempt latency, and whichever returns first wins. Streams get the
+    breaker and retries until their first chunk arrives, but no hedging.
+    Time spent waiting for an LLMScheduler slot only counts toward the
+    overall deadline, and local rejections never trip the breaker.
+    """
+
+    llm: Any
+    attempt_timeout: float = 30.0
+    deadline: float = 60.0
+    max_retries: int = 2
+    backoff_base: float = 0.5
+    backoff_max: float = 8.0
+    hedge: bool = False
+    hedge_delay: float = 2.0
+    hedge_min_samples: int = 20
+    breaker: Any = None
+    max_workers: int = 16
+    _pool: Any = None
+    _latencies: Any = None
+    _lock: Any = None
+
+    def __init__(self, **data: Any):
+        super().__init__(**data)
+        if self.breaker is None:
+            self.breaker = CircuitBreaker()
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="llm-attempt")
+        self._latencies = deque(maxlen=200)
+        self._lock = threading.Lock()
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return self.llm.metadata
+
+    def current_hedge_delay(self):
+        """p95 of recent attempt latencies (seconds), or hedge_delay until enough samples exist"""
+        with self._lock:
+            samples = list(self._latencies)
+        if len(samples) < self.hedge_min_samples:
+            return self.hedge_delay
+        return float(np.percentile(samples, 95))
+
+    def _attempt(self, dispatch, prompt, formatted, kwargs):
+        response = self.llm.complete(prompt, formatted=formatted, **kwargs)
+        # Timed from dispatch, so waiting for a scheduler slot doesn't inflate the hedge delay
+        elapsed = time.monotonic() - dispatch['at']
+        with self._lock:
+            self._latencies.append(elapsed)
+        metrics.observe("llm.attempt_time", elapsed * 1000)
+        return response
+
+    def _dispatched(self, dispatch, fn, *args):
+        llm_dispatch.set(dispatch)
+        if not isinstance(self.llm, ScheduledLLM):
+            dispatch['at'] = time.monotonic()  # Nothing to queue for
+        return fn(*args)
+
+    def _submit(self, dispatch, fn, *args):
+        # Copy the caller's context so the scheduling priority follows the attempt
+        return self._pool.submit(contextvars.copy_context().run, self._dispatched, dispatch, fn, *args)
+
+    def _time_left(self, dispatch, deadline_at):
+        """(seconds the attempt may still take, whether it is still queued).
+
+        attempt_timeout only starts once the scheduler dispatches the call;
+        until then it may wait for a slot up to the overall deadline.
+        """
+        now = time.monotonic()
+        if 'at' not in dispatch:
+            if deadline_at is None:
+                return QUEUE_POLL_INTERVAL, True
+            return deadline_at - now, True
+        ends_at = dispatch['at'] + self.attempt_timeout
+        if deadline_at is not None:
+            ends_at = min(ends_at, deadline_at)
+        return ends_at - now, False
+
+    def _timeout_error(self, queued):
+        if queued:
+            return LLMQueueTimeoutError("LLM call was still waiting for a scheduler slot at its deadline")
+        return LLMTimeoutError(f"LLM call exceeded its {self.attempt_timeout:.1f}s attempt timeout or deadline")
+
+    def _complete_once(self, prompt, formatted, kwargs, deadline_at):
+        """One (possibly hedged) attempt; raises LLMTimeoutError once it runs past its timeout"""
+        dispatch = {}
+        primary = self._submit(dispatch, self._attempt, dispatch, prompt, formatted, kwargs)
+        futures = {primary}
+        hedge_pending = self.hedge
+
+        error = None
+        while futures:
+            left, queued = self._time_left(dispatch, deadline_at)
+            if left <= 0:
+                break
+            wait_for = min(left, QUEUE_POLL_INTERVAL) if queued else left
+            if hedge_pending and not queued:
+                hedge_in = dispatch['at'] + self.current_hedge_delay() - time.monotonic()
+                if hedge_in <= 0:
+                    hedge_pending = False
+                    try:
+                        hedge_dispatch = {}
+                        futures.add(self._submit(hedge_dispatch, self._attempt, hedge_dispatch, prompt, formatted, kwargs))
+                        metrics.increment("llm.hedged")
+                    except RuntimeError:
+                        pass  # Pool shut down; keep waiting on the primary
+                    continue
+                wait_for = min(wait_for, hedge_in)
+            done, futures = wait(futures, timeout=wait_for, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is not primary:
+                        metrics.increment("llm.hedge_won")
+                    for straggler in futures:
+                        straggler.cancel()  # Only stops attempts that haven't started
+                    return future.result()
+                # A rejected hedge (e.g. full scheduler queue) mustn't hide the primary's answer
+                if error is None or future is primary:
+                    error = future.exception()
+        if futures:
+            for straggler in futures:
+                straggler.cancel()
+            raise self._timeout_error(queued)
+        raise error
+
+    def _backoff(self, attempt):
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _call_with_retries(self, call):
+        """Run call(deadline_at) under the breaker, retrying transient errors within the deadline"""
+        started_at = time.monotonic()
+        deadline_at = started_at + self.deadline if self.deadline else None
+        attempt = 0
+        while True:
+            is_trial = self.breaker.before_call()
+            try:
+                result = call(deadline_at)
+            except Exception as e:
+                if isinstance(e, ExecutorSaturatedError):
+                    raise  # Rejected locally: says nothing about the provider
+                if not is_transient(e):
+                    self.breaker.record_success()  # The provider answered, just not with a result
+                    raise
+                self.breaker.record_failure()
+                metrics.increment("llm.transient_errors")
+                sleep_for = self._backoff(attempt)
+                out_of_time = self.deadline and time.monotonic() - started_at + sleep_for >= self.deadline
+                if attempt >= self.max_retries or out_of_time:
+                    raise
+                attempt += 1
+                metrics.increment("llm.retries")
+                print(f"🔁 LLM call failed ({type(e).__name__}: {str(e)}), retry {attempt}/{self.max_retries} in {sleep_for:.1f}s")
+                time.sleep(sleep_for)
+                continue
+            else:
+                self.breaker.record_success()
+                return result
+            finally:
+                # No-op once success or failure was recorded; otherwise frees the half-open slot
+                self.breaker.release_trial(is_trial)
+
+    @llm_completion_callback()
+    def complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        return self._call_with_retries(lambda deadline_at: self._complete_once(prompt, formatted, kwargs, deadline_at))
+
+    @llm_completion_callback()
+    def stream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any):
+        def first_chunk(deadline_at):
+            stream = self.llm.stream_complete(prompt, formatted=formatted, **kwargs)
+            dispatch = {}
+            future = self._submit(dispatch, next, stream, None)
+            while True:
+                left, queued = self._time_left(dispatch, deadline_at)
+                if left <= 0:
+                    raise self._timeout_error(queued)
+                done, _ = wait({future}, timeout=min(left, QUEUE_POLL_INTERVAL) if queued else left)
+                if done:
+                    return stream, future.result()
+
+        stream, chunk = self._call_with_retries(first_chunk)
+        if chunk is None:
+            return
+        yield chunk
+        yield from stream
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+def build_resilient_llm(llm):
+    """Wrap an LLM with the deadline/retry/hedging settings from the environment"""
+    options = {k: v for k, v in RESILIENCE_CONFIG.items() if not k.startswith('breaker_')}
+    return ResilientLLM(llm=llm, breaker=llm_circuit_breaker, **options)
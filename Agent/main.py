@@ -1,7 +1,10 @@
 # Complete FastAPI main.py
-from fastapi import FastAPI, HTTPException, Depends
+import time
+STARTED_AT = time.monotonic()  # Cold-start timings in /health are measured from here
+
+from fastapi import FastAPI, HTTPException, Depends, Header
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, Response
 from pydantic import BaseModel
 from typing import Optional, Dict, List, Any
 import pandas as pd
@@ -10,6 +13,21 @@ import asyncio
 import json
 from database_analyst_agent import DatabaseAnalystAgent
 from config import Config
+from executor_pool import BoundedExecutor, ExecutorSaturatedError
+from answer_summarizer import AnswerSummarizer
+from result_encoder import ResultEncoder
+from metrics import metrics
+from engine_registry import EngineRegistry, SessionRegistry, ConnectionLimitError
+from query_cache import QueryCache
+from semantic_cache import SemanticQueryCache
+from result_pager import ResultPager
+from single_flight import SingleFlight
+from llm_scheduler import llm_scheduler, llm_priority, BATCH
+from llm_resilience import llm_circuit_breaker
+from nextjs_client import NextJSClient
+from chat_spool import ChatSaveQueue
+from chart_spec import ChartSpecEngine
+from startup_warmup import StartupWarmup
 
 app = FastAPI(title="AI Database Analyst API", version="2.0.0")
 
@@ -19,7 +37,12 @@ FASTAPI_URL = os.getenv("FASTAPI_URL")
 NEXTJS_API_URL = os.getenv("NEXTJS_API_URL")
 CORS_ORIGINS = os.getenv("CORS_ORIGINS", "http://localhost:3000").split(",")
 CORS_ORIGINS = [origin.strip() for origin in CORS_ORIGINS if origin.strip()]
-CHAT_SAVE_TIMEOUT = 10  # seconds
+# Shared keep-alive client for chat persistence calls to NextJS
+nextjs_client = NextJSClient(NEXTJS_API_URL, **Config.get_nextjs_client_config())
+CHAT_SPOOL_CONFIG = Config.get_chat_spool_config()
+CHAT_WRITE_BEHIND = CHAT_SPOOL_CONFIG.pop('enabled')
+CHAT_NEW_CHAT_WAIT = CHAT_SPOOL_CONFIG.pop('new_chat_wait')
+chat_save_queue = ChatSaveQueue(nextjs_client, **CHAT_SPOOL_CONFIG)
 
 # Add CORS middleware for NextJS frontend
 app.add_middleware(
@@ -30,8 +53,43 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Global agent instance
-agent = None
+# One agent per user/session. Sessions connected to the same database share
+# a pooled engine, and all sessions share the schema-keyed SQL caches.
+REGISTRY_CONFIG = Config.get_registry_config()
+DEFAULT_SESSION_ID = "default"
+REGISTRY_SWEEP_INTERVAL = 60  # seconds
+SCHEMA_POLL_INTERVAL = Config.get_schema_poll_interval()  # seconds, 0 disables the poller
+engine_registry = EngineRegistry(
+    max_total_connections=REGISTRY_CONFIG['max_total_connections'],
+    idle_timeout=REGISTRY_CONFIG['engine_idle_timeout']
+)
+shared_query_cache = QueryCache(**Config.get_query_cache_config())
+shared_semantic_cache = SemanticQueryCache(**Config.get_semantic_cache_config())
+# Shared so a coalesced result's continuation token works from every session
+shared_result_pager = ResultPager(**Config.get_paging_config())
+session_registry = SessionRegistry(
+    lambda: DatabaseAnalystAgent(
+        engine_registry=engine_registry,
+        query_cache=shared_query_cache,
+        semantic_cache=shared_semantic_cache,
+        result_pager=shared_result_pager
+    ),
+    max_sessions=REGISTRY_CONFIG['max_sessions'],
+    idle_timeout=REGISTRY_CONFIG['session_idle_timeout']
+)
+
+# Blocking LLM and database work runs on separate bounded pools so a slow
+# Gemini call or SQL statement never blocks the event loop
+EXECUTOR_CONFIG = Config.get_executor_config()
+llm_executor = BoundedExecutor("llm", **EXECUTOR_CONFIG['llm'])
+db_executor = BoundedExecutor("db", **EXECUTOR_CONFIG['db'])
+BATCH_CONFIG = Config.get_batch_config()
+# Chart specs are inferred from column dtypes and memoized per result
+chart_spec_engine = ChartSpecEngine(**Config.get_chart_config())
+# Identical questions in flight at the same time share one LLM call and one SQL execution
+query_flight = SingleFlight("query_flight")
+# Models, the DB_* connection and the query engine are prepared in the background after startup
+startup_warmup = StartupWarmup(STARTED_AT, **Config.get_startup_config())
 
 # Pydantic models for request/response
 class DatabaseConnection(BaseModel):
@@ -46,6 +104,21 @@ class QueryRequest(BaseModel):
     query: str
     user_id: Optional[str] = None  # For logging purposes
     chat_id: Optional[str] = None  # For reference
+    synthesize: Optional[bool] = None  # LLM-written answer instead of local summary
+    stream_rows: bool = False  # Send rows as data_chunk events from a server-side cursor
+    batch_size: Optional[int] = None  # Rows per data_chunk (defaults to RESULT_BATCH_SIZE)
+    format: Optional[str] = None  # records | columnar | arrow; otherwise negotiated from the Accept header
+
+class BatchQuestion(BaseModel):
+    id: Optional[str] = None  # Echoed back on this question's events (defaults to its position)
+    query: str
+
+class BatchQueryRequest(BaseModel):
+    questions: List[BatchQuestion]
+    user_id: Optional[str] = None  # For logging purposes
+    synthesize: Optional[bool] = None  # LLM-written answers instead of local summaries
+    format: Optional[str] = None  # records | columnar | arrow; otherwise negotiated from the Accept header
+    max_concurrency: Optional[int] = None  # Capped at BATCH_CONCURRENCY
 
 class QueryResponse(BaseModel):
     success: bool
@@ -66,23 +139,113 @@ class ChatRequest(BaseModel):
     message: str
     user_id: str
     chat_id: Optional[str] = None  # If None, create new chat
+    synthesize: Optional[bool] = None  # LLM-written answer instead of local summary
 
 class ChatResponse(BaseModel):
     success: bool
     message_id: Optional[str] = None
     chat_id: Optional[str] = None
+    # Set while the save is still queued: message_id (and, for a new chat, chat_id) then come
+    # from /chat/pending/{pending_id} once it is delivered
+    pending_id: Optional[str] = None
     response: str
     error: Optional[str] = None
 
-def get_agent():
-    """Dependency to get or create agent instance"""
-    global agent
-    if agent is None:
-        try:
-            agent = DatabaseAnalystAgent()
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Failed to initialize agent: {str(e)}")
-    return agent
+def get_agent(x_session_id: Optional[str] = Header(None)):
+    """Dependency to get or create the agent for the caller's session (X-Session-Id header)"""
+    try:
+        return session_registry.get(x_session_id or DEFAULT_SESSION_ID)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to initialize agent: {str(e)}")
+
+def overloaded_exception(error: Exception) -> HTTPException:
+    """503 response telling clients to back off while a worker pool is saturated"""
+    print(f"🚦 Rejecting request: {str(error)}")
+    return HTTPException(status_code=503, detail=f"Server busy: {str(error)}", headers={"Retry-After": "1"})
+
+def ensure_capacity():
+    """Fail fast with 503 before starting work that could not be queued"""
+    for executor in (llm_executor, db_executor):
+        if executor.is_saturated():
+            raise overloaded_exception(ExecutorSaturatedError(f"{executor.name} pool is saturated"))
+
+async def plan_and_execute(agent: DatabaseAnalystAgent, query: str, synthesize: Optional[bool] = None):
+    """Generate SQL (LLM pool) and execute it (DB pool); returns (plan, result).
+
+    Concurrent requests for the same question on the same database and at the
+    same LLM priority attach to one in-flight computation, so an interactive
+    question never waits behind a batch one. Each caller gets its own copies
+    of the plan and result, with its own answer mode.
+    """
+    async def compute():
+        started_at = time.monotonic()
+        plan = await llm_executor.run(agent.prepare_query, query, synthesize)
+        result = await db_executor.run(agent.execute_query_plan, plan)
+        startup_warmup.record_query((time.monotonic() - started_at) * 1000)
+        return plan, result
+
+    key = agent.coalescing_key(query)
+    if key is None:
+        return await compute()
+    (plan, result), coalesced = await query_flight.run((key, llm_priority.get()), compute)
+    if coalesced:
+        print(f"🔗 Coalesced with an identical in-flight question: {query}")
+    return dict(plan, synthesize=agent.resolve_answer_mode(synthesize)), dict(result)
+
+async def run_agent_query(agent: DatabaseAnalystAgent, query: str, synthesize: Optional[bool] = None) -> Dict[str, Any]:
+    """Run the agent pipeline with LLM and database phases on their own pools"""
+    plan, result = await plan_and_execute(agent, query, synthesize)
+    if plan['synthesize']:
+        result = await llm_executor.run(agent.synthesize_answer, plan, result)
+    return result
+
+def result_data_event(result: Dict[str, Any], query: str, result_format: str) -> Dict[str, Any]:
+    """Fields of a 'data' event: encoded rows, chart config and paging handles"""
+    visualization_data = None
+    if not result['data'].empty:
+        # Compact formats don't repeat the chart rows, which are the first rows of content
+        visualization_data = prepare_visualization_data(
+            result['data'], query, include_data=result_format == "records", aggregated=result.get('chart_data')
+        )
+    return {
+        'format': result_format,
+        'content': ResultEncoder.encode(result['data'], result_format),
+        'visualization': visualization_data,
+        'query_id': result.get('query_id'),
+        'continuation_token': result.get('continuation_token'),
+        'has_more': bool(result.get('continuation_token'))
+    }
+
+async def stream_agent_answer(agent: DatabaseAnalystAgent, plan: Dict[str, Any], result: Dict[str, Any]):
+    """Yield answer text chunks; LLM synthesis streams tokens from the LLM pool as they arrive"""
+    if plan['synthesize']:
+        async for chunk in llm_executor.stream(agent.stream_answer, plan, result):
+            yield chunk
+    else:
+        for chunk in agent.stream_answer(plan, result):
+            yield chunk
+
+async def stream_result_rows(agent: DatabaseAnalystAgent, plan: Dict[str, Any], query: str,
+                             batch_size: Optional[int] = None, result_format: str = "records"):
+    """SSE events for a result streamed in row batches; only one batch is in memory at a time"""
+    yield f"data: {json.dumps({'type': 'sql', 'content': plan['sql_query']})}\n\n"
+
+    row_count = 0
+    columns = []
+    visualization_data = None
+    async for batch in db_executor.stream(agent.stream_query_plan, plan, batch_size):
+        columns = list(batch.columns)
+        if batch.empty:
+            continue
+        if visualization_data is None:
+            visualization_data = prepare_visualization_data(batch, query, include_data=result_format == "records")
+        chunk = {'type': 'data_chunk', 'format': result_format, 'offset': row_count, 'content': ResultEncoder.encode(batch, result_format)}
+        row_count += len(batch)
+        yield f"data: {ResultEncoder.dumps(chunk)}\n\n"
+
+    yield f"data: {ResultEncoder.dumps({'type': 'data_complete', 'row_count': row_count, 'columns': columns, 'visualization': visualization_data})}\n\n"
+    yield f"data: {json.dumps({'type': 'text', 'content': AnswerSummarizer.summarize_stream(columns, row_count)})}\n\n"
+    yield f"data: {json.dumps({'type': 'text_complete'})}\n\n"
 
 async def send_to_nextjs(endpoint: str, data: Dict[str, Any], method: str = "POST") -> Dict[str, Any]:
     """
@@ -90,25 +253,19 @@ async def send_to_nextjs(endpoint: str, data: Dict[str, Any], method: str = "POS
     Returns response data or raises exception
     """
     try:
-        url = f"{NEXTJS_API_URL}/{endpoint}"
-        async with httpx.AsyncClient(timeout=CHAT_SAVE_TIMEOUT) as client:
-            if method.upper() == "POST":
-                response = await client.post(url, json=data)
-            elif method.upper() == "GET":
-                response = await client.get(url, params=data)
-            elif method.upper() == "DELETE":
-                response = await client.delete(url)
-            else:
-                raise ValueError(f"Unsupported method: {method}")
-            
-            if response.status_code == 200:
-                result = response.json()
-                print(f"✅ NextJS API call successful: {endpoint}")
-                return result
-            else:
-                print(f"❌ NextJS API error: {response.status_code} - {response.text}")
-                raise HTTPException(status_code=response.status_code, detail=f"NextJS API error: {response.text}")
-                
+        method = method.upper()
+        # ResultEncoder handles numpy, Decimal and datetime values that json= would reject
+        content = ResultEncoder.dumps(data) if method == "POST" else None
+        response = await nextjs_client.request(endpoint, method, content=content, params=data if method == "GET" else None)
+
+        if response.status_code == 200:
+            result = response.json()
+            print(f"✅ NextJS API call successful: {endpoint}")
+            return result
+        else:
+            print(f"❌ NextJS API error: {response.status_code} - {response.text}")
+            raise HTTPException(status_code=response.status_code, detail=f"NextJS API error: {response.text}")
+
     except httpx.TimeoutException:
         print(f"⏰ Timeout calling NextJS API: {endpoint}")
         raise HTTPException(status_code=504, detail="NextJS API timeout")
@@ -122,9 +279,87 @@ async def root():
     return {"message": "AI Database Analyst API v2.0", "status": "active"}
 
 @app.get("/health")
-async def health_check():
-    """Health check endpoint for monitoring"""
-    return {"status": "healthy", "message": "FastAPI backend is running"}
+async def health_check(response: Response, ready: bool = False):
+    """Health check endpoint for monitoring; with ?ready=true it answers 503 until warm-up has finished"""
+    startup = startup_warmup.get_status()
+    if ready and not startup['ready']:
+        response.status_code = 503
+    return {
+        "status": "healthy" if startup['ready'] else "starting",
+        "message": "FastAPI backend is running",
+        "startup": startup
+    }
+
+@app.get("/metrics")
+async def get_metrics():
+    """Worker pool and latency metrics"""
+    return {
+        "executors": {
+            "llm": llm_executor.get_stats(),
+            "db": db_executor.get_stats()
+        },
+        "llm_scheduler": llm_scheduler.get_stats(),
+        "llm_circuit": llm_circuit_breaker.get_stats(),
+        "coalescing": query_flight.get_stats(),
+        "nextjs_client": nextjs_client.get_stats(),
+        "chart_specs": chart_spec_engine.get_stats(),
+        "startup": startup_warmup.get_status(),
+        "chat_spool": await chat_save_queue.get_stats(),
+        "sessions": session_registry.get_stats(),
+        "engines": engine_registry.get_stats(),
+        **metrics.snapshot()
+    }
+
+async def sweep_idle_connections():
+    """Periodically disconnect idle sessions and dispose engines nobody uses"""
+    while True:
+        await asyncio.sleep(REGISTRY_SWEEP_INTERVAL)
+        try:
+            sessions = await db_executor.run(session_registry.evict_idle)
+            engines = await db_executor.run(engine_registry.evict_idle)
+            if sessions or engines:
+                print(f"🧹 Evicted {sessions} idle sessions and {engines} idle engines")
+        except Exception as e:
+            print(f"⚠️ Idle sweep failed: {str(e)}")
+
+async def poll_schema_changes():
+    """Periodically apply schema changes (e.g. after data imports) to every connected session"""
+    while True:
+        await asyncio.sleep(SCHEMA_POLL_INTERVAL)
+        for agent in session_registry.agents():
+            if not agent.database_manager.connection_status:
+                continue
+            try:
+                await db_executor.run(agent.refresh_schema)
+            except ExecutorSaturatedError:
+                break  # Busy serving queries; try again next interval
+            except Exception as e:
+                print(f"⚠️ Schema poll failed: {str(e)}")
+
+@app.on_event("startup")
+async def start_background_services():
+    """Open the NextJS client and chat save queue, start the idle sweeper and the optional schema poller, and begin warm-up"""
+    nextjs_client.start()
+    await chat_save_queue.start()
+    startup_warmup.start(session_registry.get(DEFAULT_SESSION_ID), llm_executor, db_executor)
+    app.state.registry_sweeper = asyncio.create_task(sweep_idle_connections())
+    app.state.schema_poller = asyncio.create_task(poll_schema_changes()) if SCHEMA_POLL_INTERVAL else None
+
+@app.on_event("shutdown")
+async def shutdown_executors():
+    """Stop worker pools and close database and NextJS connections on application shutdown"""
+    for task_name in ("registry_sweeper", "schema_poller"):
+        task = getattr(app.state, task_name, None)
+        if task:
+            task.cancel()
+    await startup_warmup.stop()
+    # Undelivered chat saves stay in the spool for the next start
+    await chat_save_queue.stop()
+    await nextjs_client.close()
+    session_registry.disconnect_all()
+    engine_registry.dispose_all()
+    llm_executor.shutdown()
+    db_executor.shutdown()
 
 @app.get("/agent-info")
 async def get_agent_info(agent: DatabaseAnalystAgent = Depends(get_agent)):
@@ -144,7 +379,7 @@ async def connect_database(connection: DatabaseConnection, agent: DatabaseAnalys
             connection.password
         )
         
-        success, message = agent.connect_database(connection_string)
+        success, message = await db_executor.run(agent.connect_database, connection_string)
         
         if success:
             status = agent.get_connection_status()
@@ -157,24 +392,23 @@ async def connect_database(connection: DatabaseConnection, agent: DatabaseAnalys
         else:
             raise HTTPException(status_code=400, detail=message)
             
+    except (ExecutorSaturatedError, ConnectionLimitError) as e:
+        raise overloaded_exception(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Connection failed: {str(e)}")
 
 @app.get("/connection-status", response_model=ConnectionStatus)
-async def get_connection_status():
+async def get_connection_status(x_session_id: Optional[str] = Header(None)):
     """Get current database connection status"""
-    global agent
     try:
+        agent = session_registry.peek(x_session_id or DEFAULT_SESSION_ID)
         if agent is None:
-            try:
-                agent = DatabaseAnalystAgent()
-            except Exception:
-                return ConnectionStatus(
-                    connected=False,
-                    tables_count=0,
-                    tables=[],
-                    message="Not connected"
-                )
+            return ConnectionStatus(
+                connected=False,
+                tables_count=0,
+                tables=[],
+                message="Not connected"
+            )
         status = agent.get_connection_status()
         return ConnectionStatus(
             connected=status['connected'],
@@ -196,18 +430,29 @@ async def get_table_info(agent: DatabaseAnalystAgent = Depends(get_agent)):
     try:
         if not agent.get_connection_status()['connected']:
             raise HTTPException(status_code=400, detail="No database connection")
+        # Served from the in-memory schema, so no worker thread is needed
         return agent.get_table_info()
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/cache-stats")
+async def get_cache_stats(agent: DatabaseAnalystAgent = Depends(get_agent)):
+    """Get query cache hit/miss statistics"""
+    try:
+        return agent.get_cache_stats()
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/refresh-schema")
-async def refresh_schema(agent: DatabaseAnalystAgent = Depends(get_agent)):
-    """Refresh database schema (useful after importing data)"""
+async def refresh_schema(full: bool = False, agent: DatabaseAnalystAgent = Depends(get_agent)):
+    """Refresh database schema (useful after importing data); only changed tables unless full=true"""
     try:
         if not agent.get_connection_status()['connected']:
             raise HTTPException(status_code=400, detail="No database connection")
         
-        success, message = agent.refresh_schema()
+        success, message = await db_executor.run(agent.refresh_schema, full)
         
         if success:
             status = agent.get_connection_status()
@@ -221,11 +466,21 @@ async def refresh_schema(agent: DatabaseAnalystAgent = Depends(get_agent)):
             raise HTTPException(status_code=500, detail=message)
             
     except Exception as e:
+        if isinstance(e, ExecutorSaturatedError):
+            raise overloaded_exception(e)
         raise HTTPException(status_code=500, detail=f"Failed to refresh schema: {str(e)}")
 
 @app.post("/query")
-async def execute_query(request: QueryRequest, agent: DatabaseAnalystAgent = Depends(get_agent)):
+async def execute_query(request: QueryRequest, accept: Optional[str] = Header(None),
+                        agent: DatabaseAnalystAgent = Depends(get_agent)):
     """Execute natural language query with streaming response"""
+    ensure_capacity()
+    try:
+        result_format = ResultEncoder.negotiate(request.format, accept)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    request_started = time.monotonic()
     
     async def generate_stream():
         try:
@@ -237,43 +492,50 @@ async def execute_query(request: QueryRequest, agent: DatabaseAnalystAgent = Dep
             print(f"🔍 Processing query for user: {request.user_id}, chat: {request.chat_id}")
             print(f"📝 Query: {request.query}")
 
-            # Execute the query
-            result = agent.execute_natural_language_query(request.query)
-
-            # Stream the text response character by character
-            response_text = result['response']
             yield f"data: {json.dumps({'type': 'start'})}\n\n"
-            
-            # Stream text in chunks of 3-5 characters for smooth animation
-            chunk_size = 4
-            for i in range(0, len(response_text), chunk_size):
-                chunk = response_text[i:i+chunk_size]
+
+            # Large results: stream rows in batches from a server-side cursor
+            if request.stream_rows:
+                plan = await llm_executor.run(agent.prepare_query, request.query, request.synthesize)
+                if plan['result'] is None:
+                    async for event in stream_result_rows(agent, plan, request.query, request.batch_size, result_format):
+                        yield event
+                    yield f"data: {json.dumps({'type': 'complete', 'success': True})}\n\n"
+                    metrics.observe("query.total_time", (time.monotonic() - request_started) * 1000)
+                    return
+                result = await db_executor.run(agent.execute_query_plan, plan)
+            else:
+                # Generate SQL (LLM pool), then execute it once (DB pool)
+                plan, result = await plan_and_execute(agent, request.query, request.synthesize)
+
+            # Stream the answer text as it is produced: LLM tokens as the model
+            # emits them, or the local summary in one piece
+            first_chunk = True
+            async for chunk in stream_agent_answer(agent, plan, result):
+                if first_chunk:
+                    metrics.observe("query.time_to_first_token", (time.monotonic() - request_started) * 1000)
+                    first_chunk = False
                 yield f"data: {json.dumps({'type': 'text', 'content': chunk})}\n\n"
-                await asyncio.sleep(0.02)  # Small delay for streaming effect
             
             yield f"data: {json.dumps({'type': 'text_complete'})}\n\n"
 
             # Stream SQL query if available
             if result['sql_query']:
-                await asyncio.sleep(0.1)  # Brief pause before SQL
                 yield f"data: {json.dumps({'type': 'sql', 'content': result['sql_query']})}\n\n"
 
             # Stream data if available
             if result['data'] is not None:
-                data_list = result['data'].to_dict('records')
-                
-                # Prepare visualization data
-                visualization_data = None
-                if not result['data'].empty:
-                    visualization_data = prepare_visualization_data(result['data'], request.query)
-                
-                await asyncio.sleep(0.1)  # Brief pause before data
-                yield f"data: {json.dumps({'type': 'data', 'content': data_list, 'visualization': visualization_data})}\n\n"
+                data_event = {'type': 'data', **result_data_event(result, request.query, result_format)}
+                yield f"data: {ResultEncoder.dumps(data_event)}\n\n"
 
             # Final success message
             yield f"data: {json.dumps({'type': 'complete', 'success': result['success']})}\n\n"
+            metrics.observe("query.total_time", (time.monotonic() - request_started) * 1000)
             print(f"✅ Query processed successfully: {result['success']}")
 
+        except ExecutorSaturatedError as e:
+            print(f"🚦 {str(e)}")
+            yield f"data: {json.dumps({'type': 'error', 'content': 'Server busy, please retry shortly', 'retry_after': 1})}\n\n"
         except Exception as e:
             error_msg = f"Query execution failed: {str(e)}"
             print(f"❌ {error_msg}")
@@ -289,11 +551,117 @@ async def execute_query(request: QueryRequest, agent: DatabaseAnalystAgent = Dep
         }
     )
 
+@app.post("/query/batch")
+async def execute_query_batch(request: BatchQueryRequest, accept: Optional[str] = Header(None),
+                              agent: DatabaseAnalystAgent = Depends(get_agent)):
+    """Answer several questions concurrently, streaming each result as soon as it is ready.
+
+    Events carry the question's id: 'result' (answer, SQL, data) or 'error'
+    per question, then one 'complete' with totals. Total time tracks the
+    slowest question rather than the sum of all of them.
+    """
+    ensure_capacity()
+    if not request.questions:
+        raise HTTPException(status_code=400, detail="No questions given")
+    if len(request.questions) > BATCH_CONFIG['max_questions']:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_CONFIG['max_questions']} questions per batch")
+    try:
+        result_format = ResultEncoder.negotiate(request.format, accept)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not agent.get_connection_status()['connected']:
+        raise HTTPException(status_code=400, detail="No database connection")
+
+    questions = [(question.id or str(i), question.query) for i, question in enumerate(request.questions)]
+    concurrency = min(request.max_concurrency or BATCH_CONFIG['concurrency'], BATCH_CONFIG['concurrency'])
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+    batch_started = time.monotonic()
+
+    async def answer(question_id: str, query: str) -> Dict[str, Any]:
+        # Each task has its own context, so this only lowers this batch's LLM calls
+        llm_priority.set(BATCH)
+        async with semaphore:
+            started = time.monotonic()
+            try:
+                result = await run_agent_query(agent, query, request.synthesize)
+                event = {
+                    'type': 'result',
+                    'id': question_id,
+                    'success': result['success'],
+                    'response': result['response'],
+                    'sql_query': result.get('sql_query'),
+                    'cached': result.get('cached', False)
+                }
+                if result['data'] is not None:
+                    event.update(result_data_event(result, query, result_format))
+            except ExecutorSaturatedError as e:
+                print(f"🚦 {str(e)}")
+                event = {'type': 'error', 'id': question_id, 'content': 'Server busy, please retry shortly', 'retry_after': 1}
+            except Exception as e:
+                event = {'type': 'error', 'id': question_id, 'content': f"Query execution failed: {str(e)}"}
+            event['elapsed_ms'] = round((time.monotonic() - started) * 1000, 1)
+            metrics.observe("query.batch_item_time", event['elapsed_ms'])
+            return event
+
+    async def generate_stream():
+        print(f"📦 Processing batch of {len(questions)} questions for user: {request.user_id}")
+        yield f"data: {json.dumps({'type': 'start', 'count': len(questions), 'ids': [qid for qid, _ in questions]})}\n\n"
+        tasks = [asyncio.create_task(answer(question_id, query)) for question_id, query in questions]
+        succeeded = failed = 0
+        try:
+            for finished in asyncio.as_completed(tasks):
+                event = await finished
+                if event['type'] == 'result' and event['success']:
+                    succeeded += 1
+                else:
+                    failed += 1
+                yield f"data: {ResultEncoder.dumps(event)}\n\n"
+        finally:
+            # Client went away: don't keep answering questions nobody will read
+            for task in tasks:
+                task.cancel()
+        total_ms = round((time.monotonic() - batch_started) * 1000, 1)
+        metrics.observe("query.batch_total_time", total_ms)
+        yield f"data: {json.dumps({'type': 'complete', 'succeeded': succeeded, 'failed': failed, 'total_ms': total_ms})}\n\n"
+
+    return StreamingResponse(
+        generate_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no"  # Disable buffering for nginx
+        }
+    )
+
+@app.get("/query/{query_id}/page")
+async def get_query_page(query_id: str, token: str, format: Optional[str] = None,
+                         accept: Optional[str] = Header(None), agent: DatabaseAnalystAgent = Depends(get_agent)):
+    """Fetch the next page of a query result using the continuation token from the previous page"""
+    try:
+        result_format = ResultEncoder.negotiate(format, accept)
+        page = await db_executor.run(agent.get_result_page, query_id, token)
+        page['format'] = result_format
+        page['data'] = ResultEncoder.encode(page['data'], result_format)
+        return Response(content=ResultEncoder.dumps(page), media_type="application/json")
+    except KeyError as e:
+        raise HTTPException(status_code=410, detail=str(e).strip("'"))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ExecutorSaturatedError as e:
+        raise overloaded_exception(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.post("/chat", response_model=ChatResponse)
 async def process_chat(request: ChatRequest, agent: DatabaseAnalystAgent = Depends(get_agent)):
     """
     Process chat message and save to NextJS
     This endpoint handles the complete flow: Query -> Process -> Save -> Respond
+    With write-behind saves the answer is returned once the save is spooled.
+    A message to an existing chat returns straight away with a pending_id. A
+    new chat waits up to CHAT_NEW_CHAT_WAIT seconds for NextJS so its
+    chat_id can be returned; if the save is slower, only pending_id is set.
     """
     try:
         # Check database connection
@@ -308,17 +676,17 @@ async def process_chat(request: ChatRequest, agent: DatabaseAnalystAgent = Depen
         print(f"📝 Message: {request.message}")
 
         # Execute the query
-        result = agent.execute_natural_language_query(request.message)
+        result = await run_agent_query(agent, request.message, request.synthesize)
 
         # Convert DataFrame to list of dictionaries for JSON serialization
         data_list = None
         if result['data'] is not None:
-            data_list = result['data'].to_dict('records')
+            data_list = ResultEncoder.to_records(result['data'])
 
         # Prepare visualization data
         visualization_data = None
         if result['data'] is not None and not result['data'].empty:
-            visualization_data = prepare_visualization_data(result['data'], request.message)
+            visualization_data = prepare_visualization_data(result['data'], request.message, aggregated=result.get('chart_data'))
 
         # Prepare data for NextJS
         chat_data = {
@@ -332,13 +700,32 @@ async def process_chat(request: ChatRequest, agent: DatabaseAnalystAgent = Depen
             "success": result['success']
         }
 
-        # Send to NextJS API to save
-        if request.chat_id:
-            # Add message to existing chat
-            nextjs_response = await send_to_nextjs(f"chat/{request.chat_id}", chat_data, "POST")
-        else:
-            # Create new chat
-            nextjs_response = await send_to_nextjs("chat", chat_data, "POST")
+        # Existing chats get the message appended, otherwise NextJS creates a new chat
+        endpoint = f"chat/{request.chat_id}" if request.chat_id else "chat"
+
+        if CHAT_WRITE_BEHIND:
+            # Answer now; the save is delivered in the background and survives restarts.
+            # Only a new chat waits briefly, since the client needs the chat id NextJS assigns
+            pending_id, saved = await chat_save_queue.enqueue(
+                endpoint, ResultEncoder.dumps(chat_data), wait=0 if request.chat_id else CHAT_NEW_CHAT_WAIT
+            )
+            if saved and saved['status'] == 'delivered':
+                return ChatResponse(
+                    success=True,
+                    message_id=saved['message_id'],
+                    chat_id=saved['chat_id'],
+                    response=result['response']
+                )
+            return ChatResponse(
+                success=True,
+                chat_id=request.chat_id,
+                pending_id=pending_id,
+                response=result['response']
+            )
+
+        save_started = time.monotonic()
+        nextjs_response = await send_to_nextjs(endpoint, chat_data, "POST")
+        metrics.observe("chat.save_time", (time.monotonic() - save_started) * 1000)
 
         return ChatResponse(
             success=True,
@@ -350,6 +737,8 @@ async def process_chat(request: ChatRequest, agent: DatabaseAnalystAgent = Depen
     except HTTPException:
         # Re-raise HTTP exceptions (from NextJS API calls)
         raise
+    except ExecutorSaturatedError as e:
+        raise overloaded_exception(e)
     except Exception as e:
         error_msg = f"Chat processing failed: {str(e)}"
         print(f"❌ {error_msg}")
@@ -359,34 +748,22 @@ async def process_chat(request: ChatRequest, agent: DatabaseAnalystAgent = Depen
             response=""
         )
 
-def prepare_visualization_data(df: pd.DataFrame, query: str) -> Dict[str, Any]:
-    """Prepare chart data configuration for frontend"""
-    if df.empty or len(df.columns) < 2:
-        return None
+def prepare_visualization_data(df: pd.DataFrame, query: str, include_data: bool = True,
+                               aggregated: Optional[tuple] = None) -> Dict[str, Any]:
+    """Prepare chart data configuration for frontend (see ChartSpecEngine).
 
-    query_lower = query.lower()
-    df_viz = df.head(20)  # Limit for visualization
-
-    # Determine chart type based on query
-    chart_type = "bar"  # default
-    if any(keyword in query_lower for keyword in ['trend', 'time', 'month', 'year', 'date']):
-        chart_type = "line"
-    elif any(keyword in query_lower for keyword in ['distribution', 'count', 'percentage']) and len(df_viz) <= 10:
-        chart_type = "pie"
-    elif any(keyword in query_lower for keyword in ['top', 'highest', 'best', 'most']):
-        chart_type = "bar"
-
-    # Prepare chart data
-    chart_data = {
-        'type': chart_type,
-        'data': df_viz.to_dict('records'),
-        'columns': list(df_viz.columns),
-        'x_axis': df_viz.columns[0],
-        'y_axis': df_viz.columns[1] if len(df_viz.columns) > 1 else df_viz.columns[0],
-        'title': f"Analysis: {query[:50]}{'...' if len(query) > 50 else ''}"
-    }
-
-    return chart_data
+    aggregated is the (frame, aggregation info) ChartQueryPlanner computed
+    for trend and distribution questions; when present it is charted
+    instead of the raw rows. With include_data=False and a chart that uses
+    the result's leading rows unchanged, the rows are not repeated;
+    'data_rows' says how many. A chart that can't be built is left out
+    rather than failing the query.
+    """
+    try:
+        return chart_spec_engine.build(df, query, include_data=include_data, aggregated=aggregated)
+    except Exception as e:
+        print(f"⚠️ Could not prepare chart data: {str(e)}")
+        return None
 
 @app.get("/suggestions")
 async def get_query_suggestions(partial_query: Optional[str] = "", agent: DatabaseAnalystAgent = Depends(get_agent)):
@@ -400,7 +777,7 @@ async def get_query_suggestions(partial_query: Optional[str] = "", agent: Databa
 async def disconnect_database(agent: DatabaseAnalystAgent = Depends(get_agent)):
     """Disconnect from database"""
     try:
-        agent.disconnect()
+        await db_executor.run(agent.disconnect)
         return {"message": "Disconnected successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -415,6 +792,14 @@ async def get_user_chats(user_id: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/chat/pending/{pending_id}")
+async def get_pending_chat_save(pending_id: str):
+    """Delivery status of a write-behind chat save, with NextJS's ids once delivered"""
+    status = await chat_save_queue.status(pending_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired pending id")
+    return {"pending_id": pending_id, **status}
+
 @app.get("/chat/{chat_id}")
 async def get_chat(chat_id: str):
     """Get specific chat with messages"""
@@ -454,6 +839,8 @@ async def test_nextjs_connection():
             "error": str(e)
         }
 
+startup_warmup.mark_imported()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000, reload=True)
@@ -0,0 +1,87 @@
+import bisect
+import threading
+
+DEFAULT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram (milliseconds)"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)  # last bucket is +Inf
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, value_ms):
+        """Record one observation"""
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets, value_ms)] += 1
+            self.count += 1
+            self.total_ms += value_ms
+            self.max_ms = max(self.max_ms, value_ms)
+
+    def percentile(self, q):
+        """Approximate percentile (0-100): upper bound of the bucket holding it"""
+        with self._lock:
+            if not self.count:
+                return None
+            target = self.count * q / 100.0
+            seen = 0
+            for i, bucket_count in enumerate(self._counts):
+                seen += bucket_count
+                if seen >= target:
+                    return self.buckets[i] if i < len(self.buckets) else self.max_ms
+            return self.max_ms
+
+    def snapshot(self):
+        """Summary suitable for JSON responses"""
+        with self._lock:
+            counts = list(self._counts)
+            count, total_ms, max_ms = self.count, self.total_ms, self.max_ms
+        buckets = {str(le): c for le, c in zip(self.buckets, counts)}
+        buckets['+Inf'] = counts[-1]
+        return {
+            'count': count,
+            'mean_ms': round(total_ms / count, 2) if count else None,
+            'max_ms': round(max_ms, 2),
+            'p50_ms': self.percentile(50),
+            'p95_ms': self.percentile(95),
+            'p99_ms': self.percentile(99),
+            'buckets': buckets
+        }
+
+class MetricsRegistry:
+    """Process-wide named histograms and counters"""
+
+    def __init__(self):
+        self._histograms = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name):
+        """Get or create a latency histogram"""
+        with self._lock:
+            if name not in self._histograms:
+                self._histograms[name] = LatencyHistogram()
+            return self._histograms[name]
+
+    def observe(self, name, value_ms):
+        self.histogram(name).observe(value_ms)
+
+    def increment(self, name, amount=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            histograms = dict(self._histograms)
+            counters = dict(self._counters)
+        return {
+            'counters': counters,
+            'histograms': {name: hist.snapshot() for name, hist in histograms.items()}
+        }
+
+# Global registry shared by all modules
+metrics = MetricsRegistry()
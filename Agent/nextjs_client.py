@@ -0,0 +1,78 @@
+import time
+import httpx
+from metrics import metrics
+
+try:
+    import h2  # noqa: F401
+except ImportError:  # Optional: HTTP/2 support for httpx
+    h2 = None
+
+class NextJSClient:
+    """Application-lifetime HTTP client for the NextJS persistence API.
+
+    One httpx.AsyncClient is shared by every request so chat saves and
+    fetches reuse keep-alive connections instead of paying TCP/TLS setup
+    each time. Opened on startup (or lazily on first use) and closed on
+    shutdown. HTTP/2 is used when requested and the h2 package is installed.
+    """
+
+    def __init__(self, base_url, timeout=10, max_connections=20, max_keepalive=10, keepalive_expiry=30, http2=False):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry
+        )
+        self.http2 = http2 and h2 is not None
+        if http2 and h2 is None:
+            print("⚠️ NEXTJS_HTTP2 requested but the h2 package is not installed, using HTTP/1.1")
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None or self._client.is_closed:
+            self.start()
+        return self._client
+
+    def start(self):
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(timeout=self.timeout, limits=self.limits, http2=self.http2)
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def request(self, endpoint, method="POST", content=None, params=None):
+        """Send one request and record its latency under nextjs.<resource>.<method>"""
+        url = f"{self.base_url}/{endpoint}"
+        resource = endpoint.split('/', 1)[0] or 'root'
+        started_at = time.monotonic()
+        try:
+            if method == "POST":
+                response = await self.client.post(url, content=content, headers={"Content-Type": "application/json"})
+            elif method == "GET":
+                response = await self.client.get(url, params=params)
+            elif method == "DELETE":
+                response = await self.client.delete(url)
+            else:
+                raise ValueError(f"Unsupported method: {method}")
+        except httpx.HTTPError:
+            metrics.increment("nextjs.errors")
+            raise
+        finally:
+            elapsed_ms = (time.monotonic() - started_at) * 1000
+            metrics.observe("nextjs.request_time", elapsed_ms)
+            metrics.observe(f"nextjs.{resource}.{method}", elapsed_ms)
+        if response.status_code >= 400:
+            metrics.increment("nextjs.errors")
+        return response
+
+    def get_stats(self):
+        return {
+            'open': self._client is not None and not self._client.is_closed,
+            'http2': self.http2,
+            'max_connections': self.limits.max_connections,
+            'max_keepalive_connections': self.limits.max_keepalive_connections
+        }
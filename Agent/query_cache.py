@@ -0,0 +1,94 @@
+import re
+import time
+import threading
+from collections import OrderedDict
+
+class QueryCache:
+    """LRU + TTL cache of natural-language questions to generated SQL.
+
+    Entries are keyed on the normalized question plus the fingerprint of the
+    schema the SQL was generated against, so a schema change can never serve
+    SQL written for different tables or columns.
+    """
+
+    def __init__(self, max_entries=256, ttl_seconds=3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def normalize_question(question):
+        """Normalize a question so trivial variations share one cache entry"""
+        normalized = (question or "").strip().lower()
+        normalized = re.sub(r'\s+', ' ', normalized)
+        return normalized.rstrip('?.!; ')
+
+    def _make_key(self, question, schema_fingerprint):
+        return (schema_fingerprint, self.normalize_question(question))
+
+    def get(self, question, schema_fingerprint):
+        """Return cached SQL for the question, or None on a miss"""
+        if not schema_fingerprint or self.max_entries <= 0:
+            return None
+
+        key = self._make_key(question, schema_fingerprint)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            sql_query, stored_at = entry
+            if self.ttl_seconds and time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                self.evictions += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return sql_query
+
+    def put(self, question, schema_fingerprint, sql_query):
+        """Store generated SQL for the question"""
+        if not schema_fingerprint or not sql_query or self.max_entries <= 0:
+            return
+
+        key = self._make_key(question, schema_fingerprint)
+        with self._lock:
+            self._entries[key] = (sql_query, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, schema_fingerprint=None):
+        """Drop entries for one schema fingerprint, or everything if None"""
+        with self._lock:
+            if schema_fingerprint is None:
+                self._entries.clear()
+            else:
+                stale = [key for key in self._entries if key[0] == schema_fingerprint]
+                for key in stale:
+                    del self._entries[key]
+            self.invalidations += 1
+
+    def get_stats(self):
+        """Get hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations
+            }
@@ -1,5 +1,6 @@
 import pandas as pd
 import re
+from answer_summarizer import AnswerSummarizer
 
 class QueryProcessor:
     """Handles natural language query processing and execution"""
@@ -7,8 +8,19 @@ class QueryProcessor:
     def __init__(self, database_manager):
         self.db_manager = database_manager
     
-    def execute_natural_language_query(self, user_query):
+    def execute_natural_language_query(self, user_query, synthesize=False):
         """Execute natural language query using LlamaIndex"""
+        generated = self.generate_sql(user_query)
+        if generated['sql_query'] is None:
+            return generated
+        return self.execute_sql_query(generated['sql_query'], user_query, synthesize)
+    
+    def generate_sql(self, user_query):
+        """Generate SQL for the question without executing it (the LLM-bound half of a query).
+
+        Returns a result dict; 'sql_query' is None when the model answered with
+        an explanation instead of SQL, in which case the dict is the final result.
+        """
         if not self.db_manager.connection_status:
             return {
                 'response': "Please connect to a database first.",
@@ -18,115 +30,30 @@ class QueryProcessor:
             }
         
         try:
-            # Enhance the query with clearer instructions for better responses
-            enhanced_query = self._enhance_user_query(user_query)
-            
-            # Execute query using LlamaIndex
-            response = self.db_manager.query_engine.query(enhanced_query)
-
-            # Convert response object to string and format for Markdown output
+            # The engine is built with sql_only=True, so this only generates SQL.
+            # The caller executes it exactly once and those rows feed both the
+            # response text and the DataFrame.
+            response = self.db_manager.query_engine.query(user_query)
             response_str = str(response)
             
-            # Get the SQL query that was generated (if available)
-            sql_query = getattr(response, 'metadata', {}).get('sql_query', None)
-            
-            print(f"📊 LlamaIndex response: {response_str[:200]}...")
-            print(f"🔍 SQL from metadata: {sql_query}")
-
-            # Try to extract SQL from response if not in metadata
-            if not sql_query:
-                if 'SELECT' in response_str.upper():
-                    # Try to extract SQL from response
-                    lines = response_str.split('\n')
-                    for line in lines:
-                        if 'SELECT' in line.upper():
-                            sql_query = line.strip()
-                            print(f"📝 Extracted SQL from response: {sql_query}")
-                            break
+            # Get the SQL query that was generated
+            sql_query = getattr(response, 'metadata', {}).get('sql_query', None) or response_str.strip()
+            print(f"🔍 Generated SQL: {sql_query}")
             
-            # If we have a valid SQL query, execute it ourselves to get clean data
-            # This bypasses LlamaIndex's internal execution which might have issues
             if sql_query and 'SELECT' in sql_query.upper():
-                try:
-                    # First try the query as-is
-                    df = self.db_manager.execute_raw_sql(sql_query)
-                    print(f"✅ Successfully executed SQL. Got {len(df)} rows")
-                    
-                    # If no data and this is PostgreSQL, try with public schema
-                    if df.empty and 'FROM user' in sql_query:
-                        print("⚠️ No data with 'user' table. Trying 'public.user'...")
-                        sql_query_with_schema = sql_query.replace('FROM user', 'FROM public.user')
-                        df = self.db_manager.execute_raw_sql(sql_query_with_schema)
-                        print(f"✅ With schema prefix: Got {len(df)} rows")
-                        if not df.empty:
-                            sql_query = sql_query_with_schema
-                    
-                    # If still no data, try to check if table has any rows at all
-                    if df.empty:
-                        print("🔍 Checking if table has any data...")
-                        test_df = self.db_manager.execute_raw_sql("SELECT COUNT(*) as count FROM public.user")
-                        print(f"📊 Table row count: {test_df.iloc[0]['count'] if not test_df.empty else 0}")
-                    
-                    # Create a better response based on the actual data
-                    if not df.empty:
-                        formatted_response = f"Here are the results from the user table:\n\n"
-                        formatted_response += f"Found **{len(df)}** records with the following columns: "
-                        formatted_response += ", ".join([f"**{col}**" for col in df.columns])
-                    else:
-                        formatted_response = "The query executed successfully, but no data was found in the table. The table might be empty."
-                    
-                    return {
-                        'response': formatted_response,
-                        'sql_query': sql_query,
-                        'data': df if not df.empty else None,
-                        'success': True
-                    }
-                except Exception as sql_error:
-                    print(f"❌ SQL execution error: {str(sql_error)}")
-                    formatted_response = f"Error executing the query: {str(sql_error)}"
-                    
-                    return {
-                        'response': formatted_response,
-                        'sql_query': sql_query,
-                        'data': None,
-                        'success': False
-                    }
-            
-            # If no SQL was generated, use LlamaIndex's response
-            formatted_response = self._format_response_markdown(response_str)
-
-            # Check if this is an error/explanation response (not actual data query)
-            is_error_response = self._is_error_or_explanation_response(formatted_response)
-
-            # If it's an error/explanation response, don't return SQL or data
-            if is_error_response:
                 return {
-                    'response': formatted_response,
-                    'sql_query': None,
+                    'response': None,
+                    'sql_query': sql_query,
                     'data': None,
-                    'success': True  # It's still "successful" - just not a data query
+                    'success': True
                 }
-
-            # Execute the SQL to get raw data for visualization
-            df = None
-            if sql_query and sql_query != 'SQL query not available':
-                try:
-                    df = self.db_manager.execute_raw_sql(sql_query)
-                    print(f"✅ SQL executed successfully. Rows returned: {len(df) if df is not None else 0}")
-                except Exception as sql_error:
-                    print(f"❌ SQL execution error: {str(sql_error)}")
-                    # If SQL execution fails, return the error
-                    return {
-                        'response': f"The SQL query failed to execute: {str(sql_error)}\n\nGenerated SQL: `{sql_query}`",
-                        'sql_query': sql_query,
-                        'data': None,
-                        'success': False
-                    }
-
+            
+            # No SQL was generated: the model answered with an explanation or
+            # refusal instead. It's still "successful" - just not a data query
             return {
-                'response': formatted_response,
-                'sql_query': sql_query if sql_query != 'SQL query not available' else None,
-                'data': df if df is not None and not df.empty else None,
+                'response': self._format_response_markdown(response_str),
+                'sql_query': None,
+                'data': None,
                 'success': True
             }
             
@@ -139,6 +66,92 @@ class QueryProcessor:
                 'success': False
             }
     
+    def execute_sql_query(self, sql_query, user_query="", synthesize=False, pager=None):
+        """Execute already-generated SQL (e.g. from the query cache) and build the answer text.
+
+        By default the answer is summarized locally from the result rows; pass
+        synthesize=True to have the LLM write it instead. With a ResultPager,
+        only the first page is fetched and a continuation token is returned
+        when more rows exist.
+        """
+        if not self.db_manager.connection_status:
+            return {
+                'response': "Please connect to a database first.",
+                'sql_query': None,
+                'data': None,
+                'success': False
+            }
+        
+        try:
+            query_id = continuation_token = None
+            if pager is not None:
+                page_state = pager.plan_first_page(sql_query, self.db_manager)
+                df = self.db_manager.execute_raw_sql(page_state['sql'])
+                df, query_id, continuation_token = pager.finish_first_page(page_state, df)
+                sql_query = page_state['display_sql']
+            else:
+                df = self.db_manager.execute_raw_sql(sql_query)
+            print(f"✅ Successfully executed SQL. Got {len(df)} rows")
+
+            # Build the answer text from the actual data
+            if synthesize and not df.empty:
+                formatted_response = self.synthesize_response(user_query, sql_query, df)
+            else:
+                formatted_response = AnswerSummarizer.summarize(df, user_query, partial=bool(continuation_token))
+            if continuation_token:
+                formatted_response += f"\n\nShowing the first **{len(df):,}** rows; more rows are available."
+
+            return {
+                'response': formatted_response,
+                'sql_query': sql_query,
+                'data': df if not df.empty else None,
+                'success': True,
+                'query_id': query_id,
+                'continuation_token': continuation_token
+            }
+        except Exception as sql_error:
+            print(f"❌ SQL execution error: {str(sql_error)}")
+            formatted_response = f"Error executing the query: {str(sql_error)}"
+
+            return {
+                'response': formatted_response,
+                'sql_query': sql_query,
+                'data': None,
+                'success': False
+            }
+    
+    def synthesize_response(self, user_query, sql_query, df):
+        """Have the LLM write the answer from the result rows (opt-in, one extra LLM call)"""
+        try:
+            from llama_index.core import Settings
+            prompt = self._build_synthesis_prompt(user_query, sql_query, df)
+            response_text = str(Settings.llm.complete(prompt))
+            return self._format_response_markdown(response_text)
+        except Exception as e:
+            print(f"⚠️ LLM synthesis failed, using local summary: {str(e)}")
+            return AnswerSummarizer.summarize(df, user_query)
+    
+    def stream_synthesized_response(self, user_query, sql_query, df):
+        """Stream an LLM-written answer, yielding text deltas as the model emits them"""
+        try:
+            from llama_index.core import Settings
+            prompt = self._build_synthesis_prompt(user_query, sql_query, df)
+            for chunk in Settings.llm.stream_complete(prompt):
+                if chunk.delta:
+                    yield chunk.delta
+        except Exception as e:
+            print(f"⚠️ LLM synthesis stream failed, using local summary: {str(e)}")
+            yield AnswerSummarizer.summarize(df, user_query)
+    
+    def _build_synthesis_prompt(self, user_query, sql_query, df):
+        """Fill LlamaIndex's SQL response-synthesis prompt with the result rows"""
+        from llama_index.core.indices.struct_store.sql_query import DEFAULT_RESPONSE_SYNTHESIS_PROMPT_V2
+        return DEFAULT_RESPONSE_SYNTHESIS_PROMPT_V2.format(
+            query_str=self._enhance_user_query(user_query),
+            sql_query=sql_query,
+            context_str=AnswerSummarizer.to_markdown_table(df)
+        )
+    
     def _enhance_user_query(self, user_query: str) -> str:
         """Enhance user query with instructions for better LLM responses"""
         query_lower = user_query.lower()
@@ -166,66 +179,6 @@ class QueryProcessor:
         # Default: return query as-is with general instruction
         return user_query
     
-    def _is_error_or_explanation_response(self, response_text: str) -> bool:
-        """Detect if response is an error/explanation rather than actual data query result.
-        
-        Returns True if the response is:
-        - An error message
-        - An explanation of why something can't be done
-        - A clarification request
-        - Any non-data response
-        """
-        if not response_text:
-            return True
-        
-        response_lower = response_text.lower()
-        
-        # Common phrases that indicate this is NOT a data query response
-        error_phrases = [
-            'i cannot',
-            'i can\'t',
-            'unable to',
-            'not able to',
-            'cannot create',
-            'cannot delete',
-            'cannot update',
-            'cannot modify',
-            'cannot insert',
-            'don\'t have',
-            'do not have',
-            'not available',
-            'not found',
-            'does not exist',
-            'doesn\'t exist',
-            'no data',
-            'no information',
-            'no records',
-            'please provide',
-            'please specify',
-            'could you clarify',
-            'need more information',
-            'which table',
-            'which column',
-            'this tool is designed for',
-            'i am designed to',
-            'i\'m designed to',
-            'only query',
-            'read-only',
-            'error:',
-            'failed to'
-        ]
-        
-        # Check if response contains any error phrases
-        for phrase in error_phrases:
-            if phrase in response_lower:
-                return True
-        
-        # Check if response is very short (likely an explanation, not data)
-        if len(response_text) < 50 and 'SELECT' not in response_text.upper():
-            return True
-        
-        return False
-    
     def validate_query(self, query):
         """Validate user query before processing"""
         if not query or not query.strip():
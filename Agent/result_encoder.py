@@ -0,0 +1,171 @@
+import base64
+import datetime
+import decimal
+import json
+import time
+import numpy as np
+import pandas as pd
+from metrics import metrics
+
+try:
+    import orjson
+except ImportError:  # Optional: faster JSON encoding
+    orjson = None
+
+try:
+    import pyarrow as pa
+except ImportError:  # Optional: Arrow IPC result format
+    pa = None
+
+COLUMNAR_MEDIA_TYPE = "application/vnd.columnar+json"
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+FORMATS = ('records', 'columnar', 'arrow')
+
+def _json_default(value):
+    """Encode values json/orjson don't handle natively"""
+    if isinstance(value, (np.integer,)):
+        return int(value)
+    if isinstance(value, (np.floating,)):
+        return None if np.isnan(value) else float(value)
+    if isinstance(value, np.bool_):
+        return bool(value)
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, (pd.Timestamp, datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return base64.b64encode(bytes(value)).decode('ascii')
+    if value is pd.NaT or value is pd.NA:
+        return None
+    return str(value)
+
+class ResultEncoder:
+    """Serializes query results for SSE events and JSON responses.
+
+    'records' is the row-of-dicts layout the frontend has always used.
+    'columnar' sends column names and types once and one value array per
+    column. 'arrow' is an Arrow IPC stream (base64 inside JSON), available
+    when pyarrow is installed and otherwise negotiated down to columnar. Values are
+    converted per column with vectorized pandas operations, so numpy,
+    Decimal, datetime and NaN values never reach the JSON encoder.
+    """
+
+    @staticmethod
+    def negotiate(requested=None, accept=None):
+        """Pick a format from an explicit request flag, else the Accept header, else records"""
+        if requested:
+            fmt = requested.lower()
+            if fmt not in FORMATS:
+                raise ValueError(f"Unknown result format '{requested}' (expected one of {', '.join(FORMATS)})")
+        elif accept and ARROW_MEDIA_TYPE in accept:
+            fmt = 'arrow'
+        elif accept and COLUMNAR_MEDIA_TYPE in accept:
+            fmt = 'columnar'
+        else:
+            fmt = 'records'
+        # Without pyarrow, Arrow requests are answered in the columnar JSON layout
+        return 'columnar' if fmt == 'arrow' and pa is None else fmt
+
+    @staticmethod
+    def _column(series, temporal='iso'):
+        """(type name, JSON-safe list of values) for one column"""
+        kind = series.dtype.kind
+        has_nulls = series.hasnans if kind in 'fcmM' else series.isna().any()
+
+        if kind == 'M':
+            if temporal == 'epoch_ms':
+                epoch = pd.Timestamp(0, tz=series.dt.tz)
+                values = ((series - epoch) // pd.Timedelta(milliseconds=1)).astype('Int64').astype(object)
+            else:
+                values = series.map(lambda v: v.isoformat(), na_action='ignore').astype(object)
+            return 'timestamp', values.where(series.notna(), None).tolist()
+        if kind == 'm':
+            return 'duration', series.dt.total_seconds().astype(object).where(series.notna(), None).tolist()
+        if kind in 'iufb':
+            type_name = {'i': 'int', 'u': 'int', 'f': 'float', 'b': 'bool'}[kind]
+            if not has_nulls:
+                return type_name, series.tolist()
+            return type_name, series.astype(object).where(series.notna(), None).tolist()
+
+        # Object columns: decide from the first non-null value
+        non_null = series.dropna()
+        sample = non_null.iloc[0] if len(non_null) else None
+        if isinstance(sample, str):
+            type_name = 'string'
+        elif isinstance(sample, decimal.Decimal):
+            type_name = 'decimal'
+        elif isinstance(sample, (datetime.datetime, pd.Timestamp)):
+            type_name = 'timestamp'
+        elif isinstance(sample, datetime.date):
+            type_name = 'date'
+        elif isinstance(sample, (bytes, bytearray, memoryview)):
+            type_name = 'binary'
+        else:
+            type_name = 'object' if sample is not None else 'null'
+
+        if type_name == 'string' and not has_nulls:
+            return type_name, series.tolist()
+        values = [
+            None if v is None or v is pd.NaT or v is pd.NA or (isinstance(v, float) and v != v)
+            else v if isinstance(v, (str, int, float, bool))
+            else _json_default(v)
+            for v in series.tolist()
+        ]
+        return type_name, values
+
+    @staticmethod
+    def to_columnar(df, temporal='epoch_ms'):
+        columns, types, data = [], [], []
+        # By position: JOINs such as SELECT * can repeat a column name, and df[name] would be a frame
+        for position, name in enumerate(df.columns):
+            type_name, values = ResultEncoder._column(df.iloc[:, position], temporal)
+            columns.append(str(name))
+            types.append(type_name)
+            data.append(values)
+        return {'format': 'columnar', 'columns': columns, 'types': types, 'data': data, 'row_count': len(df)}
+
+    @staticmethod
+    def to_records(df):
+        """Rows as dicts with JSON-safe values (timestamps as ISO strings)"""
+        columnar = ResultEncoder.to_columnar(df, temporal='iso')
+        columns = columnar['columns']
+        return [dict(zip(columns, row)) for row in zip(*columnar['data'])] if columns else []
+
+    @staticmethod
+    def to_arrow(df):
+        sink = pa.BufferOutputStream()
+        # from_pandas rejects repeated column names; Arrow tables allow them
+        table = pa.Table.from_arrays(
+            [pa.Array.from_pandas(df.iloc[:, position]) for position in range(len(df.columns))],
+            names=[str(name) for name in df.columns]
+        )
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+
+    @staticmethod
+    def encode(df, fmt='records'):
+        """Encode a DataFrame in the given format; records are returned as a plain list"""
+        started_at = time.monotonic()
+        if fmt == 'arrow':
+            payload = {
+                'format': 'arrow',
+                'encoding': 'base64',
+                'row_count': len(df),
+                'data': base64.b64encode(ResultEncoder.to_arrow(df)).decode('ascii')
+            }
+        elif fmt == 'columnar':
+            payload = ResultEncoder.to_columnar(df)
+        else:
+            payload = ResultEncoder.to_records(df)
+        metrics.observe(f"result.encode.{fmt}", (time.monotonic() - started_at) * 1000)
+        return payload
+
+    @staticmethod
+    def dumps(obj):
+        """JSON text for an already encoded payload (uses orjson when installed)"""
+        if orjson is not None:
+            return orjson.dumps(obj, default=_json_default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS).decode('utf-8')
+        return json.dumps(obj, default=_json_default)
@@ -0,0 +1,249 @@
+import base64
+import hashlib
+import hmac
+import json
+import re
+import secrets
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+# LIMIT n, LIMIT n OFFSET m or MySQL's LIMIT m, n at the end of the query
+LIMIT_PATTERN = re.compile(r'\bLIMIT\s+(\d+)(\s+OFFSET\s+\d+|\s*,\s*\d+)?\s*$', re.IGNORECASE)
+TRAILING_COMMENT_PATTERN = re.compile(r'(--[^\n]*|/\*(?:(?!\*/).)*\*/)$', re.DOTALL)
+SINGLE_TABLE_PATTERN = re.compile(r'\bFROM\s+(?:"?(\w+)"?\.)?"?(\w+)"?', re.IGNORECASE)
+MULTI_SOURCE_PATTERN = re.compile(r'\b(JOIN|GROUP\s+BY|DISTINCT|UNION|INTERSECT|EXCEPT|HAVING)\b|\bFROM\s+\S+\s*,', re.IGNORECASE)
+ORDER_BY_PATTERN = re.compile(r'\bORDER\s+BY\s+(.+)$', re.IGNORECASE | re.DOTALL)
+ORDER_BY_KEYWORD_PATTERN = re.compile(r'\bORDER\s+BY\b', re.IGNORECASE)
+
+class ResultPager:
+    """Bounds result size for generated SQL and serves later pages on demand.
+
+    The first page is fetched with page_size + 1 rows to learn whether more
+    rows exist. Later pages use keyset pagination when the result contains a
+    single-column primary key of its (only) source table. Otherwise they use
+    OFFSET, but only when the query ends in an ORDER BY: without one the
+    database may return rows in a different order on every call, so pages
+    could repeat or skip rows, and the result is returned in one piece (up to
+    max_rows) instead. Paged queries are kept in a bounded LRU with a TTL
+    and addressed by an opaque continuation token.
+
+    Tokens are signed with a per-process key, so a client cannot move its
+    cursor past the row cap, and a query only pages against the database
+    (schema fingerprint) it was first run on. Sessions on the same database
+    share the pager, so a coalesced result's token works from any of them.
+    """
+
+    def __init__(self, page_size=500, max_rows=100000, max_open_queries=256, ttl_seconds=1800):
+        self.page_size = page_size
+        self.max_rows = max_rows
+        self.max_open_queries = max_open_queries
+        self.ttl_seconds = ttl_seconds
+        self._queries = OrderedDict()
+        self._lock = threading.Lock()
+        self._signing_key = secrets.token_bytes(32)
+
+    @staticmethod
+    def strip_sql(sql_query):
+        """Remove whitespace, semicolons and comments from the end of the query"""
+        sql_query = sql_query.strip()
+        while True:
+            stripped = sql_query.rstrip(';').rstrip()
+            match = TRAILING_COMMENT_PATTERN.search(stripped)
+            # A '--' inside a string literal is not a comment
+            if match and stripped[:match.start()].count("'") % 2 == 0:
+                stripped = stripped[:match.start()].rstrip()
+            if stripped == sql_query:
+                return sql_query
+            sql_query = stripped
+
+    @staticmethod
+    def has_final_order_by(sql_query):
+        """Whether the query as a whole is ordered (not just a subquery or window)"""
+        matches = list(ORDER_BY_KEYWORD_PATTERN.finditer(sql_query))
+        if not matches:
+            return False
+        tail = sql_query[matches[-1].end():]
+        return tail.count(')') <= tail.count('(')
+
+    @staticmethod
+    def split_limit(sql_query):
+        """Split a trailing LIMIT off the query: returns (base_sql, limit or None)"""
+        sql_query = ResultPager.strip_sql(sql_query)
+        match = LIMIT_PATTERN.search(sql_query)
+        if not match or match.group(2):
+            # No limit, or LIMIT ... OFFSET / LIMIT m, n written by the model: leave it alone
+            return sql_query, None
+        return sql_query[:match.start()].rstrip(), int(match.group(1))
+
+    @staticmethod
+    def enforce_limit(sql_query, limit, dialect=None):
+        """Return SQL whose result never exceeds limit rows"""
+        if not limit:
+            return ResultPager.strip_sql(sql_query)
+        if dialect == 'mssql':
+            base = ResultPager.strip_sql(sql_query)
+            if re.match(r'^\s*SELECT\s+TOP\b', base, re.IGNORECASE) or ORDER_BY_PATTERN.search(base):
+                return base
+            return f"SELECT TOP ({int(limit)}) * FROM ({base}) AS _limited"
+
+        base, existing = ResultPager.split_limit(sql_query)
+        if existing is None and LIMIT_PATTERN.search(base):
+            return base  # LIMIT ... OFFSET already bounds the result
+        return f"{base} LIMIT {min(existing, limit) if existing is not None else int(limit)}"
+
+    def _find_keyset_column(self, base_sql, db_manager):
+        """Primary key usable for keyset pagination, or None"""
+        if MULTI_SOURCE_PATTERN.search(base_sql) or base_sql.upper().count('SELECT') > 1:
+            return None
+        table_match = SINGLE_TABLE_PATTERN.search(base_sql)
+        if not table_match:
+            return None
+
+        order_match = ORDER_BY_PATTERN.search(base_sql)
+        primary_key = db_manager.get_primary_key(table_match.group(2))
+        if not primary_key:
+            return None
+
+        # The key must be selected under its own name: 'id AS customer_id' can't be ordered by id
+        select_list = re.sub(r'^\s*SELECT\s+', '', base_sql[:table_match.start()], flags=re.IGNORECASE)
+        key_pattern = re.compile(rf'(\w+\.)?"?{re.escape(primary_key)}"?', re.IGNORECASE)
+        if not any(item.strip() == '*' or key_pattern.fullmatch(item.strip()) for item in select_list.split(',')):
+            return None
+
+        if order_match:
+            # Keyset order must match the query's own order
+            order = order_match.group(1).strip().lower()
+            if not re.fullmatch(rf'(\w+\.)?"?{re.escape(primary_key.lower())}"?(\s+asc)?', order):
+                return None
+            base_sql = base_sql[:order_match.start()].rstrip()
+        return primary_key, base_sql
+
+    def plan_first_page(self, sql_query, db_manager):
+        """Decide how to fetch the first page of a generated query.
+
+        Returns a state dict whose 'sql' is what to execute; pass it with the
+        resulting DataFrame to finish_first_page().
+        """
+        dialect = db_manager.engine.dialect.name if db_manager.engine else None
+        base_sql, requested_limit = self.split_limit(sql_query)
+        row_cap = min(filter(None, [requested_limit, self.max_rows]), default=None)
+
+        state = {
+            'mode': 'none',
+            'database': db_manager.schema_fingerprint,
+            'base_sql': base_sql,
+            'row_cap': row_cap,
+            'page_size': self.page_size,
+            'display_sql': self.enforce_limit(sql_query, row_cap, dialect),
+            'sql': None
+        }
+
+        # Small or non-pageable results run as-is (with the row cap enforced)
+        if not self.page_size or dialect == 'mssql' or LIMIT_PATTERN.search(base_sql) or \
+                (row_cap is not None and row_cap <= self.page_size):
+            state['sql'] = self.enforce_limit(sql_query, row_cap, dialect)
+            return state
+
+        fetch = self.page_size + 1
+        keyset = self._find_keyset_column(base_sql, db_manager)
+        if keyset:
+            key, unordered_sql = keyset
+            state.update(mode='keyset', key=key, base_sql=unordered_sql)
+            state['sql'] = f"SELECT * FROM ({unordered_sql}) AS _page ORDER BY {key} LIMIT {fetch}"
+        elif self.has_final_order_by(base_sql):
+            state['mode'] = 'offset'
+            state['sql'] = f"{base_sql} LIMIT {fetch}"
+        else:
+            # Unordered results cannot be paged reliably with OFFSET
+            state['sql'] = self.enforce_limit(sql_query, row_cap, dialect)
+        return state
+
+    def finish_first_page(self, state, df):
+        """Trim the look-ahead row and register a continuation if more rows exist.
+
+        Returns (page_df, query_id, continuation_token); the last two are None
+        when the result is complete.
+        """
+        if state['mode'] == 'none' or df is None or len(df) <= state['page_size']:
+            return df, None, None
+
+        page = df.iloc[:state['page_size']]
+        query_id = uuid.uuid4().hex
+        with self._lock:
+            self._queries[query_id] = (state, time.monotonic())
+            self._queries.move_to_end(query_id)
+            while len(self._queries) > self.max_open_queries:
+                self._queries.popitem(last=False)
+        return page, query_id, self._next_token(query_id, state, page, len(page))
+
+    def _next_token(self, query_id, state, page, rows_served):
+        """Continuation token after a page, or None when the row cap is reached"""
+        if state['row_cap'] is not None and rows_served >= state['row_cap']:
+            return None
+        cursor = {'id': query_id, 'served': rows_served}
+        if state['mode'] == 'keyset':
+            last_key = page[state['key']].iloc[-1]
+            cursor['after'] = last_key.item() if hasattr(last_key, 'item') else last_key
+            if not isinstance(cursor['after'], (int, float, str)):
+                cursor.pop('after')
+                cursor['offset'] = rows_served
+        else:
+            cursor['offset'] = rows_served
+        payload = base64.urlsafe_b64encode(json.dumps(cursor).encode('utf-8')).decode('ascii')
+        return f"{payload}.{self._sign(payload)}"
+
+    def _sign(self, payload):
+        return hmac.new(self._signing_key, payload.encode('ascii'), hashlib.sha256).hexdigest()
+
+    def _decode_token(self, token):
+        try:
+            payload, signature = token.rsplit('.', 1)
+            if not hmac.compare_digest(signature, self._sign(payload)):
+                raise ValueError("bad signature")
+            return json.loads(base64.urlsafe_b64decode(payload.encode('ascii')))
+        except Exception:
+            raise ValueError("Invalid continuation token")
+
+    def fetch_page(self, query_id, token, db_manager):
+        """Fetch the page a continuation token points at.
+
+        Returns (page_df, next_token); next_token is None on the last page.
+        Raises KeyError if the query expired and ValueError for a bad token.
+        """
+        cursor = self._decode_token(token)
+        if cursor.get('id') != query_id:
+            raise ValueError("Continuation token does not belong to this query")
+
+        with self._lock:
+            entry = self._queries.get(query_id)
+            if entry is None or (self.ttl_seconds and time.monotonic() - entry[1] > self.ttl_seconds):
+                self._queries.pop(query_id, None)
+                raise KeyError(f"Query {query_id} has expired; please run it again")
+            self._queries[query_id] = (entry[0], time.monotonic())
+            self._queries.move_to_end(query_id)
+        state = entry[0]
+        if state['database'] != db_manager.schema_fingerprint:
+            raise ValueError("Continuation token belongs to a query on another database")
+
+        served = int(cursor.get('served', 0))
+        page_size = state['page_size']
+        if state['row_cap'] is not None:
+            page_size = min(page_size, state['row_cap'] - served)
+        fetch = page_size + 1
+
+        if 'after' in cursor:
+            sql = (f"SELECT * FROM ({state['base_sql']}) AS _page "
+                   f"WHERE {state['key']} > :after ORDER BY {state['key']} LIMIT {fetch}")
+            df = db_manager.execute_raw_sql(sql, params={'after': cursor['after']})
+        else:
+            order = f" ORDER BY {state['key']}" if state['mode'] == 'keyset' else ""
+            sql = f"{state['base_sql']}{order} LIMIT {fetch} OFFSET {int(cursor['offset'])}"
+            df = db_manager.execute_raw_sql(sql)
+
+        page = df.iloc[:page_size]
+        next_token = None
+        if len(df) > page_size:
+            next_token = self._next_token(query_id, state, page, served + len(page))
+        return page, next_token
@@ -0,0 +1,105 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+from sqlalchemy import text
+from catalog_introspector import CatalogIntrospector
+
+SNAPSHOT_FORMAT = 2  # Bump when the snapshot layout changes so old files are ignored
+
+# Cheap per-dialect queries whose result changes whenever tables or columns change
+CATALOG_VERSION_QUERIES = {
+    'sqlite': "PRAGMA schema_version",
+    'postgresql': (
+        "SELECT count(*), md5(string_agg(table_name || '.' || column_name || ':' || data_type, ',' "
+        "ORDER BY table_name, ordinal_position)) "
+        "FROM information_schema.columns WHERE table_schema = 'public'"
+    ),
+    'mysql': (
+        "SELECT COUNT(*), SUM(CRC32(CONCAT(table_name, '.', column_name, ':', column_type))) "
+        "FROM information_schema.columns WHERE table_schema = DATABASE()"
+    ),
+    'mssql': "SELECT COUNT(*), MAX(modify_date) FROM sys.objects WHERE type = 'U'"
+}
+
+def catalog_version(engine):
+    """Short string identifying the current catalog state, or None if the dialect has no cheap check"""
+    query = CATALOG_VERSION_QUERIES.get(engine.dialect.name)
+    if not query:
+        return None
+    try:
+        with engine.connect() as conn:
+            row = conn.execute(text(query)).fetchone()
+        return hashlib.sha256(json.dumps(list(row), default=str).encode('utf-8')).hexdigest()[:16]
+    except Exception as e:
+        print(f"⚠️ Could not read catalog version: {str(e)}")
+        return None
+
+def connection_key(engine):
+    """Snapshot key for a database: the URL without its password"""
+    url = engine.url.render_as_string(hide_password=True)
+    return hashlib.sha256(url.encode('utf-8')).hexdigest()[:24]
+
+def introspect_schema(engine, sample_rows=3):
+    """Read a fresh snapshot from the database catalog"""
+    snapshot = CatalogIntrospector(engine).introspect(sample_rows=sample_rows)
+    snapshot['format'] = SNAPSHOT_FORMAT
+    return snapshot
+
+def table_signature(entry):
+    """Hash of a table's structure (columns, keys, comment); sample rows and row counts are ignored"""
+    structure = [entry['columns'], entry['primary_key'], entry['foreign_keys'], entry.get('comment')]
+    return hashlib.sha256(json.dumps(structure, default=str).encode('utf-8')).hexdigest()[:16]
+
+def diff_snapshots(old_snapshot, new_snapshot):
+    """Tables added, dropped and altered between two snapshots"""
+    old_tables, new_tables = old_snapshot['tables'], new_snapshot['tables']
+    return {
+        'added': [table for table in new_tables if table not in old_tables],
+        'dropped': [table for table in old_tables if table not in new_tables],
+        'altered': [
+            table for table in new_tables
+            if table in old_tables and table_signature(new_tables[table]) != table_signature(old_tables[table])
+        ]
+    }
+
+class SchemaSnapshotStore:
+    """Stores schema snapshots as JSON files keyed by database and catalog version"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def load(self, key, version):
+        """Snapshot saved for this catalog version, or None"""
+        if not self.directory or not version:
+            return None
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        if stored.get('version') != version or stored.get('snapshot', {}).get('format') != SNAPSHOT_FORMAT:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return stored['snapshot']
+
+    def save(self, key, version, snapshot):
+        """Write a snapshot atomically; failures only cost the next connect a re-introspection"""
+        if not self.directory or not version:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'version': version, 'saved_at': time.time(), 'snapshot': snapshot}, f, default=str)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            print(f"⚠️ Could not save schema snapshot: {str(e)}")
@@ -0,0 +1,162 @@
+import re
+import threading
+import numpy as np
+
+# Number words are mapped to digits so "top 10" and "the ten biggest" compare equal
+NUMBER_WORDS = {
+    'one': '1', 'two': '2', 'three': '3', 'four': '4', 'five': '5',
+    'six': '6', 'seven': '7', 'eight': '8', 'nine': '9', 'ten': '10',
+    'eleven': '11', 'twelve': '12', 'fifteen': '15', 'twenty': '20',
+    'fifty': '50', 'hundred': '100'
+}
+
+class SemanticQueryCache:
+    """Reuses generated SQL for paraphrased questions via embedding similarity.
+
+    Question embeddings are kept L2-normalized in a NumPy matrix so a lookup is
+    a single matrix-vector product. The embedder is any callable mapping text to
+    a vector; by default it uses the embedding model configured in LLMManager.
+    """
+
+    def __init__(self, embedder=None, similarity_threshold=0.92, max_entries=1000):
+        self.embedder = embedder
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self._vectors = None
+        self._entries = []  # (schema_fingerprint, question, numeric_signature, sql_query)
+        self._last_used = []
+        self._clock = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.embed_errors = 0
+
+    def _embed(self, text):
+        """Embed text with the configured embedder, normalized to unit length"""
+        embedder = self.embedder
+        if embedder is None:
+            from llama_index.core import Settings
+            embedder = Settings.embed_model.get_text_embedding
+        vector = np.asarray(embedder(text), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    @staticmethod
+    def _numeric_signature(question):
+        """Numbers mentioned in the question; paraphrases must agree on these"""
+        tokens = re.findall(r'[a-z]+|\d+(?:\.\d+)?', question.lower())
+        return tuple(sorted(NUMBER_WORDS.get(tok, tok) for tok in tokens
+                            if tok[0].isdigit() or tok in NUMBER_WORDS))
+
+    def lookup(self, question, schema_fingerprint):
+        """Find SQL stored for a similar question.
+
+        Returns (sql_query, similarity, vector). sql_query is None on a miss;
+        vector is the question embedding so callers can pass it to add().
+        """
+        if not schema_fingerprint or self.max_entries <= 0:
+            return None, 0.0, None
+
+        try:
+            vector = self._embed(question)
+        except Exception as e:
+            print(f"⚠️ Semantic cache embedding failed: {str(e)}")
+            self.embed_errors += 1
+            return None, 0.0, None
+
+        signature = self._numeric_signature(question)
+        with self._lock:
+            if self._vectors is not None and self._vectors.shape[1] != vector.shape[0]:
+                # Embedding model changed; old vectors are not comparable
+                self._clear_locked()
+            if self._vectors is None or not self._entries:
+                self.misses += 1
+                return None, 0.0, vector
+
+            similarities = self._vectors @ vector
+            eligible = np.array([
+                entry[0] == schema_fingerprint and entry[2] == signature
+                for entry in self._entries
+            ])
+            similarities = np.where(eligible, similarities, -1.0)
+            best = int(np.argmax(similarities))
+            score = float(similarities[best])
+
+            if score < self.similarity_threshold:
+                self.misses += 1
+                return None, score, vector
+
+            self._clock += 1
+            self._last_used[best] = self._clock
+            self.hits += 1
+            print(f"🧠 Semantic cache hit ({score:.3f}): '{self._entries[best][1]}'")
+            return self._entries[best][3], score, vector
+
+    def add(self, question, schema_fingerprint, sql_query, vector=None):
+        """Index a question and the SQL generated for it"""
+        if not schema_fingerprint or not sql_query or self.max_entries <= 0:
+            return
+
+        if vector is None:
+            try:
+                vector = self._embed(question)
+            except Exception as e:
+                print(f"⚠️ Semantic cache embedding failed: {str(e)}")
+                self.embed_errors += 1
+                return
+
+        entry = (schema_fingerprint, question, self._numeric_signature(question), sql_query)
+        with self._lock:
+            if self._vectors is not None and self._vectors.shape[1] != vector.shape[0]:
+                # Embedding model changed; old vectors are not comparable
+                self._clear_locked()
+
+            self._clock += 1
+            if self._vectors is None:
+                self._vectors = vector[np.newaxis, :]
+            elif len(self._entries) >= self.max_entries:
+                # Replace the least recently used entry in place
+                victim = int(np.argmin(self._last_used))
+                self._vectors[victim] = vector
+                self._entries[victim] = entry
+                self._last_used[victim] = self._clock
+                return
+            else:
+                self._vectors = np.vstack([self._vectors, vector])
+
+            self._entries.append(entry)
+            self._last_used.append(self._clock)
+
+    def _clear_locked(self):
+        self._vectors = None
+        self._entries = []
+        self._last_used = []
+
+    def invalidate(self, schema_fingerprint=None):
+        """Drop entries for one schema fingerprint, or everything if None"""
+        with self._lock:
+            if schema_fingerprint is None or not self._entries:
+                self._clear_locked()
+                return
+
+            keep = [i for i, entry in enumerate(self._entries) if entry[0] != schema_fingerprint]
+            if not keep:
+                self._clear_locked()
+                return
+            self._vectors = self._vectors[keep]
+            self._entries = [self._entries[i] for i in keep]
+            self._last_used = [self._last_used[i] for i in keep]
+
+    def get_stats(self):
+        """Get index size, threshold and hit-rate statistics"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'similarity_threshold': self.similarity_threshold,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'embed_errors': self.embed_errors
+            }
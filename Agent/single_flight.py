@@ -0,0 +1,48 @@
+import asyncio
+from metrics import metrics
+
+class SingleFlight:
+    """Coalesces concurrent identical async computations into one.
+
+    The first caller for a key starts the computation as its own task; callers
+    arriving while it runs await the same task instead of starting another.
+    The task is shielded, so a caller that disconnects doesn't cancel it for
+    the others. Keys are forgotten as soon as the computation finishes, so
+    this never serves stale results. Must be used from one event loop.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._inflight = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    def _forget(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # Mark as retrieved even if every caller went away
+
+    async def run(self, key, fn):
+        """Await fn() once per key among concurrent callers; returns (result, coalesced)"""
+        task = self._inflight.get(key)
+        coalesced = task is not None
+        if coalesced:
+            self.coalesced += 1
+            metrics.increment(f"{self.name}.coalesced")
+        else:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda finished: self._forget(key, finished))
+            self.executions += 1
+            metrics.increment(f"{self.name}.executions")
+        return await asyncio.shield(task), coalesced
+
+    def get_stats(self):
+        total = self.executions + self.coalesced
+        return {
+            'in_flight': len(self._inflight),
+            'executions': self.executions,
+            'coalesced': self.coalesced,
+            'coalesced_rate': round(self.coalesced / total, 3) if total else 0.0
+        }
@@ -0,0 +1,68 @@
+from sqlalchemy import MetaData
+from llama_index.core import SQLDatabase
+
+class UnreflectedMetaData(MetaData):
+    """MetaData that skips reflection; table descriptions come from the snapshot instead"""
+
+    def reflect(self, *args, **kwargs):
+        pass
+
+class SnapshotSQLDatabase(SQLDatabase):
+    """SQLDatabase that describes tables from a schema snapshot instead of reflecting them.
+
+    SQLDatabase's own constructor runs, but with metadata that skips
+    reflection, so construction costs one table-name listing. Table names,
+    columns and table info (including sample rows) are served from memory
+    through the public methods overridden below.
+    """
+
+    def __init__(self, engine, snapshot, include_tables=None):
+        # Set first: SQLDatabase.__init__ already calls get_usable_table_names()
+        self._snapshot_tables = snapshot['tables']
+        self._snapshot_include = set(include_tables) if include_tables else None
+        super().__init__(engine, metadata=UnreflectedMetaData())
+
+    def update_snapshot(self, snapshot):
+        """Switch to a newer snapshot in place so engines built on this database stay valid"""
+        self._snapshot_tables = snapshot['tables']
+        if self._snapshot_include is not None:
+            self._snapshot_include = set(self._snapshot_tables)
+
+    def get_usable_table_names(self):
+        tables = set(self._snapshot_tables)
+        if self._snapshot_include is not None:
+            tables &= self._snapshot_include
+        return sorted(tables)
+
+    def get_table_columns(self, table_name):
+        return [
+            {'name': name, 'type': col_type, 'comment': comment}
+            for name, col_type, comment in self._snapshot_tables[table_name]['columns']
+        ]
+
+    def get_single_table_info(self, table_name):
+        """Table description in the same format as SQLDatabase, followed by sample rows"""
+        entry = self._snapshot_tables[table_name]
+        template = "Table '{table_name}' has columns: {columns}, "
+        if entry.get('comment'):
+            template += f"with comment: ({entry['comment']}) "
+        template += "{foreign_keys}."
+
+        columns = []
+        for name, col_type, comment in entry['columns']:
+            if comment:
+                columns.append(f"{name} ({col_type}): '{comment}'")
+            else:
+                columns.append(f"{name} ({col_type})")
+        foreign_keys = [
+            f"{constrained} -> {referred_table}.{referred_columns}"
+            for constrained, referred_table, referred_columns in entry['foreign_keys']
+        ]
+        foreign_key_str = foreign_keys and " and foreign keys: {}".format(", ".join(foreign_keys)) or ""
+        info = template.format(table_name=table_name, columns=", ".join(columns), foreign_keys=foreign_key_str)
+
+        samples = entry.get('sample_rows')
+        if samples and samples['rows']:
+            lines = ["\t".join(samples['columns'])] + ["\t".join(row) for row in samples['rows']]
+            info += f"\n/*\n{len(samples['rows'])} rows from {table_name} table:\n" + "\n".join(lines) + "\n*/"
+        return info
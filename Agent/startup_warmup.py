@@ -0,0 +1,181 @@
+import asyncio
+import importlib
+import time
+from config import Config
+from llm_scheduler import llm_priority, BACKGROUND
+from metrics import metrics
+
+# Loaded by the warm-up instead of at import time or by the first question
+WARMUP_MODULES = (
+    'llama_index.core',
+    'llama_index.core.query_engine',
+    'llama_index.llms.gemini',
+    'llama_index.embeddings.gemini',
+    'llm_wrappers',
+    'snapshot_sql_database'
+)
+
+class StartupWarmup:
+    """Warms the app up in the background after startup and reports readiness.
+
+    The API module only imports what serving a request needs, so the server
+    accepts connections quickly. A background task then loads the
+    llama_index/Gemini stack, initializes the models and connects the
+    default session to the DB_* database (both at once), builds its query
+    engine and table embeddings, and can run the first sample questions at
+    background LLM priority so their SQL is cached. Stages that fail are
+    logged and the app is still marked ready (degraded), as requests set
+    everything up lazily anyway. Stage times, the cold start (process start
+    to ready) and the first question's latency are kept for /health and
+    recorded as startup.* metrics.
+    """
+
+    def __init__(self, started_at, enabled=True, connect_db=True, seed_queries=0):
+        self.started_at = started_at
+        self.enabled = enabled
+        self.connect_db = connect_db
+        self.seed_queries = seed_queries
+        self.state = 'pending'
+        self.stages = {}
+        self.import_ms = None
+        self.cold_start_ms = None
+        self.first_query = None
+        self._task = None
+
+    def _elapsed_ms(self):
+        return (time.monotonic() - self.started_at) * 1000
+
+    @property
+    def ready(self):
+        return self.state in ('ready', 'degraded', 'disabled')
+
+    def mark_imported(self):
+        """Record how long loading the app module took"""
+        self.import_ms = self._elapsed_ms()
+        metrics.observe("startup.import", self.import_ms)
+
+    def start(self, agent, llm_executor, db_executor):
+        if self._task is not None:
+            return
+        if not self.enabled:
+            self.state = 'disabled'
+            return
+        self._task = asyncio.create_task(self._run(agent, llm_executor, db_executor))
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    def record_query(self, elapsed_ms):
+        """Keep the latency of the first question answered after startup"""
+        if self.first_query is not None:
+            return
+        self.first_query = {
+            'ms': round(elapsed_ms, 1),
+            'after_startup_ms': round(self._elapsed_ms(), 1),
+            'warm': self.ready
+        }
+        metrics.observe("startup.first_query", elapsed_ms)
+        print(f"⏱️ First question answered in {elapsed_ms:.0f} ms ({'after' if self.ready else 'during'} warm-up)")
+
+    async def _stage(self, name, executor, fn, *args):
+        """Run one stage on a worker pool; returns whether it succeeded"""
+        self.stages[name] = {'status': 'running'}
+        started_at = time.monotonic()
+        try:
+            detail = await executor.run(fn, *args)
+            status, error = 'ok', None
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            detail, status, error = None, 'failed', str(e)
+            print(f"⚠️ Warm-up stage '{name}' failed: {error}")
+        elapsed_ms = (time.monotonic() - started_at) * 1000
+        metrics.observe(f"startup.{name}", elapsed_ms)
+        self.stages[name] = {'status': status, 'ms': round(elapsed_ms, 1)}
+        if error:
+            self.stages[name]['error'] = error
+        elif detail:
+            self.stages[name]['detail'] = detail
+        return status == 'ok'
+
+    def _skip(self, name, reason):
+        self.stages[name] = {'status': 'skipped', 'reason': reason}
+
+    @staticmethod
+    def _import_modules():
+        for module in WARMUP_MODULES:
+            importlib.import_module(module)
+
+    @staticmethod
+    def _connect(agent):
+        success, message = agent.connect_from_env()
+        if not success:
+            raise RuntimeError(message)
+        return message
+
+    async def _run(self, agent, llm_executor, db_executor):
+        self.state = 'warming'
+        print("🔥 Warming up models, database connection and query engine in the background")
+        await self._stage('imports', llm_executor, self._import_modules)
+
+        tasks = [self._stage('models', llm_executor, agent.warm_up_models)]
+        if not self.connect_db:
+            self._skip('database', "STARTUP_CONNECT_DB is off")
+        elif not Config.get_db_config()['database']:
+            self._skip('database', "DB_NAME is not set")
+        else:
+            tasks.append(self._stage('database', db_executor, self._connect, agent))
+        models_ok, *connected = await asyncio.gather(*tasks)
+        connected = bool(connected and connected[0])
+
+        if models_ok and connected:
+            await self._stage('query_engine', llm_executor, agent.warm_up_query_engine)
+        else:
+            self._skip('query_engine', "needs the models and a database connection")
+
+        if self.seed_queries > 0 and self.stages['query_engine']['status'] == 'ok':
+            await self._seed_caches(agent, llm_executor, db_executor)
+        elif self.seed_queries > 0:
+            self._skip('caches', "needs the query engine")
+
+        failed = [name for name, stage in self.stages.items() if stage['status'] == 'failed']
+        self.state = 'degraded' if failed else 'ready'
+        self.cold_start_ms = self._elapsed_ms()
+        metrics.observe("startup.cold_start", self.cold_start_ms)
+        print(f"✅ Warm-up finished in {self.cold_start_ms:.0f} ms since process start ({self.state})")
+
+    async def _seed_caches(self, agent, llm_executor, db_executor):
+        """Answer the first sample questions so their SQL is cached for every session on this database"""
+        llm_priority.set(BACKGROUND)  # Never ahead of a user's question
+        self.stages['caches'] = {'status': 'running'}
+        started_at = time.monotonic()
+        seeded = 0
+        for question in Config.get_sample_queries()[:self.seed_queries]:
+            try:
+                plan = await llm_executor.run(agent.prepare_query, question, False)
+                if plan['result'] is None:
+                    result = await db_executor.run(agent.execute_query_plan, plan)
+                    seeded += bool(result['success'])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Could not seed the cache with '{question}': {str(e)}")
+        elapsed_ms = (time.monotonic() - started_at) * 1000
+        metrics.observe("startup.caches", elapsed_ms)
+        self.stages['caches'] = {'status': 'ok', 'ms': round(elapsed_ms, 1), 'detail': f"{seeded} questions cached"}
+
+    def get_status(self):
+        return {
+            'state': self.state,
+            'ready': self.ready,
+            'import_ms': round(self.import_ms, 1) if self.import_ms is not None else None,
+            'cold_start_ms': round(self.cold_start_ms, 1) if self.cold_start_ms is not None else None,
+            'stages': self.stages,
+            'first_query': self.first_query
+        }
@@ -0,0 +1,185 @@
+import math
+import re
+import threading
+from collections import Counter
+import numpy as np
+
+CHARS_PER_TOKEN = 4  # Rough estimate used for the prompt budget
+RRF_K = 60  # Reciprocal-rank-fusion damping constant
+
+class SchemaTableRetriever:
+    """Picks the tables relevant to a question so prompts don't carry the whole schema.
+
+    Each table is summarized as its name, columns, comment and referenced
+    tables. Summaries are ranked with BM25, which needs no model and works
+    offline, fused (reciprocal rank) with embedding similarity when an
+    embedder is available. The top_k tables, plus tables they reference by
+    foreign key, are kept while their table info fits in token_budget.
+    Implements the retrieve() interface NLSQLRetriever expects of a table
+    retriever.
+    """
+
+    def __init__(self, sql_database, tables, top_k=8, token_budget=6000, embedder=None, use_embeddings=True):
+        self.sql_database = sql_database
+        self.tables = list(tables)
+        self._table_set = set(self.tables)
+        self.top_k = top_k
+        self.token_budget = token_budget
+        self.embedder = embedder
+        self.use_embeddings = use_embeddings
+        self._table_tokens = {}
+        self._references = {}
+        self._vectors = None
+        self._summary_vectors = {}  # summary text -> unit vector, reused across refreshes
+        self._embeddings_failed = False
+        self._lock = threading.Lock()
+        self._build_index()
+
+    def _build_index(self):
+        summaries = [self._summarize(table) for table in self.tables]
+        self._documents = [self._tokenize(summary) for summary in summaries]
+        self._summaries = summaries
+        self._term_counts = [Counter(doc) for doc in self._documents]
+        self._avg_length = sum(len(doc) for doc in self._documents) / max(len(self._documents), 1)
+        document_frequency = Counter(term for doc in self._documents for term in set(doc))
+        n = len(self._documents)
+        self._idf = {
+            term: math.log(1 + (n - df + 0.5) / (df + 0.5))
+            for term, df in document_frequency.items()
+        }
+
+    def refresh(self, tables, changed_tables=()):
+        """Re-index after a schema change; only new or changed summaries are re-embedded"""
+        with self._lock:
+            self.tables = list(tables)
+            self._table_set = set(self.tables)
+            for table_name in changed_tables:
+                self._table_tokens.pop(table_name, None)
+            self._references = {}
+            self._build_index()
+            self._vectors = None
+
+    @staticmethod
+    def _tokenize(text):
+        """Lower-case word tokens, splitting snake_case and camelCase and dropping plural 's'"""
+        text = re.sub(r'([a-z0-9])([A-Z])', r'\1 \2', text)
+        tokens = re.findall(r'[a-z0-9]+', text.lower())
+        return [tok[:-1] if len(tok) > 3 and tok.endswith('s') and not tok.endswith('ss') else tok for tok in tokens]
+
+    def _summarize(self, table_name):
+        columns = self.sql_database.get_table_columns(table_name)
+        snapshot_entry = getattr(self.sql_database, '_snapshot_tables', {}).get(table_name, {})
+        self._references[table_name] = [fk[1] for fk in snapshot_entry.get('foreign_keys', [])]
+        parts = [table_name, table_name]  # The table name counts double
+        parts += [col['name'] for col in columns]
+        if snapshot_entry.get('comment'):
+            parts.append(snapshot_entry['comment'])
+        parts += [col['comment'] for col in columns if col.get('comment')]
+        parts += self._references[table_name]
+        return " ".join(parts)
+
+    def _bm25_scores(self, query_tokens, k1=1.5, b=0.75):
+        scores = np.zeros(len(self._documents), dtype=np.float32)
+        for i, counts in enumerate(self._term_counts):
+            length_norm = k1 * (1 - b + b * len(self._documents[i]) / (self._avg_length or 1))
+            for term in query_tokens:
+                tf = counts.get(term)
+                if tf:
+                    scores[i] += self._idf[term] * tf * (k1 + 1) / (tf + length_norm)
+        return scores
+
+    def _embed(self, texts):
+        embedder = self.embedder
+        if embedder is None:
+            from llama_index.core import Settings
+            vectors = Settings.embed_model.get_text_embedding_batch(texts)
+        else:
+            vectors = [embedder(text) for text in texts]
+        matrix = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        return matrix / norms
+
+    def _embedding_scores(self, query_str):
+        """Cosine similarity of the question to every table summary, or None when unavailable"""
+        if not self.use_embeddings or self._embeddings_failed:
+            return None
+        try:
+            return self._table_vectors() @ self._embed([query_str])[0]
+        except Exception as e:
+            # Offline or no embedding model: BM25 alone still ranks tables
+            print(f"⚠️ Table embeddings unavailable, using keyword ranking only: {str(e)}")
+            self._embeddings_failed = True
+            return None
+
+    def _table_vectors(self):
+        with self._lock:
+            if self._vectors is None:
+                missing = [summary for summary in self._summaries if summary not in self._summary_vectors]
+                if missing:
+                    self._summary_vectors.update(zip(missing, self._embed(missing)))
+                self._summary_vectors = {summary: self._summary_vectors[summary] for summary in self._summaries}
+                self._vectors = np.vstack([self._summary_vectors[summary] for summary in self._summaries])
+            return self._vectors
+
+    def warm_up(self):
+        """Embed the table summaries now rather than on the first question"""
+        if not self.use_embeddings or self._embeddings_failed:
+            return
+        try:
+            self._table_vectors()
+        except Exception as e:
+            print(f"⚠️ Table embeddings unavailable, using keyword ranking only: {str(e)}")
+            self._embeddings_failed = True
+
+    def _tokens(self, table_name):
+        if table_name not in self._table_tokens:
+            info = self.sql_database.get_single_table_info(table_name)
+            self._table_tokens[table_name] = len(info) // CHARS_PER_TOKEN + 1
+        return self._table_tokens[table_name]
+
+    def rank(self, query_str):
+        """Table names ordered by relevance to the question (all tables if nothing matches)"""
+        bm25 = self._bm25_scores(self._tokenize(query_str))
+        fused = np.zeros(len(self.tables), dtype=np.float32)
+        for rank, i in enumerate(np.argsort(-bm25, kind='stable')):
+            if bm25[i] > 0:
+                fused[i] += 1.0 / (RRF_K + rank)
+        similarity = self._embedding_scores(query_str)
+        if similarity is not None:
+            for rank, i in enumerate(np.argsort(-similarity, kind='stable')):
+                fused[i] += 1.0 / (RRF_K + rank)
+        order = np.argsort(-fused, kind='stable')
+        if fused[order[0]] > 0:
+            # Tables nothing points at would only pad the prompt
+            order = [i for i in order if fused[i] > 0]
+        return [self.tables[i] for i in order]
+
+    def select_tables(self, query_str):
+        """Relevant tables for the question, bounded by top_k and the token budget"""
+        if len(self.tables) <= self.top_k and \
+                (not self.token_budget or sum(self._tokens(t) for t in self.tables) <= self.token_budget):
+            return list(self.tables)
+
+        ranked = self.rank(query_str)[:self.top_k] if self.top_k else self.rank(query_str)
+        # Tables referenced by the chosen ones are likely join partners
+        candidates = list(ranked)
+        for table_name in ranked:
+            candidates += [ref for ref in self._references.get(table_name, []) if ref in self._table_set]
+
+        selected, used = [], 0
+        for table_name in candidates:
+            if table_name in selected:
+                continue
+            cost = self._tokens(table_name)
+            if selected and self.token_budget and used + cost > self.token_budget:
+                continue
+            selected.append(table_name)
+            used += cost
+        return selected
+
+    def retrieve(self, query_str):
+        from llama_index.core.objects import SQLTableSchema
+        selected = self.select_tables(query_str)
+        print(f"🗂️ Using {len(selected)} of {len(self.tables)} tables: {selected}")
+        return [SQLTableSchema(table_name=table_name) for table_name in selected]
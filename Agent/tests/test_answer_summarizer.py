@@ -0,0 +1,29 @@
+import pandas as pd
+
+from answer_summarizer import AnswerSummarizer
+
+
+def test_lists_raw_rows_instead_of_grouping_by_id():
+    customers = pd.DataFrame({'id': range(1, 501), 'name': [f"c{i}" for i in range(1, 501)], 'spend': range(500)})
+    summary = AnswerSummarizer.summarize(customers)
+    assert summary.startswith("Found **500** records with the following columns")
+    assert "groups" not in summary and "accounts for" not in summary
+
+
+def test_lists_a_raw_time_series_with_repeated_keys():
+    orders = pd.DataFrame({'created_at': ['2024-01-01', '2024-01-01', '2024-01-02'], 'amount': [1.5, 2.0, 3.0]})
+    assert AnswerSummarizer.summarize(orders).startswith("Found **3** records with the following columns")
+
+
+def test_ranks_a_grouped_aggregate():
+    regions = pd.DataFrame({'region': ['north', 'south', 'east'], 'total': [30, 20, 10]})
+    summary = AnswerSummarizer.summarize(regions)
+    assert summary.startswith("Top **3** region by **total**")
+    assert "**north** accounts for **50.0%** of the overall total." in summary
+
+
+def test_labels_first_page_figures_as_partial():
+    regions = pd.DataFrame({'region': ['north', 'south', 'east'], 'total': [30, 20, 10]})
+    summary = AnswerSummarizer.summarize(regions, partial=True)
+    assert "In the first **3** rows, **total** ranges" in summary
+    assert "accounts for" not in summary
@@ -0,0 +1,92 @@
+import random
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+
+from chart_query_planner import ChartQueryPlanner
+
+
+class SQLiteDatabase:
+    """The parts of DatabaseManager the planner uses, on a real SQLite engine"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    def execute_raw_sql(self, sql_query, params=None):
+        self.statements.append(sql_query)
+        with self.engine.connect() as conn:
+            return pd.read_sql(sql_query, conn)
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'shop.db'}")
+    rng = random.Random(7)
+    orders = pd.DataFrame({
+        'id': range(1, 1201),
+        'order_date': [f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} 10:00:00" for _ in range(1200)],
+        'amount': [round(rng.uniform(5, 200), 2) for _ in range(1200)]
+    })
+    orders.to_sql('orders', engine, index=False)
+    yield SQLiteDatabase(engine)
+    engine.dispose()
+
+
+def run(db, sql, limit=None):
+    return db.execute_raw_sql(sql if limit is None else f"{sql} LIMIT {limit}")
+
+
+def test_monthly_counts_are_charted_as_they_are(db):
+    sql = "SELECT strftime('%Y-%m', order_date) AS month, COUNT(*) AS order_count FROM orders GROUP BY 1 ORDER BY 1"
+    df = run(db, sql)
+
+    assert ChartQueryPlanner().build("How many orders per month? show the trend", sql, df, db, complete=True) is None
+
+
+def test_pre_aggregated_page_is_summed_not_counted(db):
+    sql = "SELECT strftime('%Y-%m', order_date) AS month, COUNT(*) AS order_count FROM orders GROUP BY 1 ORDER BY 1"
+    page = run(db, sql, limit=6)
+
+    frame, info = ChartQueryPlanner().build("How many orders per month? show the trend", sql, page, db, complete=False)
+
+    assert info['source'] == 'database'
+    assert info['aggregate'] == 'sum' and info['measure'] == 'order_count'
+    assert len(frame) == 12
+    assert frame['order_count'].sum() == 1200
+    assert frame['order_count'].min() > 1
+
+
+def test_raw_rows_are_counted_per_month_in_the_database(db):
+    sql = "SELECT id, order_date, amount FROM orders"
+    page = run(db, sql, limit=100)
+
+    frame, info = ChartQueryPlanner(max_points=50).build("How many orders per month?", sql, page, db, complete=False)
+
+    assert info['source'] == 'database'
+    assert info['aggregate'] == 'count' and info['granularity'] == 'month'
+    assert len(frame) == 12
+    assert frame['count'].sum() == 1200
+    assert 'COUNT(*)' in db.statements[-1]
+
+
+def test_trend_of_raw_rows_sums_the_measure(db):
+    sql = "SELECT order_date, amount FROM orders"
+    page = run(db, sql, limit=100)
+    total = run(db, "SELECT SUM(amount) AS total FROM orders")['total'].iloc[0]
+
+    frame, info = ChartQueryPlanner().build("revenue trend", sql, page, db, complete=False)
+
+    assert info['aggregate'] == 'sum' and info['source'] == 'database'
+    assert frame['amount'].sum() == pytest.approx(total)
+
+
+def test_local_fallback_marks_partial_results(db):
+    sql = "SELECT order_date, amount FROM missing_table"
+    page = run(db, "SELECT order_date, amount FROM orders", limit=100)
+
+    frame, info = ChartQueryPlanner().build("revenue trend", sql, page, db, complete=False)
+
+    assert info['source'] == 'local' and info['partial'] is True
+    assert frame['amount'].sum() == pytest.approx(page['amount'].sum())
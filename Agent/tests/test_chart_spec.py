@@ -0,0 +1,15 @@
+import pandas as pd
+
+from chart_spec import ChartSpecEngine
+
+
+def test_a_change_in_the_middle_of_a_result_is_not_served_from_the_memo():
+    engine = ChartSpecEngine()
+    sales = pd.DataFrame({'region': [f"r{i}" for i in range(200)], 'total': [float(i) for i in range(200)]})
+    first = engine.build(sales, "total by region")
+    assert engine.build(sales.copy(), "total by region") is first
+
+    changed = sales.copy()
+    changed.loc[100, 'total'] = -1.0
+    assert engine.build(changed, "total by region") is not first
+    assert engine.hits == 1 and engine.misses == 2
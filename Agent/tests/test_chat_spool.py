@@ -0,0 +1,189 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from chat_spool import ChatSaveQueue
+from nextjs_client import NextJSClient
+
+
+class NextJSStandIn:
+    """A local HTTP server answering chat saves the way the NextJS API does.
+
+    Answers are taken from `script` in order (status codes); once it runs out
+    every save is accepted. Accepted saves are kept in `saved`. Bodies queued
+    in `answers[path]` replace the normal JSON answer for saves to that path.
+    """
+
+    def __init__(self):
+        self.script = []
+        self.answers = {}
+        self.saved = []
+        self.requests = 0
+        self.lock = threading.Lock()
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                with stand_in.lock:
+                    stand_in.requests += 1
+                    status = stand_in.script.pop(0) if stand_in.script else 200
+                    if status == 200:
+                        if stand_in.answers.get(self.path):
+                            answer = stand_in.answers[self.path].pop(0)
+                        else:
+                            stand_in.saved.append((self.path, body))
+                            answer = {'messageId': f"m{len(stand_in.saved)}", 'chatId': body.get('chatId') or 'c1'}
+                    else:
+                        answer = {'error': 'unavailable'}
+                data = json.dumps(answer).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def nextjs():
+    stand_in = NextJSStandIn()
+    yield stand_in
+    stand_in.close()
+
+
+def make_queue(nextjs, spool_path, **options):
+    options = {'flush_interval': 0.05, 'backoff_base': 0.01, 'backoff_max': 0.05, **options}
+    return ChatSaveQueue(NextJSClient(nextjs.base_url), str(spool_path), **options)
+
+
+async def wait_for_status(queue, pending_id, status, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        saved = await queue.status(pending_id)
+        if saved['status'] == status:
+            return saved
+        await asyncio.sleep(0.02)
+    raise AssertionError(f"save {pending_id} is still {saved['status']}, expected {status}")
+
+
+def save(text, chat_id=None):
+    return json.dumps({'chatId': chat_id, 'message': text})
+
+
+def test_retries_a_save_until_nextjs_accepts_it(nextjs, tmp_path):
+    nextjs.script = [503, 503]
+
+    async def run():
+        queue = make_queue(nextjs, tmp_path / 'spool.db')
+        try:
+            pending_id, _ = await queue.enqueue('chat/c1', save('hello', 'c1'))
+            saved = await wait_for_status(queue, pending_id, 'delivered')
+            return saved, await queue.get_stats()
+        finally:
+            await queue.stop()
+            await queue.client.close()
+
+    saved, stats = asyncio.run(run())
+    assert saved['message_id'] == 'm1' and saved['attempts'] == 2
+    assert nextjs.requests == 3
+    assert stats['retried'] == 2 and stats['delivered'] == 1
+
+
+def test_replays_spooled_saves_in_order_after_a_restart(nextjs, tmp_path):
+    spool_path = tmp_path / 'spool.db'
+    nextjs.script = [503] * 1000  # NextJS is down before the restart
+
+    async def before_restart():
+        queue = make_queue(nextjs, spool_path, backoff_base=5, backoff_max=5)
+        try:
+            return [(await queue.enqueue('chat/c1', save(f"message {i}", 'c1')))[0] for i in range(3)]
+        finally:
+            await queue.stop()
+            await queue.client.close()
+
+    async def after_restart(pending_ids):
+        queue = make_queue(nextjs, spool_path)
+        try:
+            await queue.start()
+            return [await wait_for_status(queue, pending_id, 'delivered') for pending_id in pending_ids]
+        finally:
+            await queue.stop()
+            await queue.client.close()
+
+    pending_ids = asyncio.run(before_restart())
+    nextjs.script = []
+    saved = asyncio.run(after_restart(pending_ids))
+    assert [body['message'] for _, body in nextjs.saved] == ['message 0', 'message 1', 'message 2']
+    assert [entry['message_id'] for entry in saved] == ['m1', 'm2', 'm3']
+
+
+def test_keeps_rejected_and_exhausted_saves_as_failed(nextjs, tmp_path):
+    async def run():
+        queue = make_queue(nextjs, tmp_path / 'spool.db', max_attempts=3)
+        try:
+            nextjs.script = [400]
+            rejected_id, _ = await queue.enqueue('chat/c1', save('bad', 'c1'))
+            rejected = await wait_for_status(queue, rejected_id, 'failed')
+            nextjs.script = [500] * 3
+            exhausted_id, _ = await queue.enqueue('chat/c2', save('unlucky', 'c2'))
+            exhausted = await wait_for_status(queue, exhausted_id, 'failed')
+            return rejected, exhausted, await queue.get_stats()
+        finally:
+            await queue.stop()
+            await queue.client.close()
+
+    rejected, exhausted, stats = asyncio.run(run())
+    assert rejected['attempts'] == 1 and rejected['error'].startswith('HTTP 400')
+    assert exhausted['attempts'] == 3 and exhausted['error'].startswith('HTTP 500')
+    assert stats['failed_total'] == 2 and stats['pending'] == 0
+    assert nextjs.requests == 4 and nextjs.saved == []
+
+
+def test_waits_for_a_new_chat_to_be_saved(nextjs, tmp_path):
+    async def run():
+        queue = make_queue(nextjs, tmp_path / 'spool.db')
+        try:
+            created = await queue.enqueue('chat', save('first question'), wait=2)
+            nextjs.script = [503] * 1000
+            slow = await queue.enqueue('chat', save('second question'), wait=0.2)
+            return created, slow
+        finally:
+            await queue.stop()
+            await queue.client.close()
+
+    (created_id, created), (slow_id, slow) = asyncio.run(run())
+    assert created['status'] == 'delivered' and created['chat_id'] == 'c1'
+    assert slow_id and slow is None
+
+
+def test_an_unexpected_answer_is_dead_lettered_without_stalling_other_saves(nextjs, tmp_path):
+    async def run():
+        queue = make_queue(nextjs, tmp_path / 'spool.db', max_attempts=2)
+        try:
+            nextjs.answers['/chat/c1'] = [[], []]  # 200 with a list instead of an object, twice
+            poison_id, _ = await queue.enqueue('chat/c1', save('poison', 'c1'))
+            healthy_id, _ = await queue.enqueue('chat/c2', save('healthy', 'c2'))
+            poison = await wait_for_status(queue, poison_id, 'failed')
+            return poison, await wait_for_status(queue, healthy_id, 'delivered')
+        finally:
+            await queue.stop()
+            await queue.client.close()
+
+    poison, healthy = asyncio.run(run())
+    assert poison['attempts'] == 2 and poison['error'].startswith('AttributeError')
+    assert healthy['message_id'] is not None
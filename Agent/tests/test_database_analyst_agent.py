@@ -0,0 +1,66 @@
+import pandas as pd
+import pytest
+from llama_index.core import Settings
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.core.llms import CompletionResponse, CustomLLM, LLMMetadata
+from llama_index.core.llms.callbacks import llm_completion_callback
+from sqlalchemy import create_engine
+
+from database_analyst_agent import DatabaseAnalystAgent
+from metrics import metrics
+
+SQL = "SELECT region, SUM(amount) AS total FROM orders GROUP BY region ORDER BY total DESC"
+
+
+class FakeLLM(CustomLLM):
+    """Answers every text-to-SQL prompt with the same query"""
+
+    calls: int = 0
+
+    @property
+    def metadata(self):
+        return LLMMetadata()
+
+    @llm_completion_callback()
+    def complete(self, prompt, formatted=False, **kwargs):
+        self.calls += 1
+        return CompletionResponse(text=SQL)
+
+    @llm_completion_callback()
+    def stream_complete(self, prompt, formatted=False, **kwargs):
+        yield self.complete(prompt)
+
+
+@pytest.fixture
+def agent(tmp_path, monkeypatch):
+    monkeypatch.setattr(Settings, '_llm', FakeLLM())
+    monkeypatch.setattr(Settings, '_embed_model', MockEmbedding(embed_dim=8))
+    path = tmp_path / 'shop.db'
+    engine = create_engine(f"sqlite:///{path}")
+    pd.DataFrame({
+        'id': range(1, 301),
+        'region': [f"r{i % 5}" for i in range(300)],
+        'amount': [float(i % 40) for i in range(300)]
+    }).to_sql('orders', engine, index=False)
+    engine.dispose()
+
+    agent = DatabaseAnalystAgent(embedder=lambda text: [1.0, float(len(text))])
+    agent._models_initialized = True
+    success, message = agent.connect_database(f"sqlite:///{path}")
+    assert success, message
+    yield agent
+    agent.database_manager.disconnect()
+
+
+def sql_executions():
+    return metrics.snapshot()['counters'].get('db.sql_executions', 0)
+
+
+def test_a_question_makes_one_database_round_trip(agent):
+    executions, counted = agent.database_manager.sql_execution_count, sql_executions()
+    plan = agent.prepare_query("Total amount by region")
+    result = agent.execute_query_plan(plan)
+
+    assert result['success'] and len(result['data']) == 5
+    assert agent.database_manager.sql_execution_count == executions + 1
+    assert sql_executions() == counted + 1
@@ -0,0 +1,48 @@
+import asyncio
+import threading
+
+from executor_pool import BoundedExecutor
+
+
+def test_an_abandoned_stream_holds_its_slot_until_the_worker_stops():
+    pool = BoundedExecutor('test', max_workers=1, max_queue=0)
+    next_item = threading.Event()
+
+    def rows():
+        yield 1
+        next_item.wait()  # e.g. a slow database fetch
+        yield 2
+        yield 3
+
+    async def run():
+        stream = pool.stream(rows)
+        assert await stream.__anext__() == 1
+        await stream.aclose()  # The client disconnected
+        held = pool.get_stats()['pending']
+        next_item.set()
+        for _ in range(100):
+            if pool.get_stats()['pending'] == 0:
+                break
+            await asyncio.sleep(0.01)
+        return held, pool.get_stats()['pending']
+
+    try:
+        held, after = asyncio.run(run())
+    finally:
+        pool.shutdown()
+    assert held == 1 and after == 0
+
+
+def test_a_finished_stream_frees_its_slot():
+    pool = BoundedExecutor('test', max_workers=1, max_queue=0)
+
+    async def run():
+        items = [item async for item in pool.stream(range, 5)]
+        await asyncio.sleep(0.05)
+        return items
+
+    try:
+        assert asyncio.run(run()) == [0, 1, 2, 3, 4]
+        assert pool.get_stats()['pending'] == 0 and pool.get_stats()['completed'] == 1
+    finally:
+        pool.shutdown()
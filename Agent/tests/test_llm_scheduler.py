@@ -0,0 +1,53 @@
+import threading
+import time
+
+import pytest
+
+from llm_scheduler import BACKGROUND, BATCH, INTERACTIVE, LLMQueueFullError, LLMScheduler
+
+
+def test_serves_waiting_calls_by_priority_then_arrival():
+    scheduler = LLMScheduler(max_in_flight=1, max_wait=0)
+    busy = scheduler.acquire(1)
+    served = []
+
+    def call(name, priority):
+        ticket = scheduler.acquire(1, priority)
+        served.append(name)
+        scheduler.release(ticket)
+
+    threads = []
+    for name, priority in [('background', BACKGROUND), ('batch 1', BATCH), ('interactive', INTERACTIVE), ('batch 2', BATCH)]:
+        threads.append(threading.Thread(target=call, args=(name, priority)))
+        threads[-1].start()
+        time.sleep(0.05)  # Queue them in this order
+    assert scheduler.get_stats()['queued'] == 4
+
+    scheduler.release(busy)
+    for thread in threads:
+        thread.join()
+    assert served == ['interactive', 'batch 1', 'batch 2', 'background']
+
+
+def test_throttles_calls_to_the_token_budget():
+    scheduler = LLMScheduler(tokens_per_minute=600, max_wait=0)  # 10 tokens a second
+    scheduler.release(scheduler.acquire(600))  # Drains the bucket
+    started_at = time.monotonic()
+    scheduler.release(scheduler.acquire(5))
+    assert 0.4 <= time.monotonic() - started_at < 1.5
+
+
+def test_credits_back_unused_tokens():
+    scheduler = LLMScheduler(tokens_per_minute=600, max_wait=0)
+    scheduler.release(scheduler.acquire(600), actual_tokens=100)
+    started_at = time.monotonic()
+    scheduler.release(scheduler.acquire(400))
+    assert time.monotonic() - started_at < 0.2
+
+
+def test_rejects_calls_that_would_wait_too_long():
+    scheduler = LLMScheduler(requests_per_minute=1, max_wait=0.2)
+    scheduler.release(scheduler.acquire(1))
+    with pytest.raises(LLMQueueFullError):
+        scheduler.acquire(1)
+    assert scheduler.get_stats()['rejected'] == 1
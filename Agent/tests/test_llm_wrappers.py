@@ -0,0 +1,80 @@
+import threading
+import time
+
+import pytest
+from llama_index.core.llms import CompletionResponse, CustomLLM, LLMMetadata
+from llama_index.core.llms.callbacks import llm_completion_callback
+
+from llm_resilience import CircuitBreaker, CircuitOpenError
+from llm_scheduler import LLMScheduler
+from llm_wrappers import ResilientLLM, ScheduledLLM
+
+
+class StubLLM(CustomLLM):
+    """Answers 'answer <n>' for the n-th call after delays[n] seconds, or raises errors[n]"""
+
+    delays: list = []
+    errors: list = []
+    calls: int = 0
+
+    @property
+    def metadata(self):
+        return LLMMetadata()
+
+    @llm_completion_callback()
+    def complete(self, prompt, formatted=False, **kwargs):
+        call = self.calls
+        self.calls += 1
+        if call < len(self.errors) and self.errors[call]:
+            raise self.errors[call]
+        time.sleep(self.delays[call] if call < len(self.delays) else 0)
+        return CompletionResponse(text=f"answer {call}")
+
+    @llm_completion_callback()
+    def stream_complete(self, prompt, formatted=False, **kwargs):
+        yield self.complete(prompt)
+
+
+def test_a_hedged_attempt_wins_over_a_slow_one():
+    llm = ResilientLLM(llm=StubLLM(delays=[2, 0]), hedge=True, hedge_delay=0.1)
+    started_at = time.monotonic()
+    assert llm.complete("question").text == "answer 1"
+    assert time.monotonic() - started_at < 1
+
+
+def test_retries_transient_errors_but_not_others():
+    llm = ResilientLLM(llm=StubLLM(errors=[ConnectionError("reset"), TimeoutError("slow")]), backoff_base=0.01)
+    assert llm.complete("question").text == "answer 2"
+
+    llm = ResilientLLM(llm=StubLLM(errors=[ValueError("bad request")]), backoff_base=0.01)
+    with pytest.raises(ValueError):
+        llm.complete("question")
+    assert llm.llm.calls == 1
+
+
+def test_breaker_opens_after_repeated_failures_and_recovers():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.2)
+    llm = ResilientLLM(llm=StubLLM(errors=[ConnectionError()] * 2), breaker=breaker, max_retries=0)
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            llm.complete("question")
+    with pytest.raises(CircuitOpenError):
+        llm.complete("question")
+    assert llm.llm.calls == 2 and breaker.state == 'open'
+
+    time.sleep(0.25)
+    assert llm.complete("question").text == "answer 2"
+    assert breaker.state == 'closed'
+
+
+def test_attempt_time_excludes_the_scheduler_queue():
+    scheduler = LLMScheduler(max_in_flight=1, max_wait=0)
+    llm = ResilientLLM(llm=ScheduledLLM(llm=StubLLM(delays=[0.3] * 3), scheduler=scheduler), attempt_timeout=0.5)
+    threads = [threading.Thread(target=llm.complete, args=("question",)) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # Each call waited up to 0.6s for the single slot, but took 0.3s once dispatched
+    assert len(llm._latencies) == 3
+    assert max(llm._latencies) < 0.45
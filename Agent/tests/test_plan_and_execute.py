@@ -0,0 +1,61 @@
+import asyncio
+import threading
+import time
+
+import main
+from llm_scheduler import BATCH, INTERACTIVE, llm_priority
+
+
+class SlowAgent:
+    """The parts of DatabaseAnalystAgent plan_and_execute uses; planning takes 0.2s"""
+
+    def __init__(self):
+        self.planned = 0
+        self._lock = threading.Lock()
+
+    def coalescing_key(self, user_query):
+        return ('shop', user_query.lower())
+
+    def prepare_query(self, user_query, synthesize=None):
+        with self._lock:
+            self.planned += 1
+        time.sleep(0.2)
+        return {'user_query': user_query, 'priority': llm_priority.get()}
+
+    def execute_query_plan(self, plan):
+        return {'success': True, 'priority': plan['priority']}
+
+    @staticmethod
+    def resolve_answer_mode(synthesize=None):
+        return bool(synthesize)
+
+
+def ask(agent, priority, question="Total sales by region"):
+    async def run():
+        llm_priority.set(priority)
+        return await main.plan_and_execute(agent, question)
+    return run()
+
+
+def test_coalesces_identical_questions_only_at_the_same_priority():
+    agent = SlowAgent()
+
+    async def run():
+        return await asyncio.gather(
+            ask(agent, INTERACTIVE), ask(agent, BATCH), ask(agent, INTERACTIVE), ask(agent, BATCH)
+        )
+
+    results = asyncio.run(run())
+    assert agent.planned == 2
+    # Every caller's question was planned at its own priority
+    assert [result['priority'] for _, result in results] == [INTERACTIVE, BATCH, INTERACTIVE, BATCH]
+
+
+def test_different_questions_are_not_coalesced():
+    agent = SlowAgent()
+
+    async def run():
+        return await asyncio.gather(ask(agent, INTERACTIVE, "a"), ask(agent, INTERACTIVE, "b"))
+
+    asyncio.run(run())
+    assert agent.planned == 2
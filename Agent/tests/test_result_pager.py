@@ -0,0 +1,121 @@
+import base64
+import json
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+
+from result_pager import ResultPager
+
+
+class SQLiteDatabase:
+    """The parts of DatabaseManager the pager uses, on a real SQLite engine"""
+
+    def __init__(self, engine, primary_key=None, schema_fingerprint='shop'):
+        self.engine = engine
+        self.primary_key = primary_key  # None forces OFFSET paging
+        self.schema_fingerprint = schema_fingerprint
+
+    def get_primary_key(self, table_name):
+        return self.primary_key
+
+    def execute_raw_sql(self, sql_query, params=None):
+        with self.engine.connect() as conn:
+            return pd.read_sql(sql_query, conn, params=params)
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'shop.db'}")
+    pd.DataFrame({
+        'id': range(1, 1001),
+        'region': [f"r{i % 40}" for i in range(1000)],
+        'amount': [i % 97 for i in range(1000)]
+    }).to_sql('orders', engine, index=False)
+    return SQLiteDatabase(engine)
+
+
+def read_all(pager, sql_query, db):
+    state = pager.plan_first_page(sql_query, db)
+    page, query_id, token = pager.finish_first_page(state, db.execute_raw_sql(state['sql']))
+    pages = [page]
+    while token:
+        page, token = pager.fetch_page(query_id, token, db)
+        pages.append(page)
+    return state, pd.concat(pages)
+
+
+@pytest.mark.parametrize('sql_query, expected', [
+    ("SELECT * FROM orders;", "SELECT * FROM orders"),
+    ("SELECT * FROM orders LIMIT 5;  -- top five", "SELECT * FROM orders LIMIT 5"),
+    ("SELECT * FROM orders /* all */ ;\n", "SELECT * FROM orders"),
+    ("SELECT * FROM orders WHERE region = 'a--b'", "SELECT * FROM orders WHERE region = 'a--b'"),
+])
+def test_strip_sql_removes_trailing_semicolons_and_comments(sql_query, expected):
+    assert ResultPager.strip_sql(sql_query) == expected
+
+
+def test_keeps_a_trailing_limit_behind_a_comment(db):
+    state = ResultPager(page_size=10).plan_first_page("SELECT * FROM orders LIMIT 5;  -- top five", db)
+    assert state['mode'] == 'none'
+    assert len(db.execute_raw_sql(state['sql'])) == 5
+
+
+def test_leaves_mysql_offset_limit_alone():
+    assert ResultPager.split_limit("SELECT * FROM orders LIMIT 5, 10") == ("SELECT * FROM orders LIMIT 5, 10", None)
+    assert ResultPager.enforce_limit("SELECT * FROM orders LIMIT 5, 10;", 100) == "SELECT * FROM orders LIMIT 5, 10"
+
+
+def test_pages_an_ordered_query_with_offset(db):
+    state, rows = read_all(ResultPager(page_size=300), "SELECT * FROM orders ORDER BY amount DESC, id", db)
+    assert state['mode'] == 'offset'
+    assert len(rows) == 1000 and rows['id'].is_unique
+
+
+def test_does_not_page_an_unordered_query(db):
+    pager = ResultPager(page_size=300)
+    state, rows = read_all(pager, "SELECT id, amount FROM orders WHERE amount > 0", db)
+    assert state['mode'] == 'none'
+    assert len(rows) == 989 and rows['id'].is_unique
+
+
+def test_a_window_order_does_not_count_as_ordered(db):
+    sql_query = "SELECT id, ROW_NUMBER() OVER (ORDER BY amount) AS n FROM orders"
+    state = ResultPager(page_size=300).plan_first_page(sql_query, db)
+    assert state['mode'] == 'none'
+
+
+def test_pages_by_key_only_when_it_is_selected_under_its_own_name(db):
+    db.primary_key = 'id'
+    pager = ResultPager(page_size=300)
+    state, rows = read_all(pager, "SELECT id, amount FROM orders", db)
+    assert state['mode'] == 'keyset' and len(rows) == 1000 and rows['id'].is_unique
+    assert pager.plan_first_page("SELECT id AS order_id, amount FROM orders", db)['mode'] == 'none'
+
+
+def first_page_token(pager, sql_query, db):
+    state = pager.plan_first_page(sql_query, db)
+    _, query_id, token = pager.finish_first_page(state, db.execute_raw_sql(state['sql']))
+    return query_id, token
+
+
+def test_rejects_an_edited_continuation_token(db):
+    pager = ResultPager(page_size=100, max_rows=200)
+    query_id, token = first_page_token(pager, "SELECT * FROM orders ORDER BY id", db)
+    payload, signature = token.rsplit('.', 1)
+    cursor = json.loads(base64.urlsafe_b64decode(payload))
+    cursor['served'] = 0  # Would lift the 200-row cap
+    forged = base64.urlsafe_b64encode(json.dumps(cursor).encode()).decode() + '.' + signature
+    with pytest.raises(ValueError):
+        pager.fetch_page(query_id, forged, db)
+
+    page, next_token = pager.fetch_page(query_id, token, db)
+    assert len(page) == 100 and next_token is None
+
+
+def test_rejects_a_token_used_against_another_database(db):
+    pager = ResultPager(page_size=100)
+    query_id, token = first_page_token(pager, "SELECT * FROM orders ORDER BY id", db)
+    other = SQLiteDatabase(db.engine, schema_fingerprint='other')
+    with pytest.raises(ValueError):
+        pager.fetch_page(query_id, token, other)
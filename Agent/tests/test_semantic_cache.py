@@ -0,0 +1,47 @@
+import re
+
+from semantic_cache import SemanticQueryCache
+
+SQL = "SELECT name FROM customers ORDER BY spend DESC LIMIT 10"
+
+
+class BagOfWordsEmbedder:
+    """Local stand-in for the embedding model: counts of a few known words"""
+
+    def __init__(self, vocabulary=('top', 'customers', 'spend', 'orders', 'month')):
+        self.vocabulary = vocabulary
+
+    def __call__(self, text):
+        words = re.findall(r'[a-z]+', text.lower())
+        return [float(words.count(word)) for word in self.vocabulary]
+
+
+def test_serves_sql_for_a_paraphrase_and_misses_other_questions():
+    cache = SemanticQueryCache(embedder=BagOfWordsEmbedder(), similarity_threshold=0.9)
+    cache.add("top 10 customers by spend", 'shop', SQL)
+
+    sql, score, _ = cache.lookup("customers with the top spend, 10 of them", 'shop')
+    assert sql == SQL and score > 0.9
+    assert cache.lookup("orders per month", 'shop')[0] is None
+    assert cache.lookup("top 10 customers by spend", 'other schema')[0] is None
+    assert cache.get_stats()['hits'] == 1 and cache.get_stats()['misses'] == 2
+
+
+def test_paraphrases_must_mention_the_same_numbers():
+    cache = SemanticQueryCache(embedder=BagOfWordsEmbedder(), similarity_threshold=0.9)
+    cache.add("top 10 customers by spend", 'shop', SQL)
+    assert cache.lookup("top ten customers by spend", 'shop')[0] == SQL
+    assert cache.lookup("top 5 customers by spend", 'shop')[0] is None
+
+
+def test_a_new_embedding_dimension_is_a_miss_and_resets_the_index():
+    cache = SemanticQueryCache(embedder=BagOfWordsEmbedder(), similarity_threshold=0.9)
+    cache.add("top 10 customers by spend", 'shop', SQL)
+
+    cache.embedder = BagOfWordsEmbedder(vocabulary=('top', 'customers', 'spend'))
+    sql, score, vector = cache.lookup("top 10 customers by spend", 'shop')
+    assert sql is None and score == 0.0 and vector.shape == (3,)
+    assert cache.get_stats()['size'] == 0
+
+    cache.add("top 10 customers by spend", 'shop', SQL, vector)
+    assert cache.lookup("top 10 customers by spend", 'shop')[0] == SQL
@@ -0,0 +1,38 @@
+import pandas as pd
+from sqlalchemy import create_engine
+
+from snapshot_sql_database import SnapshotSQLDatabase
+
+
+def table_entry(columns, sample_rows=None):
+    return {
+        'columns': [(name, col_type, None) for name, col_type in columns],
+        'foreign_keys': [],
+        'primary_key': ['id'],
+        'comment': None,
+        'sample_rows': sample_rows
+    }
+
+
+def test_serves_tables_from_the_snapshot_without_reflecting(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'shop.db'}")
+    pd.DataFrame({'id': [1, 2], 'region': ['north', 'south']}).to_sql('orders', engine, index=False)
+    snapshot = {'tables': {'orders': table_entry(
+        [('id', 'INTEGER'), ('region', 'TEXT')], {'columns': ['id', 'region'], 'rows': [['1', 'north']]}
+    )}}
+
+    database = SnapshotSQLDatabase(engine, snapshot, include_tables=['orders'])
+    assert not database.metadata_obj.tables  # Nothing was reflected
+    assert database.get_usable_table_names() == ['orders']
+    assert database.get_table_columns('orders')[1] == {'name': 'region', 'type': 'TEXT', 'comment': None}
+    info = database.get_single_table_info('orders')
+    assert info.startswith("Table 'orders' has columns: id (INTEGER), region (TEXT), .")
+    assert "1 rows from orders table:\nid\tregion\n1\tnorth" in info
+    # Inherited behaviour still works on the real database
+    assert database.dialect == 'sqlite'
+    assert database.run_sql("SELECT COUNT(*) FROM orders")[1]['result'] == [(2,)]
+
+    snapshot['tables']['customers'] = table_entry([('id', 'INTEGER'), ('name', 'TEXT')])
+    database.update_snapshot(snapshot)
+    assert database.get_usable_table_names() == ['customers', 'orders']
+    engine.dispose()
@@ -0,0 +1,73 @@
+from chart_spec import ChartSpecEngine, CHART_TYPES
+
+class VisualizationManager:
+    """Renders chart specs from ChartSpecEngine as plotly figures (e.g. for notebooks or exports).
+
+    The API sends the JSON spec itself; plotly is only imported when a
+    figure is actually rendered.
+    """
+
+    spec_engine = ChartSpecEngine()
+
+    @staticmethod
+    def create_visualization(df, query):
+        """Create appropriate visualization based on data and query"""
+        if df is None or df.empty:
+            return None
+
+        try:
+            spec = VisualizationManager.spec_engine.build(df, query)
+            return VisualizationManager.figure_from_spec(spec)
+        except Exception as e:
+            print(f"Could not create visualization: {str(e)}")
+            return None
+
+    @staticmethod
+    def figure_from_spec(spec):
+        """Build a plotly figure from a chart spec that includes its data"""
+        if not spec or 'data' not in spec:
+            return None
+        import pandas as pd
+        import plotly.express as px
+
+        df = pd.DataFrame(spec['data'], columns=spec['columns'])
+        title = spec.get('title')
+        if spec['type'] == 'line':
+            fig = px.line(df, x=spec['x_axis'], y=spec['series'], title=title)
+        elif spec['type'] == 'pie':
+            fig = px.pie(df, names=spec['x_axis'], values=spec['y_axis'], title=title)
+        elif spec['type'] == 'scatter':
+            fig = px.scatter(df, x=spec['x_axis'], y=spec['y_axis'], title=title)
+        else:
+            fig = px.bar(df, x=spec['x_axis'], y=spec['y_axis'], title=title)
+            fig.update_xaxes(tickangle=45)
+        VisualizationManager._style_chart(fig)
+        return fig
+
+    @staticmethod
+    def _style_chart(fig):
+        """Apply consistent styling to charts"""
+        fig.update_layout(
+            template="plotly_white",
+            font=dict(size=12),
+            title_font_size=16,
+            showlegend=True
+        )
+        return fig
+
+    @staticmethod
+    def get_supported_chart_types():
+        """Get list of supported chart types"""
+        return list(CHART_TYPES)
+
+    @staticmethod
+    def export_chart_config(fig):
+        """Export chart configuration for reuse"""
+        if fig is None:
+            return None
+
+        return {
+            'chart_type': fig.data[0].type,
+            'layout': fig.layout,
+            'data_columns': len(fig.data[0].x) if hasattr(fig.data[0], 'x') else 0
+        }